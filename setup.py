@@ -13,6 +13,20 @@ setup(
     install_requires = ['google-api-python-client>=1.5.1',
 			'isodate>=0.5.4',
 			] + test_requirements,
+    # Optional features: columnar results (pandas and pyarrow
+    # only for the exports), pooled HTTP transport (httpx
+    # only for HTTP/2), and work queues on a Redis server:
+    extras_require   = {'columnar' : ['numpy>=1.17', 'pandas>=1.0', 'pyarrow>=1.0'],
+                        'pooled'   : ['requests>=2.20'],
+                        'http2'    : ['httpx[http2]>=0.20'],
+                        'redis'    : ['redis>=3.0'],
+                        'streaming': ['ijson>=3.1'],
+                        },
+
+    # Command line tools:
+    entry_points     = {'console_scripts' : ['youtube-enrich = youtube_utils.bulk_enrich:main',
+                                             'youtube-queue = youtube_utils.work_queue:main'],
+                        },
 
     # Unit tests; they are initiated via 'python setup.py test'
     #test_suite       = 'json_to_relation/test',
@@ -0,0 +1,332 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Repeatable benchmarks of YoutubeHelper against a local
+MockYoutubeServer, so that performance can be measured
+without network, API key, or quota, and compared across
+commits:
+
+    python -m youtube_utils.benchmarks run --sizes 1,100,10000 --output before.json
+    ... change code ...
+    python -m youtube_utils.benchmarks run --sizes 1,100,10000 --output after.json
+    python -m youtube_utils.benchmarks compare before.json after.json
+
+Each benchmark is run --repeat times per size; the report holds
+all timings, and their minimum and median. compare exits with
+status 1 if any median slowed down by more than --threshold.
+
+Sizes are numbers of videos (of search results for
+search_pagination). get_video_info makes one request per
+video, so large sizes take correspondingly long. The startup
+benchmarks import and service_build do the same work at
+every size: importing youtube_utils in a fresh interpreter,
+and building one service object from the already parsed
+discovery document.
+'''
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .mock_api import MockYoutubeServer
+from .youtube_utils import YoutubeHelper
+
+# Video info retrieved by the video benchmarks:
+BENCHMARK_FIELDS = ['videoTitle', 'channelTitle', 'pubDate', 'duration', 'captionsAvailable']
+
+DEFAULT_SIZES = [1, 100, 1000]
+
+#-----------------------
+# The benchmarks
+#---------
+# Each is called as bench(helper, server, video_ids, workdir)
+# within the timed region, and returns the number of items
+# it processed: videos, search results, or caption files.
+
+def bench_get_video_info(helper, server, video_ids, workdir):
+    for video_id in video_ids:
+        helper.get_video_info(BENCHMARK_FIELDS, video_id)
+    return len(video_ids)
+
+def bench_get_video_info_bulk(helper, server, video_ids, workdir):
+    return len(list(helper.get_video_info_bulk(BENCHMARK_FIELDS, video_ids)))
+
+def bench_get_video_info_stream(helper, server, video_ids, workdir):
+    return sum(1 for _info in helper.iter_video_info_stream(BENCHMARK_FIELDS, video_ids))
+
+def bench_get_video_info_concurrent(helper, server, video_ids, workdir):
+    return len(list(helper.get_video_info_concurrent(BENCHMARK_FIELDS, video_ids)))
+
+def bench_parse_api_result(helper, server, video_ids, workdir):
+    # Parsing alone; the response is built outside the timed region:
+    res = workdir['response']
+    return len(helper.parse_api_result(res, helper.query_plan(BENCHMARK_FIELDS, include_id=True)))
+
+def bench_parse_api_result_generic(helper, server, video_ids, workdir):
+    return len(helper.parse_api_result(workdir['response']))
+
+def bench_search_pagination(helper, server, video_ids, workdir):
+    return len(list(helper.iter_search('benchmark', 'videoId', limit=len(video_ids))))
+
+def bench_caption_download(helper, server, video_ids, workdir):
+    outdir = tempfile.mkdtemp(dir=workdir['dir'])
+    return len(list(helper.get_caption_files_concurrent(video_ids, outdir=outdir)))
+
+def bench_import(helper, server, video_ids, workdir):
+    # Includes the start of the interpreter:
+    subprocess.check_call([sys.executable, '-c', 'import youtube_utils.youtube_utils'],
+                          cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return 1
+
+def bench_construction(helper, server, video_ids, workdir):
+    for _video_id in video_ids:
+        YoutubeHelper(referer='benchmark', api_key='benchmark', api_endpoint=server.api_endpoint)
+    return len(video_ids)
+
+def bench_service_build(helper, server, video_ids, workdir):
+    YoutubeHelper(referer='benchmark', api_key='benchmark', api_endpoint=server.api_endpoint).service
+    return 1
+
+BENCHMARKS = {
+              'get_video_info'            : bench_get_video_info,
+              'get_video_info_bulk'       : bench_get_video_info_bulk,
+              'get_video_info_stream'     : bench_get_video_info_stream,
+              'get_video_info_concurrent' : bench_get_video_info_concurrent,
+              'parse_api_result'          : bench_parse_api_result,
+              'parse_api_result_generic'  : bench_parse_api_result_generic,
+              'search_pagination'         : bench_search_pagination,
+              'caption_download'          : bench_caption_download,
+              'import'                    : bench_import,
+              'construction'              : bench_construction,
+              'service_build'             : bench_service_build,
+              }
+
+#-----------------------
+# run_benchmarks
+#---------
+
+def run_benchmarks(names=None,
+                   sizes=None,
+                   repeat=3,
+                   latency=0.0,
+                   pooled=False,
+                   num_workers=None,
+                   progress_fd=sys.stderr):
+    '''
+    Run benchmarks against a fresh MockYoutubeServer.
+
+    :param names: benchmarks to run; default: all, see BENCHMARKS
+    :type names: [str]
+    :param sizes: number of videos per run
+    :type sizes: [int]
+    :param repeat: runs per benchmark and size
+    :type repeat: int
+    :param latency: seconds the mock server delays each answer
+    :type latency: float
+    :param pooled: use a PooledHttp transport, rather than httplib2
+    :type pooled: bool
+    :param num_workers: threads of the concurrent methods
+    :type num_workers: int
+    :param progress_fd: where a line per result goes; None for silence
+    :type progress_fd: file
+    :returns the report: run conditions under 'meta', and one
+        dict per benchmark and size under 'results'
+    :rtype { str : <any> }
+    '''
+    names = names if names is not None else list(BENCHMARKS.keys())
+    sizes = sizes if sizes is not None else DEFAULT_SIZES
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError("Unknown benchmark '%s'; available: %s" % (name, ', '.join(BENCHMARKS.keys())))
+
+    report = {'meta' : {'timestamp'   : datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                        'commit'      : _git_commit(),
+                        'python'      : platform.python_version(),
+                        'platform'    : platform.platform(),
+                        'latency'     : latency,
+                        'transport'   : 'pooled' if pooled else 'httplib2',
+                        'num_workers' : num_workers or YoutubeHelper.DEFAULT_NUM_WORKERS,
+                        'repeat'      : repeat},
+              'results' : []}
+    http = None
+    if pooled:
+        from .transport import PooledHttp
+        http = PooledHttp()
+    workdir = {'dir' : tempfile.mkdtemp(prefix='youtube_utils_bench')}
+    try:
+        with MockYoutubeServer(latency=latency, seed=0) as server:
+            with YoutubeHelper(referer='benchmark',
+                               api_key='benchmark',
+                               num_workers=num_workers,
+                               http=http,
+                               api_endpoint=server.api_endpoint) as helper:
+                # Not part of any measurement:
+                helper.get_video_info(BENCHMARK_FIELDS, 'warmup')
+                for size in sizes:
+                    video_ids = ['vid%07d' % i for i in range(size)]
+                    server.search_results = size
+                    workdir['response'] = {'items' : [server.video_item(video_id) for video_id in video_ids]}
+                    for name in names:
+                        result = _run_one(name, helper, server, video_ids, workdir, repeat)
+                        report['results'].append(result)
+                        if progress_fd is not None:
+                            progress_fd.write('%-26s %8s  median %9.4fs  %12.1f items/s  %6s requests\n' %
+                                              (name, size, result['median_s'], result['items_per_s'], result['requests']))
+                            progress_fd.flush()
+    finally:
+        shutil.rmtree(workdir['dir'], ignore_errors=True)
+        if http is not None:
+            http.close()
+    return report
+
+#-----------------------
+# compare
+#---------
+
+def compare(old_report, new_report, threshold=0.10):
+    '''
+    Compare the medians of two reports, for the benchmarks
+    and sizes they have in common.
+
+    :param old_report: the baseline
+    :type old_report: { str : <any> }
+    :param new_report: the report to check
+    :type new_report: { str : <any> }
+    :param threshold: slowdown, as a fraction, above which a
+        benchmark counts as regressed
+    :type threshold: float
+    :returns one row per benchmark and size: name, size, old median,
+        new median, new/old ratio, regressed flag
+    :rtype [(str, int, float, float, float, bool)]
+    '''
+    old_results = {(result['name'], result['size']) : result for result in old_report['results']}
+    rows = []
+    for result in new_report['results']:
+        old = old_results.get((result['name'], result['size']))
+        if old is None:
+            continue
+        ratio = result['median_s'] / old['median_s'] if old['median_s'] > 0 else float('inf')
+        rows.append((result['name'],
+                     result['size'],
+                     old['median_s'],
+                     result['median_s'],
+                     ratio,
+                     ratio > 1 + threshold))
+    return rows
+
+#-----------------------
+# main
+#---------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m youtube_utils.benchmarks',
+                                     description='Benchmark YoutubeHelper against a local mock API server.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser('run', help='run benchmarks, and write a JSON report')
+    run_parser.add_argument('-b', '--benchmarks',
+                            help='comma separated benchmark names; default: all. Available: %s' %
+                                 ','.join(BENCHMARKS.keys()),
+                            default=None)
+    run_parser.add_argument('-s', '--sizes',
+                            help='comma separated numbers of videos; default: %s' %
+                                 ','.join(str(size) for size in DEFAULT_SIZES),
+                            default=None)
+    run_parser.add_argument('-r', '--repeat', type=int, help='runs per benchmark and size; default: 3', default=3)
+    run_parser.add_argument('-l', '--latency', type=float, help='seconds of mock server latency; default: 0', default=0.0)
+    run_parser.add_argument('-w', '--workers', type=int, help='threads of the concurrent methods', default=None)
+    run_parser.add_argument('--pooled', action='store_true', help='use the PooledHttp transport')
+    run_parser.add_argument('-o', '--output', help='report file; default: stdout', default=None)
+
+    compare_parser = subparsers.add_parser('compare', help='compare two reports')
+    compare_parser.add_argument('old_report')
+    compare_parser.add_argument('new_report')
+    compare_parser.add_argument('-t', '--threshold',
+                                type=float,
+                                help='slowdown fraction that counts as regression; default: 0.1',
+                                default=0.10)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        report = run_benchmarks(names=args.benchmarks.split(',') if args.benchmarks else None,
+                                sizes=[int(size) for size in args.sizes.split(',')] if args.sizes else None,
+                                repeat=args.repeat,
+                                latency=args.latency,
+                                pooled=args.pooled,
+                                num_workers=args.workers)
+        if args.output is None:
+            json.dump(report, sys.stdout, indent=1)
+            sys.stdout.write('\n')
+        else:
+            with open(args.output, 'w') as fd:
+                json.dump(report, fd, indent=1)
+        return 0
+
+    with open(args.old_report, 'r') as fd:
+        old_report = json.load(fd)
+    with open(args.new_report, 'r') as fd:
+        new_report = json.load(fd)
+    rows = compare(old_report, new_report, args.threshold)
+    print('%-26s %8s %12s %12s %8s' % ('benchmark', 'size', 'old median', 'new median', 'ratio'))
+    for (name, size, old_median, new_median, ratio, regressed) in rows:
+        print('%-26s %8s %12.4f %12.4f %8.2f%s' % (name, size, old_median, new_median, ratio,
+                                                   '  REGRESSED' if regressed else ''))
+    return 1 if any(row[5] for row in rows) else 0
+
+#--------------------------------- Private Utility Methods ------------
+
+#-----------------------
+# _run_one
+#---------
+
+def _run_one(name, helper, server, video_ids, workdir, repeat):
+    '''
+    Time repeat runs of one benchmark at one size.
+    '''
+    bench = BENCHMARKS[name]
+    times = []
+    for _i in range(repeat):
+        server.reset_counters()
+        start = time.perf_counter()
+        num_items = bench(helper, server, video_ids, workdir)
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+    return {'name'        : name,
+            'size'        : len(video_ids),
+            'items'       : num_items,
+            'times_s'     : times,
+            'min_s'       : min(times),
+            'median_s'    : median,
+            'items_per_s' : num_items / median if median > 0 else 0.0,
+            # Of the last run:
+            'requests'    : sum(server.num_requests.values()),
+            'bytes'       : server.bytes_sent}
+
+#-----------------------
+# _git_commit
+#---------
+
+def _git_commit():
+    '''
+    Return the commit of the source tree this module is
+    in, or None if it is not in a git work tree.
+    '''
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils.benchmarks import BENCHMARKS, compare, main, run_benchmarks
+
+DO_ALL = True
+
+class BenchmarksTest(unittest.TestCase):
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_run_benchmarks(self):
+        report = run_benchmarks(sizes=[1, 3], repeat=1, progress_fd=None)
+        self.assertEqual(len(report['results']), 2 * len(BENCHMARKS))
+        self.assertEqual(report['meta']['repeat'], 1)
+        for result in report['results']:
+            if result['name'] in ('import', 'service_build'):
+                self.assertEqual(result['items'], 1)
+            elif result['name'] != 'caption_download':
+                self.assertEqual(result['items'], result['size'])
+            self.assertTrue(result['median_s'] >= 0)
+        requests = {(result['name'], result['size']) : result['requests'] for result in report['results']}
+        self.assertEqual(requests[('get_video_info', 3)], 3)
+        self.assertEqual(requests[('get_video_info_bulk', 3)], 1)
+        self.assertEqual(requests[('parse_api_result', 3)], 0)
+        # Neither construction nor building a service
+        # contacts the API:
+        self.assertEqual(requests[('construction', 3)], 0)
+        self.assertEqual(requests[('service_build', 3)], 0)
+        
+        with self.assertRaises(ValueError):
+            run_benchmarks(names=['no_such_benchmark'], progress_fd=None)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_compare(self):
+        old = {'results' : [{'name' : 'a', 'size' : 1, 'median_s' : 1.0},
+                            {'name' : 'b', 'size' : 1, 'median_s' : 1.0}]}
+        new = {'results' : [{'name' : 'a', 'size' : 1, 'median_s' : 1.05},
+                            {'name' : 'b', 'size' : 1, 'median_s' : 1.5},
+                            {'name' : 'c', 'size' : 1, 'median_s' : 1.0}]}
+        rows = compare(old, new, threshold=0.1)
+        self.assertEqual([(row[0], row[5]) for row in rows], [('a', False), ('b', True)])
+        
+        tmpdir = tempfile.mkdtemp()
+        try:
+            (old_path, new_path) = (os.path.join(tmpdir, 'old.json'), os.path.join(tmpdir, 'new.json'))
+            for (path, report) in ((old_path, old), (new_path, new)):
+                with open(path, 'w') as fd:
+                    json.dump(report, fd)
+            self.assertEqual(main(['compare', old_path, new_path]), 1)
+            self.assertEqual(main(['compare', old_path, new_path, '--threshold', '0.6']), 0)
+        finally:
+            shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
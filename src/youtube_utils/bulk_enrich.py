@@ -0,0 +1,420 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Command line tool that retrieves video info for any number
+of YouTube video IDs. IDs are read one per line from a file
+or stdin, cut into chunks, and the chunks are spread over a
+pool of worker processes, each with its own YoutubeHelper.
+Results are written as JSON lines, or as a directory of
+Parquet files, one per chunk. Either way, and in the file of
+missing IDs, they are in the order of the input IDs, however
+the workers' chunks happen to finish.
+
+Progress is checkpointed after every chunk. A run that is
+interrupted and restarted with the same arguments skips the
+chunks already written, and truncates any partial output of
+the chunk that was in progress.
+
+Example:
+    youtube-enrich --fields videoTitle,duration,pubDate \\
+                   --processes 8 \\
+                   --output /data/videos.jsonl \\
+                   video_ids.txt
+
+Durations are written as integer seconds.
+'''
+import argparse
+from collections import deque
+from datetime import timedelta
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+from .youtube_utils import YoutubeHelper
+
+# Videos per chunk, unless given on the command line.
+# A chunk is the unit of work of one worker, and the
+# unit of checkpointing:
+DEFAULT_CHUNK_SIZE = 10 * YoutubeHelper.BULK_BATCH_SIZE
+
+# Helper of a worker process, created by _init_worker():
+_worker_helper = None
+_worker_fields = None
+_worker_format = None
+
+#-----------------------
+# main
+#---------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]),
+                                     formatter_class=argparse.RawTextHelpFormatter,
+                                     description='Retrieve YouTube video info for many video IDs.'
+                                     )
+    parser.add_argument('-f', '--fields',
+                        help='comma separated video info names; default: %s.\n' % ','.join(YoutubeHelper.DEFAULT_VIDEO_INFO) +
+                             'Available: %s' % ','.join(sorted(YoutubeHelper.video_info_names.keys())),
+                        default=None)
+    parser.add_argument('-o', '--output',
+                        help='output file (jsonl), or directory (parquet); rows are in input order',
+                        required=True)
+    parser.add_argument('--format',
+                        choices=['jsonl', 'parquet'],
+                        help='output format; default: jsonl',
+                        default='jsonl')
+    parser.add_argument('-p', '--processes',
+                        type=int,
+                        help='number of worker processes; 0 runs in this process. Default: number of cores',
+                        default=multiprocessing.cpu_count())
+    parser.add_argument('--chunk-size',
+                        type=int,
+                        help='videos per chunk of work; default: %s' % DEFAULT_CHUNK_SIZE,
+                        default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--checkpoint',
+                        help='checkpoint file; default: <output>.checkpoint',
+                        default=None)
+    parser.add_argument('--missing',
+                        help='file to which IDs without video info are appended',
+                        default=None)
+    parser.add_argument('--referer',
+                        help='referer associated with the API key; default: mooc-analyzer',
+                        default='mooc-analyzer')
+    parser.add_argument('--api-key',
+                        help='Google API key; default: contents of ~/.ssh/googleApiKey.txt',
+                        default=None)
+    parser.add_argument('id_file',
+                        nargs='?',
+                        help='file with one video ID per line; default: stdin',
+                        default='-')
+    args = parser.parse_args(argv)
+
+    fields = args.fields.split(',') if args.fields is not None \
+             else YoutubeHelper.DEFAULT_VIDEO_INFO
+    for field in fields:
+        if field not in YoutubeHelper.video_info_names:
+            parser.error("Unknown video info '%s'" % field)
+
+    total = None
+    if args.id_file == '-':
+        id_fd = sys.stdin
+    else:
+        id_fd = open(args.id_file, 'r')
+        total = sum(1 for _line in id_fd)
+        id_fd.seek(0)
+
+    try:
+        enrich(id_fd,
+               args.output,
+               fields,
+               output_format=args.format,
+               processes=args.processes,
+               chunk_size=args.chunk_size,
+               checkpoint_path=args.checkpoint,
+               missing_path=args.missing,
+               helper_args=(args.referer, args.api_key),
+               total=total)
+    finally:
+        if id_fd is not sys.stdin:
+            id_fd.close()
+
+#-----------------------
+# enrich
+#---------
+
+def enrich(id_lines,
+           output_path,
+           fields,
+           output_format='jsonl',
+           processes=0,
+           chunk_size=DEFAULT_CHUNK_SIZE,
+           checkpoint_path=None,
+           missing_path=None,
+           helper_args=('mooc-analyzer', None),
+           helper_factory=None,
+           total=None,
+           progress_fd=sys.stderr):
+    '''
+    Retrieve the given fields for all video IDs in id_lines, and
+    write them to output_path in the order of id_lines. See the
+    module comment.
+
+    :param id_lines: video IDs, one per string; blank lines are skipped
+    :type id_lines: iterable of str
+    :param output_path: JSON lines file, or directory for Parquet files
+    :type output_path: str
+    :param fields: video info names
+    :type fields: [str]
+    :param output_format: 'jsonl' or 'parquet'
+    :type output_format: str
+    :param processes: number of worker processes; 0 works in this process
+    :type processes: int
+    :param chunk_size: videos per unit of work and of checkpointing
+    :type chunk_size: int
+    :param checkpoint_path: checkpoint file; default: <output_path>.checkpoint
+    :type checkpoint_path: str
+    :param missing_path: file to which IDs without video info are appended
+    :type missing_path: str
+    :param helper_args: referer and API key for each worker's YoutubeHelper
+    :type helper_args: (str, str)
+    :param helper_factory: callable returning the helper; called in each
+        worker process, so it must be picklable where processes are spawned
+    :type helper_factory: callable
+    :param total: number of IDs, if known, for the ETA
+    :type total: int
+    :param progress_fd: where progress lines go; None for silence
+    :type progress_fd: file
+    :returns number of videos written by this run
+    :rtype int
+    '''
+    if checkpoint_path is None:
+        checkpoint_path = output_path.rstrip(os.sep) + '.checkpoint'
+    done_chunks = _resume(checkpoint_path, output_path, output_format)
+    if output_format == 'parquet' and not os.path.isdir(output_path):
+        os.makedirs(output_path)
+
+    chunks = _chunks(id_lines, chunk_size, done_chunks)
+
+    pool = None
+    if processes > 0:
+        # Workers inherit the parsed discovery document:
+        YoutubeHelper.preload_discovery()
+        pool = multiprocessing.Pool(processes,
+                                    initializer=_init_worker,
+                                    initargs=(helper_args, fields, output_format, None, helper_factory))
+        # At most this many chunks are read ahead of the
+        # workers, so that input of any size takes bounded memory:
+        results = _pool_results(pool, chunks, 2 * processes)
+    else:
+        _init_worker(helper_args, fields, output_format, None, helper_factory)
+        results = (_enrich_chunk(chunk) for chunk in chunks)
+
+    progress = _Progress(total, len(done_chunks) * chunk_size, progress_fd)
+    num_written = 0
+    out_fd = open(output_path, 'ab') if output_format == 'jsonl' else None
+    try:
+        with open(checkpoint_path, 'a') as checkpoint_fd:
+            for (chunk_index, num_ids, result, missing) in results:
+                if output_format == 'jsonl':
+                    out_fd.write(result)
+                    out_fd.flush()
+                    os.fsync(out_fd.fileno())
+                    offset = out_fd.tell()
+                else:
+                    if result is not None:
+                        result.to_parquet(os.path.join(output_path, 'part-%07d.parquet' % chunk_index))
+                    offset = 0
+                if missing_path is not None and len(missing) > 0:
+                    with open(missing_path, 'a') as missing_fd:
+                        missing_fd.write(''.join(video_id + '\n' for video_id in missing))
+                checkpoint_fd.write('%s %s\n' % (chunk_index, offset))
+                checkpoint_fd.flush()
+                os.fsync(checkpoint_fd.fileno())
+                num_written += num_ids - len(missing)
+                progress.update(num_ids)
+    finally:
+        if out_fd is not None:
+            out_fd.close()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    progress.finish()
+    return num_written
+
+#--------------------------------- Private Utility Methods ------------
+
+#-----------------------
+# _resume
+#---------
+
+def _resume(checkpoint_path, output_path, output_format):
+    '''
+    Read the checkpoint of an earlier run, if any, and remove
+    output written after its last entry.
+
+    :returns indexes of the chunks that are completely written
+    :rtype set(int)
+    '''
+    done_chunks = set()
+    max_offset = 0
+    try:
+        with open(checkpoint_path, 'r') as fd:
+            for line in fd:
+                try:
+                    (chunk_index, offset) = line.split()
+                    done_chunks.add(int(chunk_index))
+                    max_offset = max(max_offset, int(offset))
+                except ValueError:
+                    # Partially written last line:
+                    pass
+    except IOError:
+        return done_chunks
+    if output_format == 'jsonl' and os.path.exists(output_path):
+        with open(output_path, 'ab') as fd:
+            fd.truncate(max_offset)
+    return done_chunks
+
+#-----------------------
+# _chunks
+#---------
+
+def _chunks(id_lines, chunk_size, done_chunks):
+    '''
+    Generator of (chunk_index, [video_id, ...]) tuples. Chunks
+    in done_chunks are skipped.
+    '''
+    chunk_index = 0
+    chunk = []
+    for line in id_lines:
+        video_id = line.strip()
+        if len(video_id) == 0:
+            continue
+        chunk.append(video_id)
+        if len(chunk) >= chunk_size:
+            if chunk_index not in done_chunks:
+                yield (chunk_index, chunk)
+            chunk_index += 1
+            chunk = []
+    if len(chunk) > 0 and chunk_index not in done_chunks:
+        yield (chunk_index, chunk)
+
+#-----------------------
+# _pool_results
+#---------
+
+def _pool_results(pool, chunks, max_in_flight):
+    '''
+    Generator of the _enrich_chunk() results of a pool, in the
+    order of the chunks. Results that finish early are held
+    until those of all earlier chunks are yielded. Chunks are
+    read and submitted from the calling thread, never more than
+    max_in_flight ahead of the results yielded. No pool thread
+    waits for the consumer, so the pool can be terminated at
+    any time, such as after a worker failed.
+
+    :raise the exception of the first failed chunk
+    '''
+    # Results and exceptions, as they arrive:
+    done = queue.Queue()
+    # Indexes of the chunks submitted but not yet
+    # yielded, in input order:
+    submitted = deque()
+    # Results that arrived ahead of an earlier chunk's:
+    finished = {}
+    chunks = iter(chunks)
+    exhausted = False
+    while True:
+        while not exhausted and len(submitted) < max_in_flight:
+            chunk = next(chunks, None)
+            if chunk is None:
+                exhausted = True
+                break
+            pool.apply_async(_enrich_chunk, (chunk,), callback=done.put, error_callback=done.put)
+            submitted.append(chunk[0])
+        if len(submitted) == 0:
+            return
+        while submitted[0] not in finished:
+            result = done.get()
+            if isinstance(result, BaseException):
+                raise result
+            finished[result[0]] = result
+        yield finished.pop(submitted.popleft())
+
+#-----------------------
+# _init_worker
+#---------
+
+def _init_worker(helper_args, fields, output_format, helper=None, helper_factory=None):
+    '''
+    Create the YoutubeHelper of a worker process.
+    '''
+    global _worker_helper, _worker_fields, _worker_format
+    if helper is None:
+        helper = helper_factory() if helper_factory is not None else YoutubeHelper(*helper_args)
+    _worker_helper = helper
+    _worker_fields = fields
+    _worker_format = output_format
+
+#-----------------------
+# _enrich_chunk
+#---------
+
+def _enrich_chunk(chunk_spec):
+    '''
+    Retrieve the video info of one chunk. For jsonl output
+    the result is the encoded lines, so that the parent only
+    needs to write bytes. For parquet it is a ColumnarResult,
+    or None if no video of the chunk had info.
+
+    :returns chunk index, number of IDs in the chunk, result, missing IDs
+    :rtype (int, int, { bytes | ColumnarResult }, [str])
+    '''
+    (chunk_index, video_ids) = chunk_spec
+    missing = []
+    if _worker_format == 'parquet':
+        result = _worker_helper.get_video_info_columnar(_worker_fields, video_ids, missing_ids=missing)
+        if len(result) == 0:
+            result = None
+    else:
+        lines = [json.dumps(info, default=_json_value) + '\n'
+                 for info in _worker_helper.get_video_info_bulk(_worker_fields, video_ids, missing_ids=missing)]
+        result = ''.join(lines).encode('utf-8')
+    return (chunk_index, len(video_ids), result, missing)
+
+#-----------------------
+# _json_value
+#---------
+
+def _json_value(value):
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    return str(value)
+
+#-----------------------
+# _Progress
+#---------
+
+class _Progress(object):
+    '''
+    Prints videos done, throughput, and ETA to
+    progress_fd, at most once per REPORT_INTERVAL.
+    '''
+
+    REPORT_INTERVAL = 2.0
+
+    def __init__(self, total, already_done, progress_fd):
+        self.total        = total
+        self.done         = already_done
+        self.done_here    = 0
+        self.progress_fd  = progress_fd
+        self.start        = time.time()
+        self.last_report  = 0
+
+    def update(self, num_ids):
+        self.done += num_ids
+        self.done_here += num_ids
+        now = time.time()
+        if now - self.last_report >= _Progress.REPORT_INTERVAL:
+            self.last_report = now
+            self._report(now)
+
+    def finish(self):
+        self._report(time.time())
+
+    def _report(self, now):
+        if self.progress_fd is None:
+            return
+        rate = self.done_here / max(now - self.start, 1e-6)
+        line = '%12s videos  %9.1f videos/s' % ('{:,}'.format(self.done), rate)
+        if self.total is not None and rate > 0:
+            remaining = max(0, self.total - self.done) / rate
+            line += '  ETA %s' % timedelta(seconds=int(remaining))
+        self.progress_fd.write(line + '\n')
+        self.progress_fd.flush()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+from datetime import timedelta
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils.bulk_enrich import enrich
+
+DO_ALL = True
+
+class FakeHelper(object):
+    '''
+    Stands in for YoutubeHelper. Videos whose ID starts
+    with 'gone' have no info, and those whose ID starts
+    with 'slow' take a while. Raises after fail_after
+    videos, to simulate a crash.
+    '''
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.requested = []
+
+    def get_video_info_bulk(self, param_arr, video_ids, referer=None, missing_ids=None):
+        for video_id in video_ids:
+            if self.fail_after is not None and len(self.requested) >= self.fail_after:
+                raise ValueError('Simulated crash')
+            self.requested.append(video_id)
+            if video_id.startswith('slow'):
+                time.sleep(0.5)
+            if video_id.startswith('gone'):
+                missing_ids.append(video_id)
+                continue
+            yield {'videoId' : video_id, 'videoTitle' : 'Title %s' % video_id, 'duration' : timedelta(seconds=90)}
+
+def failing_helper():
+    '''
+    Helper factory for worker processes: each
+    worker's helper fails on its second video.
+    '''
+    return FakeHelper(fail_after=1)
+
+def fake_helper():
+    return FakeHelper()
+
+class BulkEnrichTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='youtube_utils_enrich_test')
+        self.out_path = os.path.join(self.tmp_dir, 'videos.jsonl')
+        self.missing_path = os.path.join(self.tmp_dir, 'missing.txt')
+        self.ids = ['vid%s\n' % i for i in range(10)] + ['gone1\n', '\n', 'vid10\n']
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def run_enrich(self, helper):
+        return enrich(self.ids,
+                      self.out_path,
+                      ['videoTitle', 'duration'],
+                      chunk_size=3,
+                      missing_path=self.missing_path,
+                      helper_factory=lambda: helper,
+                      progress_fd=io.StringIO())
+
+    def read_output(self):
+        with open(self.out_path, 'r') as fd:
+            return [json.loads(line) for line in fd]
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_enrich(self):
+        self.assertEqual(self.run_enrich(FakeHelper()), 11)
+        rows = self.read_output()
+        self.assertEqual([row['videoId'] for row in rows], ['vid%s' % i for i in range(11)])
+        self.assertEqual(rows[0]['duration'], 90)
+        with open(self.missing_path, 'r') as fd:
+            self.assertEqual(fd.read(), 'gone1\n')
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_resume_after_crash(self):
+        # Crashes within the third chunk:
+        with self.assertRaises(ValueError):
+            self.run_enrich(FakeHelper(fail_after=7))
+        self.assertEqual(len(self.read_output()), 6)
+
+        # Simulate a chunk that was written, but not checkpointed:
+        with open(self.out_path, 'a') as fd:
+            fd.write('{"videoId": "vid6"}\n{"video')
+
+        helper = FakeHelper()
+        self.assertEqual(self.run_enrich(helper), 5)
+        self.assertEqual(helper.requested, ['vid6', 'vid7', 'vid8', 'vid9', 'gone1', 'vid10'])
+        self.assertEqual([row['videoId'] for row in self.read_output()], ['vid%s' % i for i in range(11)])
+
+        # Nothing left to do:
+        helper = FakeHelper()
+        self.assertEqual(self.run_enrich(helper), 0)
+        self.assertEqual(helper.requested, [])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_input_order_with_processes(self):
+        # The first chunk finishes last:
+        self.ids = ['slow0\n', 'gone0\n'] + ['vid%s\n' % i for i in range(10)] + ['gone1\n', 'vid10\n']
+        num_written = enrich(self.ids,
+                             self.out_path,
+                             ['videoTitle'],
+                             processes=2,
+                             chunk_size=2,
+                             missing_path=self.missing_path,
+                             helper_factory=fake_helper,
+                             progress_fd=io.StringIO())
+        self.assertEqual(num_written, 12)
+        self.assertEqual([row['videoId'] for row in self.read_output()],
+                         ['slow0'] + ['vid%s' % i for i in range(11)])
+        with open(self.missing_path, 'r') as fd:
+            self.assertEqual(fd.read(), 'gone0\ngone1\n')
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_worker_failure_with_chunks_waiting(self):
+        # Far more chunks than are read ahead of the
+        # two workers:
+        self.ids = ['vid%s\n' % i for i in range(5000)]
+        outcome = []
+        def run():
+            try:
+                enrich(self.ids,
+                       self.out_path,
+                       ['videoTitle'],
+                       processes=2,
+                       chunk_size=2,
+                       helper_factory=failing_helper,
+                       progress_fd=io.StringIO())
+            except ValueError as e:
+                outcome.append(e)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(60)
+        self.assertFalse(thread.is_alive(), 'enrich() hangs after a worker failed')
+        self.assertEqual(len(outcome), 1)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,994 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Parsing and storage of caption file content.
+
+The parsers read caption files in the formats of CaptionFormat
+(sbv, scc, srt, ttml, vtt) incrementally: each is a generator
+over Cue tuples (start_ms, end_ms, text), and holds no more
+than one cue's worth of the file in memory:
+
+    with open('Hlfeeqf5tdc_en.srt', 'r') as fd:
+        for cue in parse_captions(fd, 'srt'):
+            print(cue.start_ms, cue.text)
+
+write_captions() writes cues in any of sbv, srt, ttml, vtt, or
+plain text (txt), as they come. Parser and writer together convert
+a file without holding it in memory:
+
+    with open('Hlfeeqf5tdc_en.srt', 'r') as in_fd, open('Hlfeeqf5tdc_en.vtt', 'w') as out_fd:
+        write_captions(parse_captions(in_fd, 'srt'), out_fd, 'vtt')
+
+A CueStore keeps the cues of many videos on disk, one file per
+video and language, memory-mapped when read. Cues are sorted by
+start time, so finding the cues of a time range is a binary
+search:
+
+    store = CueStore('/var/lib/mooc/cues')
+    store.add_file('Hlfeeqf5tdc', 'Hlfeeqf5tdc_en.srt', language='en')
+    store.text_between('Hlfeeqf5tdc', '10:00', '12:30', language='en')
+'''
+from array import array
+from collections import namedtuple
+import bisect
+import html
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+from xml.sax.saxutils import escape as xml_escape
+import xml.etree.ElementTree as ET
+
+# One caption cue. Times are milliseconds from the
+# start of the video:
+Cue = namedtuple('Cue', ['start_ms', 'end_ms', 'text'])
+
+# Markup within cue text. Only the tags each format defines
+# are removed, so that text such as '<applause>' survives.
+# SubRip: <i>, <b>, <u>, and <font color=...>:
+SRT_TAG_PATTERN = re.compile(r'</?[ibu]>|<font(?:\s[^<>]*)?>|</font>', re.IGNORECASE)
+# WebVTT: <c.colorE5E5E5>, <i>, <b>, <u>, <ruby>, <rt>, with
+# optional classes, <v Speaker> and <lang en> with annotations,
+# and the <00:00:01.000> karaoke timestamps:
+VTT_TAG_PATTERN = re.compile(r'</?(?:[ibuc]|ruby|rt)(?:\.[\w.-]*)?>'
+                             r'|</?(?:v|lang)(?:\.[\w.-]*)?(?:\s[^<>]*)?>'
+                             r'|<(?:\d+:)?\d+:\d+\.\d+>')
+
+# [[HH:]MM:]SS[.,:;]fff as used by srt, sbv, and vtt:
+CLOCK_PATTERN = re.compile(r'^(?:(?:(\d+):)?(\d+):)?(\d+)(?:[.,](\d+))?$')
+
+#-----------------------
+# timestamp_ms
+#---------
+
+def timestamp_ms(timestamp):
+    '''
+    Convert a clock time such as '1:02:03.5', '10:00', '00:01,250',
+    or '75', to milliseconds. Integers are taken to be milliseconds
+    already, and are returned unchanged.
+
+    :param timestamp: clock time, or milliseconds
+    :type timestamp: { str | int }
+    :returns milliseconds
+    :rtype int
+    :raise ValueError if timestamp is not a clock time
+    '''
+    if isinstance(timestamp, int):
+        return timestamp
+    match = CLOCK_PATTERN.match(timestamp.strip())
+    if match is None:
+        raise ValueError("Not a time stamp: '%s'" % timestamp)
+    (hours, minutes, seconds, fraction) = match.groups()
+    ms = ((int(hours or 0) * 60 + int(minutes or 0)) * 60 + int(seconds)) * 1000
+    if fraction:
+        ms += int((fraction + '00')[:3])
+    return ms
+
+#-----------------------
+# parse_captions
+#---------
+
+def parse_captions(fd, caption_format):
+    '''
+    Generator over the cues of a caption file.
+
+    :param fd: file opened for reading text; for ttml, a binary
+        file works as well
+    :type fd: file
+    :param caption_format: one of the CaptionFormat names, or None
+        to guess the format from the file's first line
+    :type caption_format: { str | CaptionFormat | None }
+    :returns generator of cues, in file order
+    :rtype Cue
+    :raise ValueError if the format is not supported
+    '''
+    caption_format = getattr(caption_format, 'caption_format', caption_format)
+    if caption_format is None:
+        (caption_format, fd) = _sniff_format(fd)
+    try:
+        parser = CAPTION_PARSERS[caption_format]
+    except KeyError:
+        raise ValueError("Unknown caption format: '%s'" % caption_format)
+    return parser(fd)
+
+#-----------------------
+# caption_format_of
+#---------
+
+def caption_format_of(path):
+    '''
+    Return the caption format implied by a file's extension,
+    or None if the extension is not that of a caption format,
+    such as the .orig of files in their native format.
+    '''
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    return extension if extension in CAPTION_PARSERS else None
+
+#-----------------------
+# parse_srt
+#---------
+
+def parse_srt(fd):
+    '''
+    Generator over the cues of a SubRip file:
+
+        1
+        00:00:01,000 --> 00:00:04,000
+        Text, on one
+        or more lines
+    '''
+    for (timing, text_lines) in _blocks(fd, '-->'):
+        (start, end) = timing.split('-->', 1)
+        yield Cue(timestamp_ms(start), timestamp_ms(end.split()[0]), _clean_text(text_lines, SRT_TAG_PATTERN))
+
+#-----------------------
+# parse_vtt
+#---------
+
+def parse_vtt(fd):
+    '''
+    Generator over the cues of a WebVTT file. Cue settings,
+    such as 'align:start', and NOTE, STYLE, and REGION blocks
+    are skipped:
+
+        WEBVTT
+
+        00:01.000 --> 00:04.000 align:start position:0%
+        Text <c>with markup</c>
+    '''
+    for (timing, text_lines) in _blocks(fd, '-->'):
+        (start, end) = timing.split('-->', 1)
+        yield Cue(timestamp_ms(start), timestamp_ms(end.split()[0]), _clean_text(text_lines, VTT_TAG_PATTERN))
+
+#-----------------------
+# parse_sbv
+#---------
+
+def parse_sbv(fd):
+    '''
+    Generator over the cues of a SubViewer file:
+
+        0:00:01.000,0:00:04.000
+        Text
+    '''
+    for (timing, text_lines) in _blocks(fd, ','):
+        (start, end) = timing.split(',', 1)
+        yield Cue(timestamp_ms(start), timestamp_ms(end), _clean_text(text_lines))
+
+#-----------------------
+# parse_ttml
+#---------
+
+def parse_ttml(fd):
+    '''
+    Generator over the cues of a TTML file: its <p> elements,
+    with begin and end or dur attributes. Elements are discarded
+    as soon as they are parsed, so that memory stays bounded for
+    large files. Begin times of enclosing <div> and <body>
+    elements are not applied; YouTube does not produce them.
+    '''
+    tick_rate = None
+    frame_rate = 30.0
+    for (event, elem) in ET.iterparse(fd, events=('start', 'end')):
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if event == 'start':
+            if tag == 'tt':
+                for (attr, value) in elem.attrib.items():
+                    attr = attr.rsplit('}', 1)[-1]
+                    if attr == 'tickRate':
+                        tick_rate = float(value)
+                    elif attr == 'frameRate':
+                        frame_rate = float(value)
+            continue
+        if tag == 'br':
+            # Text after <br/> is in its tail; mark the break:
+            elem.tail = '\n' + (elem.tail or '')
+            continue
+        if tag != 'p':
+            continue
+        begin = elem.get('begin')
+        if begin is not None:
+            start_ms = _ttml_time_ms(begin, tick_rate, frame_rate)
+            if elem.get('end') is not None:
+                end_ms = _ttml_time_ms(elem.get('end'), tick_rate, frame_rate)
+            elif elem.get('dur') is not None:
+                end_ms = start_ms + _ttml_time_ms(elem.get('dur'), tick_rate, frame_rate)
+            else:
+                end_ms = start_ms
+            # The XML parser already removed the markup,
+            # and resolved entities:
+            yield Cue(start_ms, end_ms, _clean_text(''.join(elem.itertext()).split('\n'), unescape=False))
+        elem.clear()
+
+#-----------------------
+# parse_scc
+#---------
+
+def parse_scc(fd):
+    '''
+    Generator over the cues of a Scenarist Closed Caption file:
+    lines of a SMPTE timecode followed by EIA-608 byte pairs in hex:
+
+        Scenarist_SCC V1.0
+
+        00:00:01;02	9420 9420 94ae 94ae 9452 9452 c8e5 ecec ef80 942f 942f
+
+    Pop-on captions become cues from their end-of-caption
+    command to the erase or replacement that follows. Roll-up
+    and paint-on captions become one cue per line, from the
+    line's first character to its carriage return. Only the
+    first caption channel (CC1) is decoded.
+    '''
+    decoder = _SccDecoder()
+    for line in fd:
+        parts = line.split()
+        if len(parts) < 2 or not _SCC_TIMECODE.match(parts[0]):
+            continue
+        time_ms = _scc_time_ms(parts[0])
+        for word in parts[1:]:
+            try:
+                code = int(word, 16)
+            except ValueError:
+                continue
+            for cue in decoder.feed(code >> 8, code & 0xff, time_ms):
+                yield cue
+            # Each byte pair takes one frame to transmit:
+            time_ms += 1001.0 / 30
+    for cue in decoder.flush(int(time_ms)):
+        yield cue
+
+CAPTION_PARSERS = {
+                   'sbv'  : parse_sbv,
+                   'scc'  : parse_scc,
+                   'srt'  : parse_srt,
+                   'ttml' : parse_ttml,
+                   'vtt'  : parse_vtt,
+                   }
+
+#-----------------------
+# write_captions
+#---------
+
+def write_captions(cues, fd, caption_format):
+    '''
+    Write cues to a file, one at a time as they come from
+    the iterable. Text lines are separated by newlines in
+    all formats but txt, which holds the text of one cue
+    per line, without times. SCC cannot be written.
+
+    :param cues: the cues, such as a parse_captions() generator
+    :type cues: iterable of Cue
+    :param fd: file opened for writing text
+    :type fd: file
+    :param caption_format: one of the CAPTION_WRITERS names
+    :type caption_format: { str | CaptionFormat }
+    :returns number of cues written
+    :rtype int
+    :raise ValueError if the format cannot be written
+    '''
+    caption_format = getattr(caption_format, 'caption_format', caption_format)
+    try:
+        writer = CAPTION_WRITERS[caption_format]
+    except KeyError:
+        raise ValueError("Cannot write caption format: '%s'" % caption_format)
+    return writer(cues, fd)
+
+#-----------------------
+# write_srt
+#---------
+
+def write_srt(cues, fd):
+    num_cues = 0
+    for cue in cues:
+        num_cues += 1
+        fd.write('%d\n%s --> %s\n%s\n\n' %
+                 (num_cues, _clock(cue.start_ms, ','), _clock(cue.end_ms, ','), _escaped_lines(cue.text)))
+    return num_cues
+
+#-----------------------
+# write_vtt
+#---------
+
+def write_vtt(cues, fd):
+    fd.write('WEBVTT\n\n')
+    num_cues = 0
+    for cue in cues:
+        num_cues += 1
+        fd.write('%s --> %s\n%s\n\n' %
+                 (_clock(cue.start_ms), _clock(cue.end_ms), _escaped_lines(cue.text)))
+    return num_cues
+
+#-----------------------
+# write_sbv
+#---------
+
+def write_sbv(cues, fd):
+    num_cues = 0
+    for cue in cues:
+        num_cues += 1
+        fd.write('%s,%s\n%s\n\n' %
+                 (_clock(cue.start_ms, hour_format='%d'), _clock(cue.end_ms, hour_format='%d'), _escaped_lines(cue.text)))
+    return num_cues
+
+#-----------------------
+# write_ttml
+#---------
+
+def write_ttml(cues, fd):
+    fd.write('<?xml version="1.0" encoding="utf-8" ?>\n'
+             '<tt xmlns="http://www.w3.org/ns/ttml"><body><div>\n')
+    num_cues = 0
+    for cue in cues:
+        num_cues += 1
+        fd.write('<p begin="%s" end="%s">%s</p>\n' %
+                 (_clock(cue.start_ms), _clock(cue.end_ms), '<br/>'.join(xml_escape(line)
+                                                                         for line in _cue_lines(cue.text).split('\n'))))
+    fd.write('</div></body></tt>\n')
+    return num_cues
+
+#-----------------------
+# write_txt
+#---------
+
+def write_txt(cues, fd):
+    num_cues = 0
+    for cue in cues:
+        num_cues += 1
+        text = ' '.join(_cue_lines(cue.text).split('\n'))
+        if text:
+            fd.write(text + '\n')
+    return num_cues
+
+CAPTION_WRITERS = {
+                   'sbv'  : write_sbv,
+                   'srt'  : write_srt,
+                   'ttml' : write_ttml,
+                   'txt'  : write_txt,
+                   'vtt'  : write_vtt,
+                   }
+
+
+class CueStore(object):
+    '''
+    Time-indexed cues of many videos in a directory. Each video
+    (and language) has one immutable file, replaced as a whole
+    when the video's cues are added again. A file holds, after a
+    header, these columns of little-endian uint32s, one entry per
+    cue, sorted by start time:
+
+        start_ms  end_ms  max_end_ms  text_offset  text_len
+
+    followed by the UTF-8 text of all cues. max_end_ms is the
+    largest end time of the cue and all cues before it. It never
+    decreases, so the first cue that may overlap a time range is
+    found by binary search, even if cues overlap each other.
+
+    Files are memory-mapped on first use. The store is thread safe
+    for readers; add() may run concurrently with reads of other videos.
+    '''
+
+    MAGIC = b'YTCUES01'
+    HEADER = struct.Struct('<8sI')
+    NUM_COLUMNS = 5
+    FILE_EXTENSION = '.cues'
+
+    def __init__(self, store_dir):
+        '''
+        :param store_dir: directory of the cue files; created if needed
+        :type store_dir: str
+        '''
+        self.store_dir = store_dir
+        if not os.path.isdir(store_dir):
+            os.makedirs(store_dir)
+        self.lock = threading.Lock()
+        # Open mappings, keyed by file path. Each is a tuple of
+        # the mmap, the number of cues, and the columns:
+        self.mapped = {}
+
+    #--------------------------------- Public Methods ------------
+
+    #-----------------------
+    # add
+    #---------
+
+    def add(self, video_id, cues, language=None):
+        '''
+        Store the cues of a video, replacing any stored earlier.
+        Cue text is spooled to a temporary file while the cues are
+        consumed, so only the five numbers per cue are kept in memory.
+
+        :param video_id: YouTube video id
+        :type video_id: str
+        :param cues: the video's cues, in any order
+        :type cues: iterable of Cue
+        :param language: language of the captions, if more than one
+            language is stored per video
+        :type language: str
+        :returns number of cues stored
+        :rtype int
+        '''
+        starts  = array('I')
+        ends    = array('I')
+        offsets = array('I')
+        lengths = array('I')
+        path = self._path(video_id, language)
+        with tempfile.TemporaryFile() as text_fd:
+            offset = 0
+            for cue in cues:
+                text = cue.text.encode('utf-8')
+                text_fd.write(text)
+                starts.append(cue.start_ms)
+                ends.append(max(cue.start_ms, cue.end_ms))
+                offsets.append(offset)
+                lengths.append(len(text))
+                offset += len(text)
+
+            order = sorted(range(len(starts)), key=starts.__getitem__)
+            columns = [array('I', (column[i] for i in order)) for column in (starts, ends, offsets, lengths)]
+            max_ends = array('I')
+            max_end = 0
+            for end in columns[1]:
+                max_end = max(max_end, end)
+                max_ends.append(max_end)
+            columns.insert(2, max_ends)
+
+            (fd, tmp_path) = tempfile.mkstemp(dir=self.store_dir, suffix='.part')
+            with os.fdopen(fd, 'wb') as out_fd:
+                out_fd.write(CueStore.HEADER.pack(CueStore.MAGIC, len(starts)))
+                for column in columns:
+                    if sys.byteorder != 'little':
+                        column.byteswap()
+                    column.tofile(out_fd)
+                text_fd.seek(0)
+                while True:
+                    chunk = text_fd.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    out_fd.write(chunk)
+        with self.lock:
+            self._unmap(path)
+            os.replace(tmp_path, path)
+        return len(starts)
+
+    #-----------------------
+    # add_file
+    #---------
+
+    def add_file(self, video_id, caption_path, caption_format=None, language=None):
+        '''
+        Parse a caption file, such as one written by
+        YoutubeHelper.get_caption_files(), and store its cues.
+
+        :param video_id: YouTube video id
+        :type video_id: str
+        :param caption_path: the caption file
+        :type caption_path: str
+        :param caption_format: format of the file; default: from the
+            file's extension, or from its content
+        :type caption_format: { str | CaptionFormat }
+        :param language: language of the captions
+        :type language: str
+        :returns number of cues stored
+        :rtype int
+        '''
+        if caption_format is None:
+            caption_format = caption_format_of(caption_path)
+        with open(caption_path, 'r', encoding='utf-8-sig') as fd:
+            return self.add(video_id, parse_captions(fd, caption_format), language)
+
+    #-----------------------
+    # cues_between
+    #---------
+
+    def cues_between(self, video_id, start, end, language=None):
+        '''
+        Return the cues of a video that are displayed at some
+        time between start and end.
+
+        :param video_id: YouTube video id
+        :type video_id: str
+        :param start: start of the time range: milliseconds, or a
+            clock time such as '10:00'
+        :type start: { int | str }
+        :param end: end of the time range
+        :type end: { int | str }
+        :param language: language of the captions
+        :type language: str
+        :returns the cues, ordered by start time
+        :rtype [Cue]
+        :raise KeyError if no cues are stored for the video
+        '''
+        start_ms = timestamp_ms(start)
+        end_ms   = timestamp_ms(end)
+        (mm, _num_cues, columns) = self._mapping(video_id, language)
+        (starts, ends, max_ends, offsets, lengths) = columns
+        first = bisect.bisect_right(max_ends, start_ms)
+        last  = bisect.bisect_left(starts, end_ms)
+        text_base = CueStore.HEADER.size + 4 * CueStore.NUM_COLUMNS * len(starts)
+        cues = []
+        for i in range(first, last):
+            if ends[i] <= start_ms:
+                continue
+            text_start = text_base + offsets[i]
+            cues.append(Cue(starts[i], ends[i], mm[text_start:text_start + lengths[i]].decode('utf-8')))
+        return cues
+
+    #-----------------------
+    # text_between
+    #---------
+
+    def text_between(self, video_id, start, end, language=None):
+        '''
+        Return what was said in a video between start and end:
+        the text of cues_between(), one cue per line.
+        '''
+        return '\n'.join(cue.text for cue in self.cues_between(video_id, start, end, language))
+
+    #-----------------------
+    # iter_cues
+    #---------
+
+    def iter_cues(self, video_id, language=None):
+        '''
+        Generator over all stored cues of a video, by start time.
+        '''
+        (mm, num_cues, columns) = self._mapping(video_id, language)
+        (starts, ends, _max_ends, offsets, lengths) = columns
+        text_base = CueStore.HEADER.size + 4 * CueStore.NUM_COLUMNS * num_cues
+        for i in range(num_cues):
+            text_start = text_base + offsets[i]
+            yield Cue(starts[i], ends[i], mm[text_start:text_start + lengths[i]].decode('utf-8'))
+
+    #-----------------------
+    # keys
+    #---------
+
+    def keys(self):
+        '''
+        Return (video_id, language) for each stored video;
+        language is None for videos stored without one.
+        '''
+        keys = []
+        for file_name in sorted(os.listdir(self.store_dir)):
+            if not file_name.endswith(CueStore.FILE_EXTENSION):
+                continue
+            name = file_name[:-len(CueStore.FILE_EXTENSION)]
+            (video_id, _sep, language) = name.partition('.')
+            keys.append((video_id, language or None))
+        return keys
+
+    #-----------------------
+    # close
+    #---------
+
+    def close(self):
+        '''
+        Unmap all files.
+        '''
+        with self.lock:
+            for path in list(self.mapped.keys()):
+                self._unmap(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    #--------------------------------- Private Utility Methods ------------
+
+    #-----------------------
+    # _path
+    #---------
+
+    def _path(self, video_id, language):
+        # Video ids contain no periods, so the
+        # language can be told apart:
+        name = video_id if language is None else '%s.%s' % (video_id, language)
+        return os.path.join(self.store_dir, name + CueStore.FILE_EXTENSION)
+
+    #-----------------------
+    # _mapping
+    #---------
+
+    def _mapping(self, video_id, language):
+        '''
+        Return the mmap, number of cues, and the five columns
+        of a video's file, mapping the file on first use.
+        '''
+        path = self._path(video_id, language)
+        with self.lock:
+            try:
+                return self.mapped[path]
+            except KeyError:
+                pass
+            try:
+                with open(path, 'rb') as fd:
+                    mm = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            except (IOError, ValueError):
+                # ValueError: mmap of an empty file
+                raise KeyError("No cues stored for video '%s'" % video_id)
+            (magic, num_cues) = CueStore.HEADER.unpack_from(mm, 0)
+            if magic != CueStore.MAGIC:
+                mm.close()
+                raise ValueError('Not a cue file: %s' % path)
+            columns = []
+            column_start = CueStore.HEADER.size
+            for _i in range(CueStore.NUM_COLUMNS):
+                column_bytes = memoryview(mm)[column_start:column_start + 4 * num_cues]
+                if sys.byteorder == 'little':
+                    columns.append(column_bytes.cast('I'))
+                else:
+                    column = array('I', column_bytes.tobytes())
+                    column.byteswap()
+                    columns.append(column)
+                column_start += 4 * num_cues
+            self.mapped[path] = (mm, num_cues, columns)
+            return self.mapped[path]
+
+    #-----------------------
+    # _unmap
+    #---------
+
+    def _unmap(self, path):
+        '''
+        Close the mapping of a file, if it is mapped.
+        Caller must hold self.lock.
+        '''
+        try:
+            (mm, _num_cues, columns) = self.mapped.pop(path)
+        except KeyError:
+            return
+        for column in columns:
+            if isinstance(column, memoryview):
+                column.release()
+        try:
+            mm.close()
+        except BufferError:
+            # A reader still holds a view; the mapping is
+            # released once that view is gone:
+            pass
+
+#--------------------------------- Parser Utilities ------------
+
+#-----------------------
+# _blocks
+#---------
+
+def _blocks(fd, timing_marker):
+    '''
+    Generator over the cue blocks of srt, sbv, and vtt files,
+    which are separated by blank lines. Yields the block's timing
+    line, and the lines that follow it. Blocks without a timing
+    line, such as vtt headers and NOTEs, are skipped, as are cue
+    numbers and identifiers that precede the timing line.
+    '''
+    timing = None
+    text_lines = []
+    for line in fd:
+        line = line.rstrip('\r\n')
+        if line.strip() == '':
+            if timing is not None:
+                yield (timing, text_lines)
+            timing = None
+            text_lines = []
+        elif timing is None:
+            if timing_marker in line and line[:1].isdigit():
+                timing = line.lstrip('﻿')
+        else:
+            text_lines.append(line)
+    if timing is not None:
+        yield (timing, text_lines)
+
+#-----------------------
+# _clean_text
+#---------
+
+def _clean_text(text_lines, tag_pattern=None, unescape=True):
+    '''
+    Join the lines of a cue with newlines, removing the
+    markup tags that tag_pattern matches, and resolving
+    entities such as &amp; unless unescape is False.
+    '''
+    text = '\n'.join(line.strip() for line in text_lines)
+    if tag_pattern is not None:
+        text = tag_pattern.sub('', text)
+    if unescape:
+        text = html.unescape(text)
+    return text.strip()
+
+#-----------------------
+# _clock
+#---------
+
+def _clock(ms, separator='.', hour_format='%02d'):
+    '''
+    Format milliseconds as HH:MM:SS.fff; the separator
+    before the milliseconds, and the hour format, vary
+    by caption format.
+    '''
+    (seconds, ms) = divmod(max(0, int(round(ms))), 1000)
+    (minutes, seconds) = divmod(seconds, 60)
+    (hours, minutes) = divmod(minutes, 60)
+    return (hour_format + ':%02d:%02d%s%03d') % (hours, minutes, seconds, separator, ms)
+
+#-----------------------
+# _cue_lines
+#---------
+
+def _cue_lines(text):
+    '''
+    Return cue text without blank lines, which would
+    end the cue in the block based formats.
+    '''
+    return '\n'.join(line.strip() for line in text.split('\n') if line.strip())
+
+def _escaped_lines(text):
+    '''
+    Cue text for srt, sbv, and vtt, with <, >, and & as
+    entities, which the parsers resolve again.
+    '''
+    return html.escape(_cue_lines(text), quote=False)
+
+#-----------------------
+# _sniff_format
+#---------
+
+def _sniff_format(fd):
+    '''
+    Guess the format of a caption file from its first
+    non-blank line. Returns the format, and an iterable
+    that yields the file's content from the start.
+    '''
+    consumed = []
+    first = ''
+    for line in fd:
+        consumed.append(line)
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', 'replace')
+        first = line.strip().lstrip('﻿')
+        if first:
+            break
+    rest = _chain(consumed, fd)
+    if first.startswith('WEBVTT'):
+        return ('vtt', rest)
+    if first.startswith('Scenarist_SCC'):
+        return ('scc', rest)
+    if first.startswith('<'):
+        return ('ttml', _LineReader(rest))
+    if first.isdigit():
+        return ('srt', rest)
+    if ',' in first and first[:1].isdigit():
+        return ('sbv', rest)
+    raise ValueError("Cannot tell the caption format from '%s'" % first[:40])
+
+def _chain(consumed, fd):
+    for line in consumed:
+        yield line
+    for line in fd:
+        yield line
+
+
+class _LineReader(object):
+    '''
+    File-like read() over an iterable of lines, for
+    ET.iterparse() after format sniffing.
+    '''
+    def __init__(self, lines):
+        self.lines = iter(lines)
+        self.buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            try:
+                line = next(self.lines)
+            except StopIteration:
+                break
+            self.buffer += line.decode('utf-8') if isinstance(line, bytes) else line
+        if size < 0:
+            (data, self.buffer) = (self.buffer, '')
+        else:
+            (data, self.buffer) = (self.buffer[:size], self.buffer[size:])
+        return data
+
+#-----------------------
+# _ttml_time_ms
+#---------
+
+TTML_OFFSET_PATTERN = re.compile(r'^([\d.]+)(h|ms|m|s|f|t)$')
+TTML_UNIT_MS = {'h' : 3600000.0, 'm' : 60000.0, 's' : 1000.0, 'ms' : 1.0}
+
+def _ttml_time_ms(time_expr, tick_rate, frame_rate):
+    '''
+    Convert a TTML time expression to milliseconds: clock
+    times such as '00:00:01.480' or '00:00:01:12' (frames), and
+    offset times such as '1.48s', '1480ms', or '14800000t' (ticks).
+    '''
+    time_expr = time_expr.strip()
+    match = TTML_OFFSET_PATTERN.match(time_expr)
+    if match is not None:
+        (value, unit) = (float(match.group(1)), match.group(2))
+        if unit == 'f':
+            return int(round(value * 1000 / frame_rate))
+        if unit == 't':
+            return int(round(value * 1000 / (tick_rate or frame_rate)))
+        return int(round(value * TTML_UNIT_MS[unit]))
+    parts = time_expr.split(':')
+    if len(parts) == 4:
+        (hours, minutes, seconds, frames) = parts
+        return int(round((int(hours) * 3600 + int(minutes) * 60 + float(seconds)) * 1000 +
+                         float(frames) * 1000 / frame_rate))
+    return timestamp_ms(time_expr)
+
+#-----------------------
+# SCC decoding
+#---------
+
+_SCC_TIMECODE = re.compile(r'^\d{2}:\d{2}:\d{2}[:;.]\d{2}$')
+
+def _scc_time_ms(timecode):
+    '''
+    Convert an SCC timecode to milliseconds. Timecodes with a
+    ';' before the frames are NTSC drop-frame timecodes, which
+    skip frame numbers 0 and 1 each minute, except every tenth
+    minute, to stay in step with the 29.97 fps frame rate.
+    '''
+    (hours, minutes, seconds, frames) = (int(part) for part in re.split('[:;.]', timecode))
+    if ';' in timecode or '.' in timecode:
+        total_minutes = hours * 60 + minutes
+        frame_number = (total_minutes * 60 + seconds) * 30 + frames \
+                       - 2 * (total_minutes - total_minutes // 10)
+        return int(round(frame_number * 1001.0 / 30))
+    return (hours * 3600 + minutes * 60 + seconds) * 1000 + int(round(frames * 1000.0 / 30))
+
+# Characters of the EIA-608 basic set that differ from ASCII:
+_SCC_BASIC_CHARS = {0x2a : 'á', 0x5c : 'é', 0x5e : 'í', 0x5f : 'ó',
+                    0x60 : 'ú', 0x7b : 'ç', 0x7c : '÷', 0x7d : 'Ñ',
+                    0x7e : 'ñ', 0x7f : '█'}
+
+# Special characters, sent as 0x11 followed by 0x30-0x3f:
+_SCC_SPECIAL_CHARS = '®°½¿™¢£♪' + \
+                     'à èâêîôû'
+
+# Extended characters, sent as 0x12 or 0x13 followed
+# by 0x20-0x3f: Spanish, French, and miscellaneous, then
+# Portuguese, German, Danish, and box drawing:
+_SCC_EXTENDED_CHARS = {0x12 : 'ÁÉÓÚÜü‘¡*\'—©℠•“”' +
+                              'ÀÂÇÈÊËëÎÏïÔÙùÛ«»',
+                       0x13 : 'ÃãÍÌìÒòÕõ{}\\^_|~' +
+                              'ÄäÖöß¥¤│ÅåØø┌┐└┘'}
+
+
+class _SccDecoder(object):
+    '''
+    State machine that turns EIA-608 byte pairs of caption
+    channel 1 into cues. Pop-on captions are built in a
+    non-displayed buffer and shown at end-of-caption; roll-up
+    and paint-on captions are shown as they arrive.
+    '''
+
+    def __init__(self):
+        self.mode = 'pop-on'
+        self.buffer = ''
+        self.displayed = None
+        self.displayed_since = 0
+        self.last_control = None
+
+    def feed(self, byte1, byte2, time_ms):
+        '''
+        Process one byte pair, returning the cues it completed.
+        '''
+        time_ms = int(time_ms)
+        (byte1, byte2) = (byte1 & 0x7f, byte2 & 0x7f)
+        cues = []
+        if byte1 == 0 and byte2 == 0:
+            return cues
+        if 0x10 <= byte1 <= 0x1f:
+            # Control codes are sent twice; act on the first:
+            if (byte1, byte2) == self.last_control:
+                self.last_control = None
+                return cues
+            self.last_control = (byte1, byte2)
+            if byte1 & 0x08:
+                # Second caption channel:
+                return cues
+            self._control(byte1, byte2, time_ms, cues)
+            return cues
+        self.last_control = None
+        for byte in (byte1, byte2):
+            if byte >= 0x20:
+                self._append(_SCC_BASIC_CHARS.get(byte, chr(byte)), time_ms)
+        return cues
+
+    def flush(self, time_ms):
+        '''
+        Return the cue still on screen at the end of the file.
+        '''
+        cues = []
+        if self.mode != 'pop-on' and self.buffer.strip():
+            self.displayed = self.buffer
+            self.buffer = ''
+        self._end_displayed(time_ms, cues)
+        return cues
+
+    def _control(self, byte1, byte2, time_ms, cues):
+        if byte1 in (0x14, 0x15) and 0x20 <= byte2 <= 0x2f:
+            if byte2 == 0x20:
+                self.mode = 'pop-on'
+            elif byte2 in (0x25, 0x26, 0x27):
+                self.mode = 'roll-up'
+            elif byte2 == 0x29:
+                self.mode = 'paint-on'
+            elif byte2 == 0x2c:
+                # Erase displayed memory:
+                if self.mode != 'pop-on':
+                    self._carriage_return(time_ms, cues)
+                self._end_displayed(time_ms, cues)
+            elif byte2 == 0x2d:
+                self._carriage_return(time_ms, cues)
+            elif byte2 == 0x2e:
+                # Erase non-displayed memory:
+                self.buffer = ''
+            elif byte2 == 0x2f:
+                # End of caption: flip the buffer onto the screen:
+                self._end_displayed(time_ms, cues)
+                if self.buffer.strip():
+                    self.displayed = self.buffer
+                    self.displayed_since = time_ms
+                self.buffer = ''
+        elif byte1 == 0x11 and 0x30 <= byte2 <= 0x3f:
+            self._append(_SCC_SPECIAL_CHARS[byte2 - 0x30], time_ms)
+        elif byte1 in (0x12, 0x13) and 0x20 <= byte2 <= 0x3f:
+            # Extended characters replace the basic
+            # character sent before them as a fallback:
+            self.buffer = self.buffer[:-1]
+            self._append(_SCC_EXTENDED_CHARS[byte1][byte2 - 0x20], time_ms)
+        elif byte2 >= 0x40 or (byte1 == 0x11 and 0x20 <= byte2 <= 0x2f):
+            # Preamble address codes start a new row;
+            # mid-row codes take up a space:
+            if self.buffer and not self.buffer.endswith((' ', '\n')):
+                self.buffer += '\n' if byte2 >= 0x40 else ' '
+
+    def _append(self, chars, time_ms):
+        if self.mode != 'pop-on' and self.buffer == '':
+            self.displayed_since = time_ms
+        self.buffer += chars
+
+    def _carriage_return(self, time_ms, cues):
+        '''
+        End the current line of roll-up or paint-on captions.
+        '''
+        if self.mode == 'pop-on' or not self.buffer.strip():
+            return
+        cues.append(Cue(self.displayed_since, time_ms, _clean_text(self.buffer.split('\n'), unescape=False)))
+        self.buffer = ''
+
+    def _end_displayed(self, time_ms, cues):
+        if self.displayed is not None:
+            cues.append(Cue(self.displayed_since, time_ms, _clean_text(self.displayed.split('\n'), unescape=False)))
+            self.displayed = None
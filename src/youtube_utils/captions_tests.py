@@ -0,0 +1,180 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils.captions import Cue, CueStore, parse_captions, timestamp_ms, write_captions
+
+DO_ALL = True
+
+SRT = '''1
+00:00:01,000 --> 00:00:04,000
+Welcome to <i>Statistics</i>
+in Medicine
+
+2
+00:00:05,500 --> 00:00:07,000
+Means &amp; medians
+'''
+
+VTT = '''WEBVTT
+Kind: captions
+Language: en
+
+NOTE produced by YouTube
+
+intro
+00:01.000 --> 00:04.000 align:start position:0%
+Welcome to<00:00:02.000><c> Statistics</c>
+'''
+
+SBV = '''0:00:01.000,0:00:04.000
+Welcome to Statistics
+
+0:00:05.500,0:00:07.000
+Means and medians
+'''
+
+TTML = '''<?xml version="1.0" encoding="utf-8" ?>
+<tt xml:lang="en" xmlns="http://www.w3.org/ns/ttml"><body><div>
+<p begin="00:00:01.000" end="00:00:04.000">Welcome to<br/>Statistics</p>
+<p begin="5.5s" dur="1500ms">Means and medians</p>
+</div></body></tt>
+'''
+
+SCC = '''Scenarist_SCC V1.0
+
+00:00:01;02	9420 9420 94ae 94ae 9452 9452 c8e5 ecec ef80 942f 942f
+
+00:00:03;00	942c 942c
+'''
+
+class CaptionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp(prefix='youtube_utils_cues_test')
+
+    def tearDown(self):
+        shutil.rmtree(self.store_dir)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_timestamps(self):
+        self.assertEqual(timestamp_ms('10:00'), 600000)
+        self.assertEqual(timestamp_ms('1:02:03.5'), 3723500)
+        self.assertEqual(timestamp_ms('00:00:01,250'), 1250)
+        self.assertEqual(timestamp_ms(42), 42)
+        with self.assertRaises(ValueError):
+            timestamp_ms('ten minutes')
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_parsers(self):
+        self.assertEqual(list(parse_captions(io.StringIO(SRT), 'srt')),
+                         [Cue(1000, 4000, 'Welcome to Statistics\nin Medicine'),
+                          Cue(5500, 7000, 'Means & medians')])
+        self.assertEqual(list(parse_captions(io.StringIO(VTT), 'vtt')),
+                         [Cue(1000, 4000, 'Welcome to Statistics')])
+        self.assertEqual(list(parse_captions(io.StringIO(SBV), 'sbv')),
+                         [Cue(1000, 4000, 'Welcome to Statistics'),
+                          Cue(5500, 7000, 'Means and medians')])
+        self.assertEqual(list(parse_captions(io.StringIO(TTML), 'ttml')),
+                         [Cue(1000, 4000, 'Welcome to\nStatistics'),
+                          Cue(5500, 7000, 'Means and medians')])
+        # Drop-frame timecode 00:00:01;02 is frame 32:
+        self.assertEqual(list(parse_captions(io.StringIO(SCC), 'scc')),
+                         [Cue(1368, 3003, 'Hello')])
+        with self.assertRaises(ValueError):
+            parse_captions(io.StringIO(SRT), 'docx')
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_writers(self):
+        cues = [Cue(1000, 4000, 'Welcome to Statistics\nin Medicine'),
+                Cue(3723004, 3725000, 'Means & medians, café <applause>')]
+        for caption_format in ('srt', 'vtt', 'sbv', 'ttml'):
+            fd = io.StringIO()
+            self.assertEqual(write_captions(iter(cues), fd, caption_format), 2)
+            # Written files parse back into the same cues, and
+            # their format is recognized:
+            self.assertEqual(list(parse_captions(io.StringIO(fd.getvalue()), None)), cues)
+        fd = io.StringIO()
+        write_captions(parse_captions(io.StringIO(SRT), 'srt'), fd, 'srt')
+        self.assertEqual(fd.getvalue().split('\n')[:3], ['1', '00:00:01,000 --> 00:00:04,000', 'Welcome to Statistics'])
+        fd = io.StringIO()
+        write_captions(cues, fd, 'txt')
+        self.assertEqual(fd.getvalue(), 'Welcome to Statistics in Medicine\nMeans & medians, café <applause>\n')
+        with self.assertRaises(ValueError):
+            write_captions(cues, io.StringIO(), 'scc')
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_literal_angle_brackets(self):
+        srt = '1\n00:00:01,000 --> 00:00:02,000\n<applause> x <y and z> w <i>now</i>\n'
+        self.assertEqual(list(parse_captions(io.StringIO(srt), 'srt'))[0].text,
+                         '<applause> x <y and z> w now')
+        vtt = ('WEBVTT\n\n00:01.000 --> 00:02.000\n'
+               '<v.loud Roger Bingham><c.colorE5E5E5>We are</c> <00:00:01.500><b>here</b></v> <applause>\n')
+        self.assertEqual(list(parse_captions(io.StringIO(vtt), 'vtt'))[0].text, 'We are here <applause>')
+        sbv = '0:00:01.000,0:00:02.000\n<applause>\n'
+        self.assertEqual(list(parse_captions(io.StringIO(sbv), 'sbv'))[0].text, '<applause>')
+        ttml = ('<tt xmlns="http://www.w3.org/ns/ttml"><body><div>'
+                '<p begin="1s" end="2s">&lt;applause&gt; <span>x</span> &amp;amp;</p></div></body></tt>')
+        self.assertEqual(list(parse_captions(io.StringIO(ttml), 'ttml'))[0].text, '<applause> x &amp;')
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_scc_extended_characters(self):
+        # 'C', 'o', the apostrophe, and 'Y' are fallbacks, replaced
+        # by the extended characters that follow them: 'Ç', 'ö',
+        # the typewriter apostrophe, and the yen sign:
+        scc = ('Scenarist_SCC V1.0\n\n'
+               '00:00:01;00\t9420 9420 94ae 94ae 9452 9452 4380 1232 1232 6120 4b6f 1333 1333 6c6e 2780 '
+               '1229 1229 2059 1335 1335 942f 942f\n\n'
+               '00:00:03;00\t942c 942c\n')
+        self.assertEqual([cue.text for cue in parse_captions(io.StringIO(scc), 'scc')], ["Ça Köln' ¥"])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_sniff_format(self):
+        for (content, num_cues) in ((SRT, 2), (VTT, 1), (SBV, 2), (TTML, 2), (SCC, 1)):
+            self.assertEqual(len(list(parse_captions(io.StringIO(content), None))), num_cues)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_cue_store(self):
+        # Out of order, and with one long cue that
+        # overlaps those after it:
+        cues = [Cue(i * 10000, i * 10000 + 5000, 'Cue %s' % i) for i in range(100, 0, -1)]
+        cues.append(Cue(150000, 400000, 'Long üñîçødé cue'))
+        with CueStore(self.store_dir) as store:
+            self.assertEqual(store.add('vid1', cues), 101)
+            res = store.cues_between('vid1', '5:00', '5:30')
+            self.assertEqual([cue.text for cue in res],
+                             ['Long üñîçødé cue', 'Cue 30', 'Cue 31', 'Cue 32'])
+            # Ranges between cues:
+            self.assertEqual(store.cues_between('vid1', 5000, 10000), [])
+            self.assertEqual(store.text_between('vid1', 4999, 10001), 'Cue 1')
+            self.assertEqual(len(list(store.iter_cues('vid1'))), 101)
+            with self.assertRaises(KeyError):
+                store.cues_between('vid2', 0, 1000)
+
+            # Replacing a video's cues while they are mapped:
+            store.add('vid1', [Cue(0, 1000, 'Only cue')])
+            self.assertEqual(store.text_between('vid1', 0, 600000), 'Only cue')
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_add_file(self):
+        srt_path = os.path.join(self.store_dir, 'vid1_en.srt')
+        with open(srt_path, 'w') as fd:
+            fd.write(SRT)
+        with CueStore(self.store_dir) as store:
+            self.assertEqual(store.add_file('vid1', srt_path, language='en'), 2)
+            self.assertEqual(store.keys(), [('vid1', 'en')])
+        # A new store finds the files of an earlier one:
+        with CueStore(self.store_dir) as store:
+            self.assertEqual(store.text_between('vid1', '0:05', '0:06', language='en'), 'Means & medians')
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
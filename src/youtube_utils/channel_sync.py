@@ -0,0 +1,192 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Incremental synchronization of a local copy of channel
+metadata with YouTube. A ChannelSync remembers, per channel,
+the channel's uploads playlist, the publication time of the
+newest video seen, and the etag of every known video. Each
+run then fetches full metadata only for videos that are new
+or whose etag changed, and reports deleted videos.
+
+Cost of a run, for a channel with N videos of which D changed:
+
+    full scan:   N/50 playlist pages + N/50 etag batches + D/50 info batches
+    quick scan:  pages up to the newest known video + D/50 info batches
+
+A quick scan (full_scan=False) only finds new uploads; a
+full scan also finds updates and deletions.
+
+Usage:
+    helper = YoutubeHelper(referer='mooc-analyzer')
+    syncer = ChannelSync(helper, '/var/lib/mooc/channel_sync.json')
+    for change in syncer.sync('UCsrq6y4j9FlTbeRVMD4HxnA'):
+        print(change['op'], change['videoId'])
+'''
+import datetime
+import json
+import os
+import tempfile
+
+
+class ChannelSync(object):
+    '''
+    Computes the changes to a channel's videos since the
+    last sync, and keeps the checkpoint state in a JSON file.
+    '''
+
+    # Video info retrieved for new and changed videos,
+    # unless specified in __init__():
+    DEFAULT_FIELDS = ['videoTitle', 'channelTitle', 'pubDate', 'duration', 'captionsAvailable', 'description']
+
+    def __init__(self, helper, state_path, param_arr=None, change_log_path=None):
+        '''
+        :param helper: helper through which all requests are made
+        :type helper: YoutubeHelper
+        :param state_path: JSON file holding the checkpoints of all synced channels
+        :type state_path: str
+        :param param_arr: video info retrieved for new and changed videos
+        :type param_arr: [str]
+        :param change_log_path: optional file to which each change is
+            appended as one line of JSON
+        :type change_log_path: str
+        '''
+        self.helper          = helper
+        self.state_path      = state_path
+        self.param_arr       = param_arr if param_arr is not None else ChannelSync.DEFAULT_FIELDS
+        self.change_log_path = change_log_path
+        try:
+            with open(state_path, 'r') as fd:
+                self.state = json.load(fd)
+        except (IOError, ValueError):
+            self.state = {'channels' : {}}
+
+    #--------------------------------- Public Methods ------------
+
+    #-----------------------
+    # sync
+    #---------
+
+    def sync(self, channel_id, full_scan=True):
+        '''
+        Generator over the changes to a channel since the last
+        sync. Yields one dict per change:
+
+            {'op' : 'insert', 'videoId' : ..., 'info' : {...}}
+            {'op' : 'update', 'videoId' : ..., 'info' : {...}}
+            {'op' : 'delete', 'videoId' : ...}
+
+        'info' holds the video info requested in __init__().
+        The checkpoint is saved once all changes are yielded; a
+        run that is abandoned midway is repeated in full next time.
+
+        :param channel_id: YouTube channel id
+        :type channel_id: str
+        :param full_scan: if True, detect updates and deletions, too
+        :type full_scan: bool
+        :returns generator of change records
+        :rtype { str : <any> }
+        '''
+        checkpoint = self.checkpoint(channel_id)
+        if checkpoint.get('uploadsPlaylistId') is None:
+            checkpoint['uploadsPlaylistId'] = self.helper.get_uploads_playlist_id(channel_id)
+        known_etags = checkpoint['etags']
+        last_published_at = checkpoint.get('lastPublishedAt')
+
+        listed_ids = []
+        newest_published_at = last_published_at
+        for item in self.helper.iter_playlist_items(checkpoint['uploadsPlaylistId']):
+            published_at = item['videoPublishedAt']
+            if not full_scan and last_published_at is not None and \
+               published_at is not None and published_at <= last_published_at and \
+               item['videoId'] in known_etags:
+                # Uploads are listed newest first; the
+                # rest is known:
+                break
+            listed_ids.append(item['videoId'])
+            if published_at is not None and (newest_published_at is None or published_at > newest_published_at):
+                newest_published_at = published_at
+
+        if full_scan:
+            candidates = listed_ids
+        else:
+            candidates = [video_id for video_id in listed_ids if video_id not in known_etags]
+        current_etags = self.helper.get_video_etags(candidates, self.param_arr)
+        changed_ids = [video_id for video_id in candidates
+                       if video_id in current_etags and known_etags.get(video_id) != current_etags[video_id]]
+
+        changes = []
+        for info in self.helper.get_video_info_bulk(self.param_arr, changed_ids):
+            video_id = info['videoId']
+            op = 'update' if video_id in known_etags else 'insert'
+            known_etags[video_id] = current_etags[video_id]
+            changes.append({'op' : op, 'videoId' : video_id, 'info' : info})
+            yield changes[-1]
+
+        if full_scan:
+            # Videos gone from the playlist, or listed but
+            # no longer retrievable (deleted or made private):
+            still_there = set(video_id for video_id in listed_ids if video_id in current_etags)
+            for video_id in [video_id for video_id in known_etags if video_id not in still_there]:
+                del known_etags[video_id]
+                changes.append({'op' : 'delete', 'videoId' : video_id})
+                yield changes[-1]
+
+        checkpoint['lastPublishedAt'] = newest_published_at
+        checkpoint['lastSync'] = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        self._append_change_log(channel_id, changes)
+        self.save()
+
+    #-----------------------
+    # checkpoint
+    #---------
+
+    def checkpoint(self, channel_id):
+        '''
+        Return the checkpoint of a channel, creating an
+        empty one for channels not synced before.
+
+        :param channel_id: YouTube channel id
+        :type channel_id: str
+        :returns the uploads playlist id, newest publication time,
+            video etags, and time of the last sync
+        :rtype { str : <any> }
+        '''
+        return self.state['channels'].setdefault(channel_id,
+                                                 {'uploadsPlaylistId' : None,
+                                                  'lastPublishedAt'   : None,
+                                                  'lastSync'          : None,
+                                                  'etags'             : {}})
+
+    #-----------------------
+    # save
+    #---------
+
+    def save(self):
+        '''
+        Atomically write the state of all channels to state_path.
+        '''
+        state_dir = os.path.dirname(os.path.abspath(self.state_path))
+        (fd, tmp_path) = tempfile.mkstemp(dir=state_dir, suffix='.part')
+        with os.fdopen(fd, 'w') as tmp_fd:
+            json.dump(self.state, tmp_fd)
+        os.replace(tmp_path, self.state_path)
+
+    #--------------------------------- Private Utility Methods ------------
+
+    #-----------------------
+    # _append_change_log
+    #---------
+
+    def _append_change_log(self, channel_id, changes):
+        '''
+        Append changes to the change log file, if there is one.
+        Video info values that JSON cannot represent, such as
+        durations, are written as strings.
+        '''
+        if self.change_log_path is None or len(changes) == 0:
+            return
+        with open(self.change_log_path, 'a') as fd:
+            for change in changes:
+                fd.write(json.dumps(dict(change, channelId=channel_id), default=str) + '\n')
@@ -0,0 +1,93 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils.channel_sync import ChannelSync
+
+DO_ALL = True
+
+class FakeHelper(object):
+    '''
+    Stands in for YoutubeHelper: serves a channel whose
+    videos are given as {videoId : (publishedAt, etag, title)}.
+    Counts the videos whose full info was requested.
+    '''
+    def __init__(self, videos):
+        self.videos = videos
+        self.info_requests = []
+
+    def get_uploads_playlist_id(self, channel_id):
+        return 'UU' + channel_id[2:]
+
+    def iter_playlist_items(self, playlist_id):
+        for (video_id, (published_at, _etag, _title)) in sorted(self.videos.items(),
+                                                               key=lambda item: item[1][0],
+                                                               reverse=True):
+            yield {'videoId' : video_id, 'videoPublishedAt' : published_at}
+
+    def get_video_etags(self, video_ids, param_arr=None):
+        return {video_id : self.videos[video_id][1] for video_id in video_ids if video_id in self.videos}
+
+    def get_video_info_bulk(self, param_arr, video_ids):
+        for video_id in video_ids:
+            self.info_requests.append(video_id)
+            yield {'videoId' : video_id, 'videoTitle' : self.videos[video_id][2]}
+
+class ChannelSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='youtube_utils_sync_test')
+        self.state_path = os.path.join(self.tmp_dir, 'state.json')
+        self.log_path = os.path.join(self.tmp_dir, 'changes.jsonl')
+        self.helper = FakeHelper({'vid1' : ('2016-01-01T00:00:00Z', 'e1', 'Unit 1'),
+                                  'vid2' : ('2016-02-01T00:00:00Z', 'e2', 'Unit 2')})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def run_sync(self, full_scan=True):
+        syncer = ChannelSync(self.helper, self.state_path, ['videoTitle'], change_log_path=self.log_path)
+        return sorted((change['op'], change['videoId']) for change in syncer.sync('UCcourse', full_scan))
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_initial_and_unchanged(self):
+        self.assertListEqual([('insert', 'vid1'), ('insert', 'vid2')], self.run_sync())
+        self.helper.info_requests = []
+        self.assertListEqual([], self.run_sync())
+        self.assertListEqual([], self.helper.info_requests)
+        with open(self.state_path, 'r') as fd:
+            checkpoint = json.load(fd)['channels']['UCcourse']
+        self.assertEqual('2016-02-01T00:00:00Z', checkpoint['lastPublishedAt'])
+        self.assertDictEqual({'vid1' : 'e1', 'vid2' : 'e2'}, checkpoint['etags'])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_insert_update_delete(self):
+        self.run_sync()
+        self.helper.videos['vid3'] = ('2016-03-01T00:00:00Z', 'e3', 'Unit 3')
+        self.helper.videos['vid2'] = ('2016-02-01T00:00:00Z', 'e2b', 'Unit 2, revised')
+        del self.helper.videos['vid1']
+        self.helper.info_requests = []
+        self.assertListEqual([('delete', 'vid1'), ('insert', 'vid3'), ('update', 'vid2')], self.run_sync())
+        self.assertListEqual(['vid2', 'vid3'], sorted(self.helper.info_requests))
+        with open(self.log_path, 'r') as fd:
+            self.assertEqual(5, len(fd.readlines()))
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_quick_scan(self):
+        self.run_sync()
+        self.helper.videos['vid3'] = ('2016-03-01T00:00:00Z', 'e3', 'Unit 3')
+        self.helper.videos['vid2'] = ('2016-02-01T00:00:00Z', 'e2b', 'Unit 2, revised')
+        # Only new uploads are found:
+        self.assertListEqual([('insert', 'vid3')], self.run_sync(full_scan=False))
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
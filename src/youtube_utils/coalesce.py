@@ -0,0 +1,177 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Request coalescing for YoutubeHelper, for services in which
+many threads ask for the same few videos at nearly the same
+time:
+
+    o SingleFlight lets identical concurrent requests share
+      one network call: the first caller sends the request,
+      later callers with the same key wait for its result.
+    o BatchCoalescer collects requests for single IDs that
+      arrive within a short window, and sends them as one
+      batched request. Each caller receives its own item.
+'''
+from concurrent.futures import Future
+import threading
+
+
+class SingleFlight(object):
+    '''
+    Runs at most one call per key at a time. Callers that
+    arrive while a call for their key is in flight receive
+    that call's result, or its exception.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.num_shared = 0
+
+    #-----------------------
+    # do
+    #---------
+
+    def do(self, key, fn):
+        '''
+        Return fn(), unless a call with the same key is in
+        flight, in which case return that call's result.
+        Results are shared, not copied; callers must not
+        modify them.
+
+        :param key: identifies requests that are interchangeable
+        :type key: hashable
+        :param fn: callable that sends the request
+        :type fn: callable
+        :returns fn's return value
+        :rtype <any>
+        '''
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.num_shared += 1
+                leader = False
+            else:
+                future = Future()
+                self.in_flight[key] = future
+                leader = True
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+        return future.result()
+
+
+class BatchCoalescer(object):
+    '''
+    Merges requests for single items into batched requests.
+    The first request of a batch waits window seconds for
+    others to join, unless the batch fills up sooner, then
+    sends the batch on behalf of all of them. Requests for an
+    ID that is already pending or in flight join that request.
+
+    Only requests with the same group key are batched together;
+    for videos().list, requests with the same part and fields.
+    '''
+
+    def __init__(self, fetch_batch, window, max_batch):
+        '''
+        :param fetch_batch: called as fetch_batch(group_args, ids); returns
+            a dict from ID to item. IDs missing from the dict have no item.
+        :type fetch_batch: callable
+        :param window: seconds the first request of a batch waits for others
+        :type window: float
+        :param max_batch: maximum number of IDs per batch
+        :type max_batch: int
+        '''
+        self.fetch_batch = fetch_batch
+        self.window      = window
+        self.max_batch   = max_batch
+        self.lock        = threading.Lock()
+        # Open batches, keyed by group key. Each is a
+        # dict with the IDs' futures, and an event that is
+        # set when the batch fills up:
+        self.pending     = {}
+        # Futures of IDs in open or in-flight batches, keyed
+        # by (group key, ID):
+        self.futures     = {}
+        self.num_batches = 0
+        self.num_shared  = 0
+
+    #-----------------------
+    # get
+    #---------
+
+    def get(self, group_key, group_args, item_id):
+        '''
+        Return the item for item_id, fetched as part of a batch.
+
+        :param group_key: requests with equal keys may share a batch
+        :type group_key: hashable
+        :param group_args: passed to fetch_batch() if this request opens a batch
+        :type group_args: <any>
+        :param item_id: ID of the requested item
+        :type item_id: str
+        :returns the item, or None if the API returned none for item_id
+        :rtype { <any> }
+        '''
+        leader = False
+        with self.lock:
+            future = self.futures.get((group_key, item_id))
+            if future is not None:
+                self.num_shared += 1
+            else:
+                future = Future()
+                self.futures[(group_key, item_id)] = future
+                batch = self.pending.get(group_key)
+                if batch is None:
+                    batch = {'futures' : {item_id : future}, 'full' : threading.Event()}
+                    self.pending[group_key] = batch
+                    leader = True
+                else:
+                    batch['futures'][item_id] = future
+                    if len(batch['futures']) >= self.max_batch:
+                        # Later requests open a new batch:
+                        del self.pending[group_key]
+                        batch['full'].set()
+        if leader:
+            self._send_batch(group_key, group_args, batch)
+        return future.result()
+
+    #--------------------------------- Private Utility Methods ------------
+
+    #-----------------------
+    # _send_batch
+    #---------
+
+    def _send_batch(self, group_key, group_args, batch):
+        '''
+        Wait for the batch to fill up or the window to
+        pass, then fetch the batch and deliver each item
+        to its future.
+        '''
+        batch['full'].wait(self.window)
+        with self.lock:
+            if self.pending.get(group_key) is batch:
+                del self.pending[group_key]
+            self.num_batches += 1
+        futures = batch['futures']
+        try:
+            items = self.fetch_batch(group_args, list(futures.keys()))
+        except BaseException as e:
+            for future in futures.values():
+                future.set_exception(e)
+        else:
+            for (item_id, future) in futures.items():
+                future.set_result(items.get(item_id))
+        finally:
+            with self.lock:
+                for item_id in futures:
+                    del self.futures[(group_key, item_id)]
@@ -0,0 +1,107 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import threading
+import time
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils.coalesce import BatchCoalescer, SingleFlight
+
+DO_ALL = True
+
+class CoalesceTest(unittest.TestCase):
+
+    def run_threads(self, fn, args_list):
+        results = [None] * len(args_list)
+        def run(i, args):
+            try:
+                results[i] = fn(*args)
+            except Exception as e:
+                results[i] = e
+        threads = [threading.Thread(target=run, args=(i, args)) for (i, args) in enumerate(args_list)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_single_flight(self):
+        flight = SingleFlight()
+        calls = []
+        def slow_call(key):
+            calls.append(key)
+            time.sleep(0.1)
+            return {'key' : key}
+        results = self.run_threads(lambda key: flight.do(key, lambda: slow_call(key)),
+                                   [('vid1',)] * 5 + [('vid2',)] * 3)
+        self.assertEqual(sorted(calls), ['vid1', 'vid2'])
+        self.assertEqual([res['key'] for res in results], ['vid1'] * 5 + ['vid2'] * 3)
+        self.assertEqual(flight.num_shared, 6)
+
+        # Once a call is done, the next one goes out again:
+        flight.do('vid1', lambda: slow_call('vid1'))
+        self.assertEqual(len(calls), 3)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_single_flight_error(self):
+        flight = SingleFlight()
+        def failing_call():
+            time.sleep(0.1)
+            raise ValueError('Video not found')
+        results = self.run_threads(lambda: flight.do('vid1', failing_call), [()] * 3)
+        for res in results:
+            self.assertIsInstance(res, ValueError)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_batch_coalescer(self):
+        batches = []
+        def fetch_batch(group_args, ids):
+            batches.append((group_args, sorted(ids)))
+            return {video_id : {'id' : video_id} for video_id in ids if video_id != 'gone'}
+        coalescer = BatchCoalescer(fetch_batch, window=0.2, max_batch=50)
+        ids = ['vid%s' % i for i in range(10)] + ['vid3', 'gone']
+        results = self.run_threads(lambda video_id: coalescer.get('snippet', 'args', video_id),
+                                   [(video_id,) for video_id in ids])
+        self.assertEqual(batches, [('args', sorted(set(ids)))])
+        self.assertEqual(results[:11], [{'id' : video_id} for video_id in ids[:11]])
+        self.assertIsNone(results[11])
+        self.assertEqual(coalescer.num_shared, 1)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_batch_coalescer_limits(self):
+        batch_sizes = []
+        def fetch_batch(group_args, ids):
+            batch_sizes.append((group_args, len(ids)))
+            return {video_id : video_id for video_id in ids}
+        coalescer = BatchCoalescer(fetch_batch, window=0.5, max_batch=4)
+        start = time.time()
+        self.run_threads(lambda video_id: coalescer.get('snippet', 'snippet', video_id),
+                         [('vid%s' % i,) for i in range(8)])
+        # Full batches go out without waiting for the window:
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(batch_sizes, [('snippet', 4), ('snippet', 4)])
+
+        # Different groups are never mixed:
+        batch_sizes = []
+        self.run_threads(lambda group, video_id: coalescer.get(group, group, video_id),
+                         [('snippet', 'vid1'), ('statistics', 'vid1')])
+        self.assertEqual(sorted(batch_sizes), [('snippet', 1), ('statistics', 1)])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_batch_coalescer_error(self):
+        def fetch_batch(group_args, ids):
+            raise ValueError('Error retrieving video info')
+        coalescer = BatchCoalescer(fetch_batch, window=0.1, max_batch=50)
+        results = self.run_threads(lambda video_id: coalescer.get('snippet', None, video_id),
+                                   [('vid1',), ('vid2',)])
+        for res in results:
+            self.assertIsInstance(res, ValueError)
+        self.assertEqual(coalescer.futures, {})
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
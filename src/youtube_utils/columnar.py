@@ -0,0 +1,278 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Column-oriented container for bulk video metadata. Instead of
+one dict per video, a ColumnarResult holds one typed NumPy array
+per requested field:
+
+    duration           int64, seconds
+    counts             int64, such as viewCount
+    yes/no info        bool, such as captionsAvailable, embeddable
+    times              datetime64[s], such as pubDate
+    everything else    object array of str, or of lists for
+                       list values such as tags
+
+Each column has a companion boolean mask that is True where
+the API returned no value. Missing values become nulls in
+pandas and pyarrow. Arrays are handed to NumPy, pandas,
+and pyarrow without conversion; to_parquet() writes a Parquet
+file via pyarrow.
+
+NumPy is required; pandas and pyarrow only for the respective
+exports.
+
+Usage:
+    res = helper.get_video_info_columnar(['duration', 'pubDate'], video_ids)
+    df  = res.to_pandas()
+    res.to_parquet('/tmp/videos.parquet')
+'''
+
+from .durations import parse_durations_seconds
+
+# NumPy is imported on first use, so that importing
+# youtube_utils does not pay for it:
+np = None
+
+def _numpy():
+    '''
+    Import NumPy, if that has not happened yet.
+    
+    :raise ImportError if NumPy is not installed
+    '''
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('Columnar results require NumPy; please install numpy.')
+        np = numpy
+    return np
+
+
+class ColumnarResult(object):
+    '''
+    Fixed-length table of video metadata, one array per field.
+    Created by a ColumnarBuilder, or by the YoutubeHelper methods
+    that return columnar results.
+    '''
+
+    def __init__(self, columns, masks):
+        '''
+        :param columns: field name to array of values
+        :type columns: { str : numpy.ndarray }
+        :param masks: field name to boolean array; True where the value is missing
+        :type masks: { str : numpy.ndarray }
+        '''
+        self.columns = columns
+        self.masks   = masks
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, field_name):
+        return self.columns[field_name]
+
+    def field_names(self):
+        return list(self.columns.keys())
+
+    #-----------------------
+    # to_numpy
+    #---------
+
+    def to_numpy(self):
+        '''
+        Return the columns as a dict of NumPy arrays. The
+        arrays are the container's own, not copies.
+
+        :rtype { str : numpy.ndarray }
+        '''
+        return dict(self.columns)
+
+    #-----------------------
+    # to_arrow
+    #---------
+
+    def to_arrow(self):
+        '''
+        Return the columns as a pyarrow Table. Missing values
+        become nulls. Numeric and datetime columns are passed
+        to pyarrow without conversion.
+
+        :rtype pyarrow.Table
+        '''
+        import pyarrow as pa
+        arrays = []
+        for (field_name, column) in self.columns.items():
+            mask = self.masks[field_name]
+            arrays.append(pa.array(column, mask=mask if mask.any() else None))
+        return pa.Table.from_arrays(arrays, names=self.field_names())
+
+    #-----------------------
+    # to_pandas
+    #---------
+
+    def to_pandas(self):
+        '''
+        Return the columns as a pandas DataFrame. Missing values
+        stay missing, as in to_arrow(): integer and bool columns
+        become the nullable Int64 and boolean dtypes, which share
+        the container's arrays and masks; missing datetimes become
+        NaT, and other missing values None.
+
+        :rtype pandas.DataFrame
+        '''
+        import pandas as pd
+        series = {}
+        for (field_name, column) in self.columns.items():
+            mask = self.masks[field_name]
+            if column.dtype == np.int64:
+                column = pd.arrays.IntegerArray(column, mask)
+            elif column.dtype == np.bool_:
+                column = pd.arrays.BooleanArray(column, mask)
+            elif mask.any():
+                column = column.copy()
+                column[mask] = np.datetime64('NaT') if column.dtype.kind == 'M' else None
+            series[field_name] = pd.Series(column, copy=False)
+        return pd.DataFrame(series, copy=False)
+
+    #-----------------------
+    # to_parquet
+    #---------
+
+    def to_parquet(self, path, **kwargs):
+        '''
+        Write the columns to a Parquet file. Keyword arguments
+        are passed to pyarrow.parquet.write_table().
+
+        :param path: destination file
+        :type path: str
+        '''
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(), path, **kwargs)
+
+
+class ColumnarBuilder(object):
+    '''
+    Accumulates raw API items into per-field lists, and converts
+    each list into a typed array once in finish(). Items are not
+    turned into per-video dicts on the way.
+    '''
+
+    # Conversion of a list of raw API values into an array.
+    # Fields without an entry become object arrays:
+    COLUMN_TYPES = {
+                    'duration'          : 'seconds',
+                    'captionsAvailable' : 'bool',
+                    'licensedContent'   : 'bool',
+                    'embeddable'        : 'bool',
+                    'publicStatsViewable' : 'bool',
+                    'madeForKids'       : 'bool',
+                    'pubDate'           : 'datetime',
+                    'recordingDate'     : 'datetime',
+                    'actualStartTime'   : 'datetime',
+                    'actualEndTime'     : 'datetime',
+                    'scheduledStartTime': 'datetime',
+                    'viewCount'         : 'count',
+                    'likeCount'         : 'count',
+                    'favoriteCount'     : 'count',
+                    'commentCount'      : 'count',
+                    'concurrentViewers' : 'count',
+                    }
+
+    def __init__(self, plan):
+        '''
+        :param plan: plan of the requests whose results are added
+        :type plan: QueryPlan
+        :raise ImportError if NumPy is not installed
+        '''
+        _numpy()
+        self.plan = plan
+        self.values = {user_name : [] for (_root, _leaf, user_name, _converter) in plan.extractors}
+
+    #-----------------------
+    # add_items
+    #---------
+
+    def add_items(self, items):
+        '''
+        Append the values of API result items, such as the
+        'items' list of a videos().list response.
+
+        :param items: raw result items
+        :type items: [{ <any> }]
+        '''
+        values = self.values
+        for item in items:
+            for (api_name_root, api_name_leaf, user_name, _converter) in self.plan.extractors:
+                try:
+                    if api_name_leaf is None:
+                        value = item[api_name_root]
+                    elif type(api_name_leaf) is tuple:
+                        value = item[api_name_root]
+                        for key in api_name_leaf:
+                            value = value[key]
+                    else:
+                        value = item[api_name_root][api_name_leaf]
+                except KeyError:
+                    value = None
+                values[user_name].append(value)
+
+    #-----------------------
+    # finish
+    #---------
+
+    def finish(self):
+        '''
+        Convert the accumulated values into a ColumnarResult.
+
+        :rtype ColumnarResult
+        '''
+        columns = {}
+        masks   = {}
+        for (user_name, values) in self.values.items():
+            mask = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+            column_type = ColumnarBuilder.COLUMN_TYPES.get(user_name)
+            if column_type == 'seconds':
+                column = self._seconds_column(values)
+            elif column_type == 'bool':
+                # contentDetails/caption is the string 'true' or 'false',
+                # other flags are JSON booleans:
+                column = np.fromiter((value is True or value == 'true' for value in values), dtype=bool, count=len(values))
+            elif column_type == 'datetime':
+                column = self._datetime_column(values)
+            elif column_type == 'count':
+                column = np.fromiter((0 if value is None else int(value) for value in values), dtype=np.int64, count=len(values))
+            else:
+                column = np.empty(len(values), dtype=object)
+                if any(isinstance(value, list) for value in values):
+                    # Slice assignment would make a 2-d array of
+                    # equally long lists:
+                    for (i, value) in enumerate(values):
+                        column[i] = value
+                else:
+                    column[:] = values
+            columns[user_name] = column
+            masks[user_name] = mask
+        return ColumnarResult(columns, masks)
+
+    #--------------------------------- Private Utility Methods ------------
+
+    def _seconds_column(self, values):
+        '''
+        ISO 8601 durations to int64 seconds; missing values are 0.
+        '''
+        return np.array(parse_durations_seconds(values), dtype=np.int64)
+
+    def _datetime_column(self, values):
+        '''
+        API timestamps, such as '2013-01-03T19:52:21Z' or
+        '2013-01-03T19:52:21.000Z', to datetime64[s]. NumPy does
+        not accept the zone designator; all API times are UTC.
+        Missing values become NaT.
+        '''
+        return np.array(['NaT' if value is None else value.rstrip('Z') for value in values],
+                        dtype='datetime64[s]')
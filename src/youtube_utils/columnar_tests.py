@@ -0,0 +1,98 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import importlib.util
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils.youtube_utils import YoutubeHelper
+from youtube_utils import columnar
+from youtube_utils.columnar import ColumnarBuilder
+
+HAVE_NUMPY   = importlib.util.find_spec('numpy') is not None
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+HAVE_PANDAS  = importlib.util.find_spec('pandas') is not None
+
+DO_ALL = True
+
+@skipIf (not HAVE_NUMPY, 'NumPy not installed')
+class ColumnarResultTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plan = YoutubeHelper.query_plan(['duration', 'pubDate', 'captionsAvailable', 'videoTitle'],
+                                             include_id=True)
+        builder = ColumnarBuilder(self.plan)
+        builder.add_items([{'id' : 'hlFeEQF5tDc',
+                            'snippet' : {'title' : 'Unit 1 Module 5 part 1',
+                                         'publishedAt' : '2013-01-03T19:52:21.000Z'},
+                            'contentDetails' : {'duration' : 'PT11M2S',
+                                                'caption' : 'true'}},
+                           {'id' : 'IJPXosPGLTU',
+                            'snippet' : {'publishedAt' : '2014-02-01T08:00:00Z'},
+                            'contentDetails' : {'duration' : 'PT1H2S',
+                                                'caption' : 'false'}}
+                           ])
+        self.res = builder.finish()
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_column_types(self):
+        np = columnar.np
+        self.assertEqual(2, len(self.res))
+        self.assertListEqual(['videoId', 'duration', 'pubDate', 'captionsAvailable', 'videoTitle'],
+                             self.res.field_names())
+        self.assertEqual(np.int64, self.res['duration'].dtype)
+        self.assertListEqual([662, 3602], self.res['duration'].tolist())
+        self.assertListEqual([True, False], self.res['captionsAvailable'].tolist())
+        self.assertEqual(np.datetime64('2013-01-03T19:52:21', 's'), self.res['pubDate'][0])
+        self.assertListEqual([False, True], self.res.masks['videoTitle'].tolist())
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_nested_and_typed_fields(self):
+        np = columnar.np
+        plan = YoutubeHelper.query_plan(['viewCount', 'embeddable', 'tags', 'thumbnailUrl'])
+        builder = ColumnarBuilder(plan)
+        builder.add_items([{'statistics' : {'viewCount' : '1200'},
+                            'status' : {'embeddable' : True},
+                            'snippet' : {'tags' : ['stats', 'mooc'],
+                                         'thumbnails' : {'default' : {'url' : 'https://i.ytimg.com/1.jpg'}}}},
+                           {'statistics' : {},
+                            'status' : {'embeddable' : False},
+                            'snippet' : {'tags' : ['rna', 'dna']}}])
+        res = builder.finish()
+        self.assertEqual(np.int64, res['viewCount'].dtype)
+        self.assertListEqual([1200, 0], res['viewCount'].tolist())
+        self.assertListEqual([False, True], res.masks['viewCount'].tolist())
+        self.assertListEqual([True, False], res['embeddable'].tolist())
+        self.assertEqual((2,), res['tags'].shape)
+        self.assertListEqual(['rna', 'dna'], res['tags'][1])
+        self.assertListEqual(['https://i.ytimg.com/1.jpg', None], res['thumbnailUrl'].tolist())
+
+    @skipIf (not DO_ALL or not HAVE_PYARROW, 'pyarrow not installed')
+    def test_to_arrow(self):
+        table = self.res.to_arrow()
+        self.assertListEqual(['Unit 1 Module 5 part 1', None], table.column('videoTitle').to_pylist())
+        self.assertListEqual([662, 3602], table.column('duration').to_pylist())
+
+    @skipIf (not DO_ALL or not HAVE_PANDAS, 'pandas not installed')
+    def test_to_pandas(self):
+        plan = YoutubeHelper.query_plan(['duration', 'viewCount', 'captionsAvailable', 'pubDate', 'videoTitle'])
+        builder = ColumnarBuilder(plan)
+        builder.add_items([{'snippet' : {'title' : 'Unit 1', 'publishedAt' : '2013-01-03T19:52:21Z'},
+                            'contentDetails' : {'duration' : 'PT11M2S', 'caption' : 'true'},
+                            'statistics' : {'viewCount' : '1200'}},
+                           # Every field missing:
+                           {}])
+        df = builder.finish().to_pandas()
+        self.assertEqual('Int64', str(df['duration'].dtype))
+        self.assertEqual('boolean', str(df['captionsAvailable'].dtype))
+        self.assertEqual(662, df['duration'][0])
+        for field_name in ('duration', 'viewCount', 'captionsAvailable', 'pubDate', 'videoTitle'):
+            self.assertListEqual([False, True], df[field_name].isna().tolist(), field_name)
+        self.assertEqual(1200, df['viewCount'][0])
+        self.assertTrue(df['captionsAvailable'][0])
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
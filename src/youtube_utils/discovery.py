@@ -0,0 +1,150 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Loading of the YouTube v3 discovery document, from which
+googleapiclient builds its service objects. The document
+is looked for, in order:
+
+    o The file named in the environment variable
+      YOUTUBE_UTILS_DISCOVERY_DOC
+    o The local cache file ~/.cache/youtube_utils/youtube.v3.json,
+      if younger than DISCOVERY_MAX_AGE
+    o The copy bundled with googleapiclient 2.x
+    o Google's discovery service. The result is written
+      to the local cache file.
+
+The parsed document is kept in this module, so that it is
+read and parsed once per process, no matter how many
+helpers and threads build services from it. Processes
+forked after load_discovery_document() was called inherit
+the parsed document.
+'''
+import json
+import os
+import tempfile
+import threading
+import time
+
+DISCOVERY_URL = 'https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest'
+
+# Environment variable that may point to a discovery document:
+DISCOVERY_ENV_VAR = 'YOUTUBE_UTILS_DISCOVERY_DOC'
+
+# Seconds after which the local cache file is refreshed:
+DISCOVERY_MAX_AGE = 30 * 24 * 3600
+
+_discovery_doc  = None
+_discovery_lock = threading.Lock()
+
+#-----------------------
+# load_discovery_document
+#---------
+
+def load_discovery_document(http=None):
+    '''
+    Return the parsed YouTube v3 discovery document, loading
+    it on the first call.
+
+    :param http: transport for fetching the document, if it
+        must be fetched; default: a new httplib2.Http
+    :type http: { httplib2.Http | PooledHttp }
+    :returns the discovery document
+    :rtype { str : <any> }
+    :raise IOError if the document is found nowhere
+    '''
+    global _discovery_doc
+    if _discovery_doc is not None:
+        return _discovery_doc
+    with _discovery_lock:
+        if _discovery_doc is None:
+            _discovery_doc = _read_discovery_document(http)
+        return _discovery_doc
+
+#-----------------------
+# discovery_cache_path
+#---------
+
+def discovery_cache_path():
+    '''
+    Return the path of the local cache file.
+    '''
+    return os.path.join(os.getenv('HOME', tempfile.gettempdir()), '.cache', 'youtube_utils', 'youtube.v3.json')
+
+#-----------------------
+# forget_discovery_document
+#---------
+
+def forget_discovery_document():
+    '''
+    Drop the parsed document, so that the next
+    load_discovery_document() reads it again.
+    '''
+    global _discovery_doc
+    with _discovery_lock:
+        _discovery_doc = None
+
+#--------------------------------- Private Utility Methods ------------
+
+#-----------------------
+# _read_discovery_document
+#---------
+
+def _read_discovery_document(http):
+    '''
+    Find the document in one of the places listed in the
+    module comment, and parse it.
+    '''
+    env_path = os.getenv(DISCOVERY_ENV_VAR)
+    if env_path:
+        with open(env_path, 'r') as fd:
+            return json.load(fd)
+
+    cache_path = discovery_cache_path()
+    try:
+        if time.time() - os.path.getmtime(cache_path) < DISCOVERY_MAX_AGE:
+            with open(cache_path, 'r') as fd:
+                return json.load(fd)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+        doc_str = get_static_doc('youtube', 'v3')
+        if doc_str is not None:
+            return json.loads(doc_str)
+    except ImportError:
+        # googleapiclient 1.x does not bundle documents:
+        pass
+
+    if http is None:
+        import httplib2
+        http = httplib2.Http()
+    (resp, content) = http.request(DISCOVERY_URL)
+    if resp.status >= 300:
+        raise IOError('Could not retrieve YouTube discovery document: HTTP %s' % resp.status)
+    doc = json.loads(content)
+    _write_cache_file(cache_path, content)
+    return doc
+
+#-----------------------
+# _write_cache_file
+#---------
+
+def _write_cache_file(cache_path, content):
+    '''
+    Atomically write the fetched document to the cache file.
+    Failure to write is not an error; the next process will
+    simply fetch the document again.
+    '''
+    try:
+        cache_dir = os.path.dirname(cache_path)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        (fd, tmp_path) = tempfile.mkstemp(dir=cache_dir, suffix='.part')
+        with os.fdopen(fd, 'wb') as tmp_fd:
+            tmp_fd.write(content if isinstance(content, bytes) else content.encode('utf-8'))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
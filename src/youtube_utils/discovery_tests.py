@@ -0,0 +1,52 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils import discovery
+
+DO_ALL = True
+
+class DiscoveryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='youtube_utils_discovery_test')
+        self.doc_path = os.path.join(self.tmp_dir, 'youtube.v3.json')
+        with open(self.doc_path, 'w') as fd:
+            json.dump({'name' : 'youtube', 'version' : 'v3'}, fd)
+        discovery.forget_discovery_document()
+
+    def tearDown(self):
+        os.environ.pop(discovery.DISCOVERY_ENV_VAR, None)
+        discovery.forget_discovery_document()
+        shutil.rmtree(self.tmp_dir)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_env_var_document(self):
+        os.environ[discovery.DISCOVERY_ENV_VAR] = self.doc_path
+        doc = discovery.load_discovery_document()
+        self.assertEqual('youtube', doc['name'])
+        # Parsed once, then shared:
+        self.assertIs(doc, discovery.load_discovery_document())
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_local_cache_file(self):
+        saved_home = os.environ.get('HOME')
+        os.environ['HOME'] = self.tmp_dir
+        try:
+            cache_path = discovery.discovery_cache_path()
+            discovery._write_cache_file(cache_path, b'{"name" : "youtube", "version" : "cached"}')
+            self.assertEqual('cached', discovery.load_discovery_document()['version'])
+        finally:
+            os.environ['HOME'] = saved_home
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
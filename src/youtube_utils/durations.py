@@ -0,0 +1,191 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Fast parsing of the ISO 8601 durations the YouTube API
+returns for contentDetails/duration, such as 'PT11M2S',
+'PT1H2M', or 'P1DT2H3M'. The API only uses days, hours,
+minutes, and whole seconds, which a single compiled
+regular expression handles several times faster than
+isodate.parse_duration(). Anything else, such as years,
+weeks, or fractional seconds, falls back to isodate.
+
+For many values at once, parse_durations_seconds() runs
+the expression over all strings in one pass.
+
+Run this module to compare the speed of both paths:
+
+    python -m youtube_utils.durations [num_durations]
+'''
+import datetime
+import re
+import sys
+import timeit
+
+import isodate
+
+# P[nD][T[nH][nM][nS]], one duration. The lookaheads
+# require at least one component, and at least one
+# after a T:
+DURATION_PATTERN = re.compile(r'P(?=\d|T\d)(?:(\d+)D)?(?:T(?=\d)(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+# The same, for a newline-separated list of durations:
+DURATION_LINES_PATTERN = re.compile(r'^P(?=\d|T\d)(?:(\d+)D)?(?:T(?=\d)(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$',
+                                    re.MULTILINE)
+
+#-----------------------
+# parse_duration_seconds
+#---------
+
+def parse_duration_seconds(duration_str):
+    '''
+    Return the number of seconds in an ISO 8601 duration.
+    Durations with years or months are computed relative
+    to the epoch.
+
+    :param duration_str: duration, such as 'PT11M2S'
+    :type duration_str: str
+    :returns seconds, rounded down
+    :rtype int
+    :raise isodate.ISO8601Error if duration_str is not an ISO 8601 duration
+    '''
+    match = DURATION_PATTERN.match(duration_str)
+    if match is None:
+        return _isodate_seconds(duration_str)
+    return _groups_seconds(match.groups())
+
+#-----------------------
+# parse_duration
+#---------
+
+def parse_duration(duration_str):
+    '''
+    Drop-in replacement for isodate.parse_duration() for
+    durations returned by the YouTube API.
+
+    :param duration_str: duration, such as 'PT11M2S'
+    :type duration_str: str
+    :rtype datetime.timedelta
+    :raise isodate.ISO8601Error if duration_str is not an ISO 8601 duration
+    '''
+    match = DURATION_PATTERN.match(duration_str)
+    if match is None:
+        return _isodate_parse(duration_str)
+    return datetime.timedelta(seconds=_groups_seconds(match.groups()))
+
+#-----------------------
+# parse_durations_seconds
+#---------
+
+def parse_durations_seconds(duration_strs, missing=0):
+    '''
+    Return the number of seconds in each of a list of ISO 8601
+    durations. If all strings are in the API's usual form, the
+    whole list is parsed by a single regular expression scan;
+    else each string is parsed separately.
+
+    :param duration_strs: durations, such as 'PT11M2S'; None for missing values
+    :type duration_strs: [{ str | None }]
+    :param missing: number of seconds returned for None
+    :type missing: int
+    :returns seconds for each duration
+    :rtype [int]
+    :raise isodate.ISO8601Error if a string is not an ISO 8601 duration
+    '''
+    present = [duration_str for duration_str in duration_strs if duration_str is not None]
+    joined = '\n'.join(present)
+    groups = DURATION_LINES_PATTERN.findall(joined)
+    if len(groups) != len(present) or joined.count('\n') != len(present) - 1:
+        # Some string needs isodate. Very rare:
+        seconds = [parse_duration_seconds(duration_str) for duration_str in present]
+    else:
+        seconds = [_groups_seconds(match_groups) for match_groups in groups]
+    if len(present) == len(duration_strs):
+        return seconds
+    seconds_iter = iter(seconds)
+    return [missing if duration_str is None else next(seconds_iter) for duration_str in duration_strs]
+
+#-----------------------
+# _groups_seconds
+#---------
+
+def _groups_seconds(match_groups):
+    '''
+    Return the seconds of the days, hours, minutes, and
+    seconds groups of a duration pattern match.
+    '''
+    (days, hours, minutes, seconds) = match_groups
+    return (int(days) * 86400 if days else 0) + \
+           (int(hours) * 3600 if hours else 0) + \
+           (int(minutes) * 60 if minutes else 0) + \
+           (int(seconds) if seconds else 0)
+
+#-----------------------
+# _isodate_parse
+#---------
+
+def _isodate_parse(duration_str):
+    '''
+    Parse with isodate, which takes 'PT' and 'P1DT'
+    for valid durations. ISO 8601 requires at least
+    one component, and at least one after a T.
+    '''
+    if duration_str == 'P' or duration_str.endswith('T'):
+        raise isodate.ISO8601Error('Unable to parse duration string %r' % duration_str)
+    return isodate.parse_duration(duration_str)
+
+#-----------------------
+# _isodate_seconds
+#---------
+
+def _isodate_seconds(duration_str):
+    '''
+    Parse with isodate; years and months are taken
+    relative to the epoch.
+    '''
+    duration = _isodate_parse(duration_str)
+    if isinstance(duration, isodate.Duration):
+        duration = duration.totimedelta(start=datetime.datetime(1970, 1, 1))
+    return int(duration.total_seconds())
+
+#-----------------------
+# benchmark
+#---------
+
+def benchmark(num_durations=100000, repeat=5):
+    '''
+    Time the isodate path against this module's single and
+    batch parsers on a realistic mix of API durations. Prints
+    and returns the best time of each, in seconds.
+
+    :param num_durations: number of durations parsed per run
+    :type num_durations: int
+    :param repeat: number of runs; the fastest counts
+    :type repeat: int
+    :rtype { str : float }
+    '''
+    import random
+    rand = random.Random(4711)
+    samples = []
+    for _i in range(num_durations):
+        hours = rand.choice([0, 0, 0, 1, 2])
+        duration_str = 'PT'
+        if hours > 0:
+            duration_str += '%sH' % hours
+        duration_str += '%sM%sS' % (rand.randint(0, 59), rand.randint(0, 59))
+        samples.append(duration_str)
+
+    timings = {
+        'isodate.parse_duration' : lambda: [int(isodate.parse_duration(s).total_seconds()) for s in samples],
+        'parse_duration_seconds' : lambda: [parse_duration_seconds(s) for s in samples],
+        'parse_durations_seconds': lambda: parse_durations_seconds(samples),
+        }
+    results = {}
+    for (name, fn) in timings.items():
+        results[name] = min(timeit.repeat(fn, number=1, repeat=repeat))
+        print('%-25s %8.4f sec for %s durations' % (name, results[name], num_durations))
+    return results
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,51 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+from datetime import timedelta
+import unittest
+from unittest.case import skipIf
+
+import isodate
+
+from youtube_utils.durations import parse_duration, parse_duration_seconds, parse_durations_seconds
+
+DO_ALL = True
+
+class DurationsTest(unittest.TestCase):
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_api_forms(self):
+        for (duration_str, seconds) in [('PT11M2S', 662),
+                                        ('PT1H', 3600),
+                                        ('PT1H0M5S', 3605),
+                                        ('PT45S', 45),
+                                        ('P1DT2H3M4S', 93784),
+                                        ('P0D', 0)]:
+            self.assertEqual(seconds, parse_duration_seconds(duration_str))
+            self.assertEqual(isodate.parse_duration(duration_str), parse_duration(duration_str))
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_isodate_fallback(self):
+        self.assertEqual(2, parse_duration_seconds('PT2.5S'))
+        self.assertEqual(timedelta(seconds=2.5), parse_duration('PT2.5S'))
+        self.assertEqual(14 * 86400, parse_duration_seconds('P2W'))
+        self.assertRaises(isodate.ISO8601Error, parse_duration_seconds, 'eleven minutes')
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_empty_durations(self):
+        for duration_str in ('P', 'PT', 'P1DT', ''):
+            self.assertRaises(isodate.ISO8601Error, parse_duration_seconds, duration_str)
+            self.assertRaises(isodate.ISO8601Error, parse_duration, duration_str)
+            self.assertRaises(isodate.ISO8601Error, parse_durations_seconds, ['PT1S', duration_str])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_batch(self):
+        self.assertListEqual([662, 0, 3605], parse_durations_seconds(['PT11M2S', None, 'PT1H0M5S']))
+        self.assertListEqual([662, -1, 2], parse_durations_seconds(['PT11M2S', None, 'PT2.5S'], missing=-1))
+        self.assertListEqual([], parse_durations_seconds([]))
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
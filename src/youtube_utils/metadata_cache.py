@@ -0,0 +1,305 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Persistent on-disk cache for YouTube API responses. Entries
+live in an SQLite file, so that all jobs on one host can share
+them. Each entry is keyed by API endpoint, part, fields mask,
+and resource id, and carries the etag the API returned with
+it. Once an entry's time-to-live has passed, the YoutubeHelper
+revalidates it by sending the etag in an If-None-Match header;
+an unchanged resource then costs no quota.
+
+Usage:
+    cache = MetadataCache('/tmp/youtube_cache.sqlite',
+                          max_entries=200000,
+                          field_ttls={'description' : 3600})
+    helper = YoutubeHelper(referer='mooc-analyzer', cache=cache)
+'''
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class MetadataCache(object):
+    '''
+    Size-bounded, LRU-evicting key/value store for API
+    responses. Values are JSON-serializable structures.
+    Safe to use from multiple threads, and from multiple
+    processes that share the same database file.
+    '''
+
+    # Seconds an entry stays fresh unless a shorter
+    # time is set for one of its fields:
+    DEFAULT_TTL = 24 * 3600
+
+    # Maximum number of entries before the least
+    # recently used ones are evicted:
+    DEFAULT_MAX_ENTRIES = 500000
+
+    # Entries beyond max_entries are evicted in chunks
+    # of this fraction of max_entries, so that eviction
+    # does not run on every store():
+    EVICTION_FRACTION = 0.05
+
+    # Access times of looked-up entries are kept in memory,
+    # and written in batches of this many, so that cache
+    # hits do not each cost a write to the database:
+    ACCESS_FLUSH_SIZE = 1000
+
+    def __init__(self, db_path=None, max_entries=None, default_ttl=None, field_ttls=None):
+        '''
+        Open or create the cache database.
+
+        :param db_path: file for the SQLite store. Default: ~/.cache/youtube_utils/metadata.sqlite
+        :type db_path: str
+        :param max_entries: number of entries beyond which LRU eviction starts
+        :type max_entries: int
+        :param default_ttl: seconds an entry stays fresh without revalidation
+        :type default_ttl: { int | float }
+        :param field_ttls: per-field freshness, keyed by names from YoutubeHelper.video_info_names,
+            e.g. {'description' : 3600, 'duration' : 30*24*3600}
+        :type field_ttls: { str : { int | float } }
+        '''
+        if db_path is None:
+            cache_dir = os.path.join(os.getenv('HOME'), '.cache', 'youtube_utils')
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            db_path = os.path.join(cache_dir, 'metadata.sqlite')
+
+        self.db_path     = db_path
+        self.max_entries = max_entries if max_entries is not None else MetadataCache.DEFAULT_MAX_ENTRIES
+        self.default_ttl = default_ttl if default_ttl is not None else MetadataCache.DEFAULT_TTL
+        self.field_ttls  = field_ttls if field_ttls is not None else {}
+
+        # Number of store() calls since the entry count
+        # was last compared against max_entries:
+        self.stores_since_check = 0
+
+        # Access times not yet written to the database,
+        # keyed by cache key:
+        self.pending_accesses = {}
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS entries (
+                                 cache_key   TEXT PRIMARY KEY,
+                                 value       TEXT NOT NULL,
+                                 etag        TEXT,
+                                 expires     REAL NOT NULL,
+                                 last_access REAL NOT NULL
+                                 )''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+        self.conn.commit()
+
+    #--------------------------------- Public Methods ------------
+
+    #-----------------------
+    # make_key
+    #---------
+
+    @staticmethod
+    def make_key(endpoint, part, fields, item_id):
+        '''
+        Create the cache key for one API request.
+
+        :param endpoint: API method, such as 'videos.list'
+        :type endpoint: str
+        :param part: the request's part parameter
+        :type part: str
+        :param fields: the request's fields parameter, or None
+        :type fields: str
+        :param item_id: id of the video or other resource
+        :type item_id: str
+        :returns key under which the response is cached
+        :rtype str
+        '''
+        return '|'.join([endpoint, part or '', fields or '', item_id or ''])
+
+    #-----------------------
+    # ttl_for
+    #---------
+
+    def ttl_for(self, field_names):
+        '''
+        Return the time-to-live of an entry that holds the given
+        fields: the shortest of their TTLs.
+
+        :param field_names: names from YoutubeHelper.video_info_names
+        :type field_names: [str]
+        :returns seconds until the entry needs revalidation
+        :rtype float
+        '''
+        ttls = [self.field_ttls.get(field_name, self.default_ttl) for field_name in field_names]
+        if len(ttls) == 0:
+            return self.default_ttl
+        return min(ttls)
+
+    #-----------------------
+    # lookup
+    #---------
+
+    def lookup(self, cache_key):
+        '''
+        Retrieve an entry, fresh or not. Callers use the
+        returned etag to revalidate stale entries. The
+        entry's access time is recorded in memory, and
+        written along with those of other lookups.
+
+        :param cache_key: key created by make_key()
+        :type cache_key: str
+        :returns None if key is not cached, else the cached value,
+            its etag, and whether the entry is still fresh
+        :rtype { None | (<any>, str, bool) }
+        '''
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute('SELECT value, etag, expires FROM entries WHERE cache_key = ?',
+                                    (cache_key,)).fetchone()
+            if row is None:
+                return None
+            self.pending_accesses[cache_key] = now
+            if len(self.pending_accesses) >= MetadataCache.ACCESS_FLUSH_SIZE:
+                self._flush_accesses()
+                self.conn.commit()
+        (value, etag, expires) = row
+        return (json.loads(value), etag, expires > now)
+
+    #-----------------------
+    # store
+    #---------
+
+    def store(self, cache_key, value, etag=None, ttl=None):
+        '''
+        Add or replace an entry, evicting least recently
+        used entries if the cache is full.
+
+        :param cache_key: key created by make_key()
+        :type cache_key: str
+        :param value: JSON-serializable API response
+        :type value: <any>
+        :param etag: the etag the API returned with the value
+        :type etag: str
+        :param ttl: seconds the entry is fresh; default: default_ttl
+        :type ttl: { int | float }
+        '''
+        now = time.time()
+        if ttl is None:
+            ttl = self.default_ttl
+        with self.lock:
+            self.pending_accesses.pop(cache_key, None)
+            self.conn.execute('INSERT OR REPLACE INTO entries VALUES (?,?,?,?,?)',
+                              (cache_key, json.dumps(value), etag, now + ttl, now))
+            self.conn.commit()
+        self._evict_if_needed()
+
+    #-----------------------
+    # refresh
+    #---------
+
+    def refresh(self, cache_key, ttl=None):
+        '''
+        Mark an entry fresh again, after the API reported
+        that the resource is unchanged (HTTP 304).
+
+        :param cache_key: key created by make_key()
+        :type cache_key: str
+        :param ttl: seconds the entry is fresh; default: default_ttl
+        :type ttl: { int | float }
+        '''
+        now = time.time()
+        if ttl is None:
+            ttl = self.default_ttl
+        with self.lock:
+            self.pending_accesses.pop(cache_key, None)
+            self.conn.execute('UPDATE entries SET expires = ?, last_access = ? WHERE cache_key = ?',
+                              (now + ttl, now, cache_key))
+            self.conn.commit()
+
+    #-----------------------
+    # invalidate
+    #---------
+
+    def invalidate(self, cache_key=None):
+        '''
+        Remove one entry, or all entries if cache_key is None.
+
+        :param cache_key: key created by make_key()
+        :type cache_key: str
+        '''
+        with self.lock:
+            if cache_key is None:
+                self.pending_accesses.clear()
+                self.conn.execute('DELETE FROM entries')
+            else:
+                self.pending_accesses.pop(cache_key, None)
+                self.conn.execute('DELETE FROM entries WHERE cache_key = ?', (cache_key,))
+            self.conn.commit()
+
+    #-----------------------
+    # __len__
+    #---------
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    #-----------------------
+    # close
+    #---------
+
+    def close(self):
+        with self.lock:
+            self._flush_accesses()
+            self.conn.commit()
+            self.conn.close()
+
+    #--------------------------------- Private Utility Methods ------------
+
+    #-----------------------
+    # _evict_if_needed
+    #---------
+
+    def _evict_if_needed(self):
+        '''
+        If the cache holds more than max_entries, delete the least
+        recently used entries down to a bit below max_entries.
+        Counting entries is not free, so the check only happens
+        once per eviction chunk's worth of store() calls.
+        '''
+        slack = max(1, int(self.max_entries * MetadataCache.EVICTION_FRACTION))
+        with self.lock:
+            self.stores_since_check += 1
+            if self.stores_since_check < slack:
+                return
+            self.stores_since_check = 0
+            # Eviction goes by access time, so the
+            # times recorded in memory must count:
+            self._flush_accesses()
+            num_entries = self.conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            if num_entries > self.max_entries:
+                num_to_evict = num_entries - self.max_entries + slack
+                self.conn.execute('''DELETE FROM entries WHERE cache_key IN
+                                       (SELECT cache_key FROM entries ORDER BY last_access LIMIT ?)''',
+                                  (num_to_evict,))
+            self.conn.commit()
+
+    #-----------------------
+    # _flush_accesses
+    #---------
+
+    def _flush_accesses(self):
+        '''
+        Write the access times recorded by lookup() to the
+        database. Caller holds the lock, and commits.
+        '''
+        if len(self.pending_accesses) == 0:
+            return
+        self.conn.executemany('UPDATE entries SET last_access = ? WHERE cache_key = ?',
+                              [(access_time, cache_key)
+                               for (cache_key, access_time) in self.pending_accesses.items()])
+        self.pending_accesses.clear()
@@ -0,0 +1,86 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.case import skipIf
+from unittest.mock import patch
+
+from youtube_utils.metadata_cache import MetadataCache
+
+DO_ALL = True
+
+class MetadataCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='youtube_utils_cache_test')
+        self.cache = MetadataCache(os.path.join(self.tmp_dir, 'cache.sqlite'),
+                                   max_entries=20,
+                                   field_ttls={'description' : 0.2})
+        self.key = MetadataCache.make_key('videos.list', 'snippet', 'etag,items(snippet/title)', 'hlFeEQF5tDc')
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp_dir)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_store_and_lookup(self):
+        self.assertIsNone(self.cache.lookup(self.key))
+        res = {'etag' : 'e1', 'items' : [{'snippet' : {'title' : 'Unit 1 Module 5 part 1'}}]}
+        self.cache.store(self.key, res, etag='e1')
+        self.assertEqual((res, 'e1', True), self.cache.lookup(self.key))
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_field_ttls(self):
+        self.assertEqual(0.2, self.cache.ttl_for(['videoTitle', 'description']))
+        self.assertEqual(MetadataCache.DEFAULT_TTL, self.cache.ttl_for(['videoTitle']))
+        
+        self.cache.store(self.key, {'items' : []}, etag='e1', ttl=self.cache.ttl_for(['description']))
+        time.sleep(0.3)
+        (_res, etag, fresh) = self.cache.lookup(self.key)
+        self.assertEqual('e1', etag)
+        self.assertFalse(fresh)
+        
+        self.cache.refresh(self.key)
+        self.assertTrue(self.cache.lookup(self.key)[2])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_lru_eviction(self):
+        for i in range(20):
+            self.cache.store('key%s' % i, i)
+        # Touch the oldest entry, so that it survives eviction:
+        self.cache.lookup('key0')
+        for i in range(20, 25):
+            self.cache.store('key%s' % i, i)
+        self.assertLessEqual(len(self.cache), 20)
+        self.assertIsNotNone(self.cache.lookup('key0'))
+        self.assertIsNone(self.cache.lookup('key1'))
+        self.assertIsNotNone(self.cache.lookup('key24'))
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_batched_access_times(self):
+        for key in (self.key, 'key0', 'key1'):
+            self.cache.store(key, {'items' : []})
+        def stored_access():
+            return self.cache.conn.execute('SELECT last_access FROM entries WHERE cache_key = ?',
+                                           (self.key,)).fetchone()[0]
+        stored = stored_access()
+        time.sleep(0.01)
+        # Hits are not written one by one...
+        with patch.object(MetadataCache, 'ACCESS_FLUSH_SIZE', 3):
+            self.cache.lookup(self.key)
+            self.cache.lookup('key0')
+            self.assertEqual(stored_access(), stored)
+            # ... but once a batch is full:
+            self.cache.lookup('key1')
+            self.assertGreater(stored_access(), stored)
+        self.assertEqual(self.cache.pending_accesses, {})
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,351 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Instrumentation of YoutubeHelper. A Metrics instance passed
+to the helper (or shared by several helpers) records, per API
+endpoint:
+
+    o latency of each request attempt, as a histogram: time spent
+      on the network and in the API
+    o time spent waiting before attempts: rate limiting, quota
+      waits, and retry backoff in the QuotaScheduler
+    o bytes received, quota units charged, retries, and errors
+    o cache hits, misses, and etag revalidations
+
+and the time parse_api_result() takes, as a histogram by
+parser ('plan' or 'generic').
+
+A slowdown can thus be attributed to the network (request
+latency), to throttling (wait time), or to parsing. The numbers
+are available as:
+
+    o a snapshot dict: metrics.snapshot()
+    o OpenMetrics (Prometheus) text: metrics.openmetrics(), or
+      served over HTTP with metrics.serve(port)
+    o events passed to hooks as they happen:
+          metrics.add_hook(lambda event, label, value: ...)
+
+Helpers without a Metrics instance record nothing, and pay
+nothing for the instrumentation.
+'''
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bisect
+import threading
+
+
+class Histogram(object):
+    '''
+    Counts of observed values in fixed buckets, with their
+    sum, as Prometheus histograms keep them. Not thread
+    safe; Metrics serializes access.
+    '''
+
+    def __init__(self, bounds):
+        '''
+        :param bounds: ascending upper bounds of the buckets; an
+            unbounded bucket is added after the last one
+        :type bounds: [float]
+        '''
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum    = 0.0
+        self.count  = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum   += value
+        self.count += 1
+
+    def quantile(self, q):
+        '''
+        Estimate a quantile by interpolating within the bucket
+        that holds it. Values in the unbounded bucket are
+        reported as the highest bound.
+
+        :param q: the quantile, between 0 and 1
+        :type q: float
+        :rtype { float | None }
+        '''
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for (i, count) in enumerate(self.counts):
+            if count > 0 and cumulative + count >= rank:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.bounds[-1]
+
+    def snapshot(self):
+        return {'buckets' : list(zip(self.bounds + [float('inf')], self.counts)),
+                'sum'     : self.sum,
+                'count'   : self.count,
+                'p50'     : self.quantile(0.5),
+                'p99'     : self.quantile(0.99)}
+
+
+class Metrics(object):
+    '''
+    Thread safe store of YoutubeHelper measurements.
+    See the module docstring.
+    '''
+
+    # Seconds:
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    PARSE_BUCKETS   = (0.00001, 0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+    # Events passed to hooks, with the label they come with,
+    # and their value:
+    REQUEST   = 'request'     # endpoint, seconds of one attempt
+    WAIT      = 'wait'        # endpoint, seconds waited before attempts
+    RETRY     = 'retry'       # endpoint, 1
+    ERROR     = 'error'       # endpoint, 1
+    BYTES     = 'bytes'       # endpoint, bytes received
+    UNITS     = 'units'       # endpoint, quota units charged
+    CACHE     = 'cache'       # 'hit', 'miss', or 'revalidated', 1
+    PARSE     = 'parse'       # 'plan' or 'generic', seconds
+
+    # Counters, by the event that increments them:
+    COUNTERS = {WAIT  : 'wait_seconds',
+                RETRY : 'retries',
+                ERROR : 'errors',
+                BYTES : 'bytes',
+                UNITS : 'units'}
+
+    # Counters in openmetrics(): counter, metric name suffix, unit, help:
+    COUNTER_EXPORTS = (('wait_seconds', 'wait_seconds',   'seconds', 'Time waited for rate limits, quota, and retry backoff.'),
+                       ('retries',      'retries',        None,      'Retried API request attempts.'),
+                       ('errors',       'errors',         None,      'Failed API requests.'),
+                       ('bytes',        'response_bytes', 'bytes',   'Response bytes received.'),
+                       ('units',        'quota_units',    None,      'Quota units charged.'))
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hooks = []
+        self.reset()
+
+    #--------------------------------- Public Methods ------------
+
+    #-----------------------
+    # add_hook
+    #---------
+
+    def add_hook(self, hook):
+        '''
+        Call hook(event, label, value) for every event recorded
+        from now on, on the thread that records it. See the event
+        constants for labels and values. Hooks must be fast, and
+        must not raise.
+
+        :param hook: the callable
+        :type hook: callable
+        '''
+        self.hooks.append(hook)
+
+    #-----------------------
+    # remove_hook
+    #---------
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    #-----------------------
+    # record
+    #---------
+
+    def record(self, event, label, value=1):
+        '''
+        Record one event.
+
+        :param event: one of the event constants, such as Metrics.REQUEST
+        :type event: str
+        :param label: endpoint, cache result, or parser
+        :type label: str
+        :param value: seconds, bytes, units, or 1 for counted events
+        :type value: { int | float }
+        '''
+        with self.lock:
+            if event == Metrics.REQUEST:
+                self._histogram(self.latency, label, Metrics.LATENCY_BUCKETS).observe(value)
+            elif event == Metrics.PARSE:
+                self._histogram(self.parse_time, label, Metrics.PARSE_BUCKETS).observe(value)
+            elif event == Metrics.CACHE:
+                self.cache[label] += value
+            else:
+                self.counters[Metrics.COUNTERS[event]][label] += value
+        for hook in self.hooks:
+            hook(event, label, value)
+
+    #-----------------------
+    # snapshot
+    #---------
+
+    def snapshot(self):
+        '''
+        Return a copy of all measurements so far:
+
+            {'endpoints' : {'videos.list' : {'latency' : <histogram snapshot>,
+                                             'wait_seconds' : 0.2,
+                                             'retries' : 1,
+                                             'errors' : 0,
+                                             'bytes' : 30512,
+                                             'units' : 4},
+                            ...},
+             'cache'     : {'hit' : 10, 'miss' : 3, 'revalidated' : 1, 'hit_ratio' : 0.79},
+             'parse'     : {'plan' : <histogram snapshot>, ...}}
+
+        Histogram snapshots hold buckets as (upper bound, count) pairs,
+        and the sum, count, and estimated median and 99th percentile.
+        The hit_ratio counts revalidations as hits; it is None
+        before the first lookup.
+
+        :rtype { str : <any> }
+        '''
+        with self.lock:
+            endpoints = set(self.latency.keys())
+            for counter in self.counters.values():
+                endpoints.update(counter.keys())
+            endpoint_dicts = {}
+            for endpoint in endpoints:
+                endpoint_dict = {name : counter[endpoint] for (name, counter) in self.counters.items()}
+                latency = self.latency.get(endpoint)
+                endpoint_dict['latency'] = latency.snapshot() if latency is not None else None
+                endpoint_dicts[endpoint] = endpoint_dict
+            cache = {result : self.cache[result] for result in ('hit', 'miss', 'revalidated')}
+            lookups = sum(cache.values())
+            cache['hit_ratio'] = (cache['hit'] + cache['revalidated']) / lookups if lookups > 0 else None
+            parse = {parser : histogram.snapshot() for (parser, histogram) in self.parse_time.items()}
+        return {'endpoints' : endpoint_dicts, 'cache' : cache, 'parse' : parse}
+
+    #-----------------------
+    # reset
+    #---------
+
+    def reset(self):
+        '''
+        Discard all measurements. Hooks remain.
+        '''
+        with self.lock:
+            self.latency    = {}
+            self.parse_time = {}
+            self.counters   = {name : Counter() for name in Metrics.COUNTERS.values()}
+            self.cache      = Counter()
+
+    #-----------------------
+    # openmetrics
+    #---------
+
+    def openmetrics(self, prefix='youtube_utils'):
+        '''
+        Return the measurements in the OpenMetrics text format,
+        which Prometheus scrapes.
+
+        :param prefix: prepended to all metric names
+        :type prefix: str
+        :rtype str
+        '''
+        with self.lock:
+            lines = []
+            self._histogram_lines(lines, prefix + '_request_seconds', 'Latency of API request attempts.',
+                                  'endpoint', self.latency)
+            for (name, suffix, unit, help_text) in Metrics.COUNTER_EXPORTS:
+                metric = '%s_%s' % (prefix, suffix)
+                lines.append('# TYPE %s counter' % metric)
+                if unit is not None:
+                    lines.append('# UNIT %s %s' % (metric, unit))
+                lines.append('# HELP %s %s' % (metric, help_text))
+                for (endpoint, value) in sorted(self.counters[name].items()):
+                    lines.append('%s_total{endpoint="%s"} %s' % (metric, _escape(endpoint), _number(value)))
+            metric = prefix + '_cache_lookups'
+            lines.append('# TYPE %s counter' % metric)
+            lines.append('# HELP %s Cache lookups, by result.' % metric)
+            for (result, value) in sorted(self.cache.items()):
+                lines.append('%s_total{result="%s"} %s' % (metric, _escape(result), _number(value)))
+            self._histogram_lines(lines, prefix + '_parse_seconds', 'Time spent parsing API results.',
+                                  'parser', self.parse_time)
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    #-----------------------
+    # serve
+    #---------
+
+    def serve(self, port=0, host='127.0.0.1'):
+        '''
+        Serve openmetrics() at http://<host>:<port>/metrics from a
+        daemon thread. Call shutdown() and server_close() on the
+        returned server to stop.
+
+        :param port: port to listen on; default: any free port
+        :type port: int
+        :param host: interface to listen on; '' for all
+        :type host: str
+        :returns the running server; its port is server_address[1]
+        :rtype http.server.ThreadingHTTPServer
+        '''
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        server.daemon_threads = True
+        server.metrics = self
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    #--------------------------------- Private Utility Methods ------------
+
+    def _histogram(self, histograms, label, bounds):
+        histogram = histograms.get(label)
+        if histogram is None:
+            histogram = histograms[label] = Histogram(bounds)
+        return histogram
+
+    def _histogram_lines(self, lines, metric, help_text, label_name, histograms):
+        lines.append('# TYPE %s histogram' % metric)
+        lines.append('# UNIT %s seconds' % metric)
+        lines.append('# HELP %s %s' % (metric, help_text))
+        for (label, histogram) in sorted(histograms.items()):
+            label = _escape(label)
+            cumulative = 0
+            for (bound, count) in zip(histogram.bounds + [float('inf')], histogram.counts):
+                cumulative += count
+                lines.append('%s_bucket{%s="%s",le="%s"} %s' %
+                             (metric, label_name, label, '+Inf' if bound == float('inf') else repr(float(bound)), cumulative))
+            lines.append('%s_count{%s="%s"} %s' % (metric, label_name, label, histogram.count))
+            lines.append('%s_sum{%s="%s"} %s' % (metric, label_name, label, repr(histogram.sum)))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.metrics.openmetrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', _MetricsHandler.CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+#-----------------------
+# _escape
+#---------
+
+def _escape(label_value):
+    return str(label_value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+#-----------------------
+# _number
+#---------
+
+def _number(value):
+    return repr(value) if isinstance(value, float) else str(value)
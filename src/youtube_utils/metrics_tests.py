@@ -0,0 +1,139 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.case import skipIf
+import urllib.request
+
+from googleapiclient.errors import HttpError
+
+from youtube_utils.metadata_cache import MetadataCache
+from youtube_utils.metrics import Histogram, Metrics
+from youtube_utils.mock_api import MockYoutubeServer
+from youtube_utils.quota import QuotaScheduler
+from youtube_utils.youtube_utils import YoutubeHelper
+
+DO_ALL = True
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockYoutubeServer(caption_cues=5, seed=1).start()
+        self.metrics = Metrics()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def make_helper(self, **kwargs):
+        return YoutubeHelper(referer='test',
+                             api_key='test',
+                             api_endpoint=self.server.api_endpoint,
+                             scheduler=QuotaScheduler(base_delay=0.01, max_delay=0.02),
+                             metrics=self.metrics,
+                             **kwargs)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_histogram(self):
+        histogram = Histogram([1, 2, 4])
+        for value in (0.5, 1.5, 1.5, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertAlmostEqual(histogram.sum, 16.5)
+        self.assertTrue(1 <= histogram.quantile(0.5) <= 2)
+        self.assertEqual(histogram.quantile(1.0), 4)
+        self.assertIsNone(Histogram([1]).quantile(0.5))
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_request_metrics(self):
+        events = []
+        self.metrics.add_hook(lambda event, label, value: events.append((event, label)))
+        with self.make_helper() as helper:
+            helper.get_video_info(['videoTitle'], 'vid1')
+            list(helper.get_video_info_bulk(['videoTitle'], ['vid%s' % i for i in range(60)]))
+            helper.get_caption_files('vid1', outdir=self.tmpdir)
+        
+        snapshot = self.metrics.snapshot()
+        videos = snapshot['endpoints']['videos.list']
+        self.assertEqual(videos['latency']['count'], 3)
+        self.assertEqual(videos['units'], 3)
+        self.assertEqual(videos['retries'], 0)
+        self.assertEqual(videos['errors'], 0)
+        self.assertTrue(videos['bytes'] > 0)
+        self.assertTrue(videos['wait_seconds'] >= 0)
+        self.assertTrue(snapshot['endpoints']['captions.download']['bytes'] > 0)
+        # One parse per request:
+        self.assertEqual(snapshot['parse']['plan']['count'], 3)
+        self.assertIn((Metrics.REQUEST, 'videos.list'), events)
+        self.assertIn((Metrics.PARSE, 'plan'), events)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_retries_and_errors(self):
+        self.server.error_rate = 0.5
+        with self.make_helper() as helper:
+            for i in range(10):
+                helper.get_video_info(['videoTitle'], 'vid%s' % i)
+        videos = self.metrics.snapshot()['endpoints']['videos.list']
+        self.assertTrue(videos['retries'] > 0)
+        self.assertEqual(videos['latency']['count'], 10 + videos['retries'])
+        # Failed attempts are charged too:
+        self.assertEqual(videos['units'], videos['latency']['count'])
+        # Backoff is waiting, not latency:
+        self.assertTrue(videos['wait_seconds'] > 0)
+        
+        self.server.error_rate = 1.0
+        with self.make_helper() as helper:
+            helper.scheduler.max_retries = 1
+            with self.assertRaises(HttpError):
+                helper.get_video_info(['videoTitle'], 'vid1')
+        self.assertEqual(self.metrics.snapshot()['endpoints']['videos.list']['errors'], 1)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_cache_metrics(self):
+        cache = MetadataCache(os.path.join(self.tmpdir, 'cache.sqlite'), default_ttl=3600)
+        try:
+            with self.make_helper(cache=cache) as helper:
+                helper.get_video_info(['videoTitle'], 'vid1')
+                helper.get_video_info(['videoTitle'], 'vid1')
+                helper.get_video_info(['videoTitle'], 'vid1')
+        finally:
+            cache.close()
+        cache_stats = self.metrics.snapshot()['cache']
+        self.assertEqual((cache_stats['hit'], cache_stats['miss'], cache_stats['revalidated']), (2, 1, 0))
+        self.assertAlmostEqual(cache_stats['hit_ratio'], 2 / 3)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_open_metrics(self):
+        with self.make_helper() as helper:
+            helper.get_video_info(['videoTitle'], 'vid1')
+            helper.parse_api_result({'items' : [self.server.video_item('vid2')]})
+        text = self.metrics.openmetrics()
+        self.assertTrue(text.endswith('# EOF\n'))
+        self.assertIn('# TYPE youtube_utils_request_seconds histogram', text)
+        self.assertIn('youtube_utils_request_seconds_bucket{endpoint="videos.list",le="+Inf"} 1', text)
+        self.assertIn('youtube_utils_quota_units_total{endpoint="videos.list"} 1', text)
+        self.assertIn('youtube_utils_parse_seconds_count{parser="generic"} 1', text)
+        
+        server = self.metrics.serve()
+        try:
+            url = 'http://127.0.0.1:%s/metrics' % server.server_address[1]
+            with urllib.request.urlopen(url) as response:
+                self.assertTrue(response.headers['Content-Type'].startswith('application/openmetrics-text'))
+                self.assertEqual(response.read().decode('utf-8'), self.metrics.openmetrics())
+        finally:
+            server.shutdown()
+            server.server_close()
+        
+        self.metrics.reset()
+        self.assertEqual(self.metrics.snapshot()['endpoints'], {})
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,412 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Local stand-in for the parts of the YouTube data API that
+YoutubeHelper uses, for tests and benchmarks that must not
+depend on the network, an API key, or quota:
+
+    videos.list, captions.list, captions.download, search.list
+
+Answers are synthesized from the requested IDs, so the same
+request always gets the same answer. Knobs control the latency
+of each answer, the rate of transient errors, and a quota
+budget after which requests fail as the real API's do:
+
+    with MockYoutubeServer(latency=0.02, error_rate=0.01, quota_units=10000) as server:
+        helper = YoutubeHelper(referer='mooc-analyzer',
+                               api_key='mock',
+                               api_endpoint=server.api_endpoint)
+        helper.get_video_info(['videoTitle'], 'vid00001')
+        server.num_requests['videos.list']
+        -> 1
+
+Video IDs that start with 'missing' do not exist. Those that
+start with 'variants' have a second, named, English caption
+track. As the real API does, the server returns only the parts
+of its answers that the request's fields parameter selects.
+'''
+from collections import Counter
+import gzip
+import hashlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import json
+import random
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+from .quota import QuotaScheduler
+
+
+class MockYoutubeServer(object):
+    '''
+    HTTP server on a local port, serving in a background
+    thread once started.
+    '''
+
+    # Prefix of the API's method paths. Depending on the
+    # version of the discovery document, it is part of the
+    # method paths, or of the service path. Requests are
+    # served with or without it:
+    SERVICE_PATH = '/youtube/v3/'
+
+    def __init__(self,
+                 latency=0.0,
+                 error_rate=0.0,
+                 rate_limit_rate=0.0,
+                 quota_units=None,
+                 search_results=500,
+                 caption_cues=200,
+                 gzip_responses=True,
+                 seed=None,
+                 port=0):
+        '''
+        :param latency: seconds each answer is delayed
+        :type latency: float
+        :param error_rate: fraction of requests answered with 503 backendError
+        :type error_rate: float
+        :param rate_limit_rate: fraction of requests answered with 403 rateLimitExceeded
+        :type rate_limit_rate: float
+        :param quota_units: units available, charged per request as the real
+            API does; afterwards requests fail with 403 quotaExceeded. None: unlimited
+        :type quota_units: int
+        :param search_results: total number of results of any search
+        :type search_results: int
+        :param caption_cues: number of cues in each caption track
+        :type caption_cues: int
+        :param gzip_responses: compress answers to clients that accept gzip
+        :type gzip_responses: bool
+        :param seed: seed for the error injection, for repeatable runs
+        :type seed: int
+        :param port: port to listen on; default: any free port
+        :type port: int
+        '''
+        self.latency         = latency
+        self.error_rate      = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.quota_units     = quota_units
+        self.search_results  = search_results
+        self.caption_cues    = caption_cues
+        self.gzip_responses  = gzip_responses
+        self.random          = random.Random(seed)
+        self.lock            = threading.Lock()
+        self.num_requests    = Counter()
+        self.units_used      = 0
+        self.bytes_sent      = 0
+        self.server = _MockHttpServer(('127.0.0.1', port), _MockHandler)
+        self.server.mock = self
+        self.thread = None
+
+    #--------------------------------- Public Methods ------------
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%s' % self.server.server_address[1]
+
+    @property
+    def api_endpoint(self):
+        '''
+        Value for the api_endpoint argument of YoutubeHelper.
+        '''
+        return self.url + '/'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_counters(self):
+        with self.lock:
+            self.num_requests.clear()
+            self.units_used = 0
+            self.bytes_sent = 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    #-----------------------
+    # video_item
+    #---------
+
+    def video_item(self, video_id):
+        '''
+        Return the synthetic videos.list item of a video.
+        '''
+        digest = self._digest(video_id)
+        seconds = 60 + digest % 3600
+        return {'kind' : 'youtube#video',
+                'etag' : '"%s"' % hashlib.md5(video_id.encode('utf-8')).hexdigest(),
+                'id'   : video_id,
+                'snippet' : {'publishedAt'  : '2016-%02d-%02dT10:00:00.000Z' % (1 + digest % 12, 1 + digest % 28),
+                             'channelId'    : 'UCmock%04d' % (digest % 100),
+                             'title'        : 'Lecture %s' % video_id,
+                             'description'  : 'Synthetic description of %s. ' % video_id * 5,
+                             'channelTitle' : 'Mock Channel %s' % (digest % 100),
+                             'thumbnails'   : {size : {'url' : 'https://i.ytimg.com/vi/%s/%s.jpg' % (video_id, size)}
+                                               for size in ('default', 'high')}},
+                'contentDetails' : {'duration' : 'PT%sM%sS' % (seconds // 60, seconds % 60),
+                                    'caption'  : 'true' if digest % 4 else 'false'},
+                'status' : {'uploadStatus'  : 'processed',
+                            'privacyStatus' : 'public',
+                            'license'       : 'youtube',
+                            'embeddable'    : bool(digest % 2),
+                            'madeForKids'   : False},
+                'statistics' : {'viewCount'    : str(digest % 100000),
+                                'likeCount'    : str(digest % 1000),
+                                'commentCount' : str(digest % 100)},
+                'topicDetails' : {'topicCategories' : ['https://en.wikipedia.org/wiki/Knowledge']}}
+
+    #-----------------------
+    # caption_body
+    #---------
+
+    def caption_body(self, track_id):
+        '''
+        Return the srt content of a caption track.
+        '''
+        lines = []
+        for i in range(self.caption_cues):
+            (start, end) = (i * 3000, i * 3000 + 2500)
+            lines.append('%s\n%s --> %s\nCue %s of caption track %s\n' % (i + 1,
+                                                                      _srt_time(start),
+                                                                      _srt_time(end),
+                                                                      i + 1,
+                                                                      track_id))
+        return '\n'.join(lines).encode('utf-8')
+
+    #--------------------------------- Private Utility Methods ------------
+
+    def _digest(self, text):
+        return int(hashlib.md5(text.encode('utf-8')).hexdigest()[:8], 16)
+
+    def _charge(self, endpoint):
+        '''
+        Count the request, and decide how it fails, if it does.
+
+        :returns None, or HTTP status and error reason
+        :rtype (int, str)
+        '''
+        with self.lock:
+            self.num_requests[endpoint] += 1
+            if self.quota_units is not None:
+                cost = QuotaScheduler.ENDPOINT_COSTS.get(endpoint, QuotaScheduler.DEFAULT_COST)
+                if self.units_used + cost > self.quota_units:
+                    return (403, 'quotaExceeded')
+                self.units_used += cost
+            draw = self.random.random()
+        if draw < self.error_rate:
+            return (503, 'backendError')
+        if draw < self.error_rate + self.rate_limit_rate:
+            return (403, 'rateLimitExceeded')
+        return None
+
+    def _answer(self, endpoint, path, params):
+        '''
+        Compute the JSON answer, or media body, of a request.
+
+        :returns status, and a dict or bytes
+        :rtype (int, { dict | bytes })
+        '''
+        if endpoint == 'videos.list':
+            # Items hold only the requested parts:
+            parts = set(params.get('part', [''])[0].split(',')) | set(['kind', 'etag', 'id'])
+            items = [{key : value for (key, value) in self.video_item(video_id).items() if key in parts}
+                     for video_id in params.get('id', [''])[0].split(',')
+                     if video_id and not video_id.startswith('missing')]
+            return (200, {'kind' : 'youtube#videoListResponse',
+                          'etag' : '"%s"' % hashlib.md5(json.dumps(items).encode('utf-8')).hexdigest(),
+                          'items' : items})
+        if endpoint == 'captions.list':
+            video_id = params.get('videoId', [''])[0]
+            if video_id.startswith('missing'):
+                return (404, _error_body(404, 'videoNotFound'))
+            tracks = [('standard', ''), ('asr', '')]
+            if video_id.startswith('variants'):
+                tracks.append(('standard', 'Simplified English'))
+            items = [{'kind' : 'youtube#caption',
+                      'etag' : '"%s-%s%s"' % (video_id, kind, name),
+                      'id'   : '%s.en%s%s' % (video_id, '.asr' if kind == 'asr' else '', '.' + name[:4] if name else ''),
+                      'snippet' : {'videoId' : video_id, 'language' : 'en', 'name' : name, 'trackKind' : kind}}
+                     for (kind, name) in tracks]
+            return (200, {'kind' : 'youtube#captionListResponse',
+                          'etag' : '"%s-captions"' % video_id,
+                          'items' : items})
+        if endpoint == 'captions.download':
+            return (200, self.caption_body(path.rsplit('/', 1)[-1]))
+        if endpoint == 'search.list':
+            max_results = min(50, int(params.get('maxResults', ['5'])[0]))
+            offset = int(params.get('pageToken', ['0'])[0])
+            query = params.get('q', [''])[0]
+            num_items = max(0, min(max_results, self.search_results - offset))
+            items = []
+            for i in range(offset, offset + num_items):
+                video_id = 'srch%07d' % (self._digest(query) % 1000 + i)
+                video = self.video_item(video_id)
+                items.append({'kind'    : 'youtube#searchResult',
+                              'etag'    : video['etag'],
+                              'id'      : {'kind' : 'youtube#video', 'videoId' : video_id},
+                              'snippet' : video['snippet']})
+            res = {'kind' : 'youtube#searchListResponse',
+                   'etag' : '"search-%s-%s"' % (query, offset),
+                   'pageInfo' : {'totalResults' : self.search_results, 'resultsPerPage' : max_results},
+                   'items' : items}
+            if offset + num_items < self.search_results:
+                res['nextPageToken'] = str(offset + num_items)
+            return (200, res)
+        return (404, _error_body(404, 'notFound'))
+
+
+class _MockHttpServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that give up leave broken pipes behind:
+        pass
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    '''
+    Maps request paths to API methods, and sends the
+    mock's answers.
+    '''
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle's
+    # algorithm, the body would wait for the client's delayed ACK:
+    disable_nagle_algorithm = True
+
+    ENDPOINTS = {'videos'   : 'videos.list',
+                 'captions' : 'captions.list',
+                 'search'   : 'search.list'}
+
+    def do_GET(self):
+        mock = self.server.mock
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        path = url.path
+        if path.startswith(MockYoutubeServer.SERVICE_PATH):
+            path = path[len(MockYoutubeServer.SERVICE_PATH):]
+        else:
+            path = path.lstrip('/')
+        if path.startswith('captions/'):
+            endpoint = 'captions.download'
+        else:
+            endpoint = _MockHandler.ENDPOINTS.get(path.strip('/'), path)
+
+        if mock.latency > 0:
+            time.sleep(mock.latency)
+        failure = mock._charge(endpoint)
+        if failure is not None:
+            (status, body) = (failure[0], _error_body(*failure))
+        else:
+            (status, body) = mock._answer(endpoint, path, params)
+
+        if isinstance(body, dict):
+            if status == 200 and 'fields' in params:
+                body = _select_fields(body, _parse_fields(params['fields'][0]))
+            etag = body.get('etag')
+            if status == 200 and etag is not None and self.headers.get('If-None-Match') == etag:
+                self._send(304, b'', 'application/json', {'ETag' : etag})
+                return
+            extra_headers = {'ETag' : etag} if etag is not None else {}
+            self._send(status, json.dumps(body).encode('utf-8'), 'application/json; charset=UTF-8', extra_headers)
+        else:
+            self._send(status, body, 'text/plain; charset=UTF-8', {})
+
+    def _send(self, status, body, content_type, extra_headers):
+        mock = self.server.mock
+        gzipped = mock.gzip_responses and len(body) > 0 and \
+                  'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzipped:
+            body = gzip.compress(body, compresslevel=1)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        for (header, value) in extra_headers.items():
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with mock.lock:
+            mock.bytes_sent += len(body)
+
+    def log_message(self, *args):
+        pass
+
+#-----------------------
+# _error_body
+#---------
+
+def _error_body(status, reason):
+    '''
+    Error answer in the format of the real API, which
+    QuotaScheduler.classify_error() understands.
+    '''
+    return {'error' : {'code'    : status,
+                       'message' : 'Mock API error: %s' % reason,
+                       'errors'  : [{'domain' : 'youtube.mock', 'reason' : reason, 'message' : reason}]}}
+
+#-----------------------
+# _parse_fields
+#---------
+
+def _parse_fields(fields):
+    '''
+    Parse a fields parameter, such as 'etag,items(id,snippet/title)',
+    into a tree of nested dicts; leaves are True:
+
+        {'etag' : True, 'items' : {'id' : True, 'snippet' : {'title' : True}}}
+    '''
+    (tree, _pos) = _parse_field_list(fields, 0)
+    return tree
+
+def _parse_field_list(fields, pos):
+    tree = {}
+    while pos < len(fields):
+        if fields[pos] == ')':
+            return (tree, pos + 1)
+        if fields[pos] == ',':
+            pos += 1
+            continue
+        end = pos
+        while end < len(fields) and fields[end] not in ',()':
+            end += 1
+        path = fields[pos:end].split('/')
+        if end < len(fields) and fields[end] == '(':
+            (leaf, pos) = _parse_field_list(fields, end + 1)
+        else:
+            (leaf, pos) = (True, end)
+        node = tree
+        for name in path[:-1]:
+            if node.get(name) is True:
+                # Already selected as a whole:
+                break
+            node = node.setdefault(name, {})
+        else:
+            node[path[-1]] = leaf
+    return (tree, pos)
+
+#-----------------------
+# _select_fields
+#---------
+
+def _select_fields(value, tree):
+    if tree is True:
+        return value
+    if isinstance(value, list):
+        return [_select_fields(element, tree) for element in value]
+    if not isinstance(value, dict):
+        return value
+    return {key : _select_fields(value[key], subtree) for (key, subtree) in tree.items() if key in value}
+
+def _srt_time(ms):
+    return '%02d:%02d:%02d,%03d' % (ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000)
@@ -0,0 +1,165 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.case import skipIf
+import urllib.request
+
+from youtube_utils.metadata_cache import MetadataCache
+from youtube_utils.metrics import Metrics
+from youtube_utils.mock_api import MockYoutubeServer
+from youtube_utils.quota import QuotaExhaustedError, QuotaScheduler
+from youtube_utils.youtube_utils import CaptionManifest, YoutubeHelper
+
+DO_ALL = True
+
+class MockApiTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockYoutubeServer(search_results=120, caption_cues=5, seed=0).start()
+        self.helper = YoutubeHelper(referer='test', 
+                                    api_key='test', 
+                                    api_endpoint=self.server.api_endpoint,
+                                    scheduler=QuotaScheduler(base_delay=0.01, max_delay=0.02))
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.helper.close()
+        self.server.stop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_video_info(self):
+        info = self.helper.get_video_info(['videoTitle', 'duration'], 'vid1')
+        self.assertEqual(info[0]['videoTitle'], self.server.video_item('vid1')['snippet']['title'])
+        
+        missing = []
+        items = list(self.helper.get_video_info_bulk(['videoTitle'], ['vid1', 'missing1', 'vid2'], missing_ids=missing))
+        self.assertEqual(len(items), 2)
+        self.assertEqual(missing, ['missing1'])
+        self.assertEqual(self.server.num_requests['videos.list'], 2)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_minimal_parts(self):
+        info = self.helper.get_video_info(['viewCount', 'privacyStatus', 'topicCategories', 'thumbnailUrl'], 'vid1')[0]
+        item = self.server.video_item('vid1')
+        self.assertDictEqual(info, {'viewCount'       : int(item['statistics']['viewCount']),
+                                    'privacyStatus'   : 'public',
+                                    'topicCategories' : item['topicDetails']['topicCategories'],
+                                    'thumbnailUrl'    : item['snippet']['thumbnails']['default']['url']})
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_search_pagination(self):
+        results = list(self.helper.iter_search('anything', 'videoId'))
+        self.assertEqual(len(results), 120)
+        self.assertEqual(len(set(row['videoId'] for row in results)), 120)
+        # Fifty results per page:
+        self.assertEqual(self.server.num_requests['search.list'], 3)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_caption_download(self):
+        file_names = self.helper.get_caption_files('vid1', outdir=self.tmpdir)
+        self.assertTrue(len(file_names) > 0)
+        for file_name in file_names:
+            with open(os.path.join(self.tmpdir, file_name) if not os.path.isabs(file_name) else file_name, 'r') as fd:
+                self.assertIn('-->', fd.read())
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_named_caption_tracks_and_manifest(self):
+        file_paths = self.helper.get_caption_files('variants1', outdir=self.tmpdir)
+        # Two tracks in English do not overwrite each other:
+        self.assertEqual([os.path.basename(path) for path in file_paths],
+                         ['variants1_en.orig', 'variants1_en_asr.orig', 'variants1_en_Simplified-English.orig'])
+        self.assertEqual(self.server.num_requests['captions.download'], 3)
+        # The manifest has one line per file, and
+        # prevents downloads of unchanged tracks:
+        with open(os.path.join(self.tmpdir, CaptionManifest.MANIFEST_NAME), 'r') as fd:
+            self.assertEqual(len(fd.readlines()), 3)
+        self.helper.caption_manifests.clear()
+        self.helper.get_caption_files('variants1', outdir=self.tmpdir)
+        self.assertEqual(self.server.num_requests['captions.download'], 3)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_transient_errors_retried(self):
+        self.server.error_rate = 0.3
+        items = list(self.helper.get_video_info_bulk(['videoTitle'], ['vid%s' % i for i in range(200)]))
+        self.assertEqual(len(items), 200)
+        self.assertTrue(self.helper.scheduler.num_retries > 0)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_quota_exhausted(self):
+        self.server.quota_units = 2
+        self.helper.get_video_info(['videoTitle'], 'vid1')
+        self.helper.get_video_info(['videoTitle'], 'vid2')
+        with self.assertRaises(QuotaExhaustedError):
+            self.helper.get_video_info(['videoTitle'], 'vid3')
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_fields_mask_and_revalidation(self):
+        url = self.server.url + '/videos?id=vid1&part=snippet&fields=items(id,snippet/title),etag'
+        with urllib.request.urlopen(url) as response:
+            body = json.loads(response.read().decode('utf-8'))
+            etag = response.headers['ETag']
+        self.assertEqual(set(body['items'][0].keys()), set(['id', 'snippet']))
+        self.assertEqual(list(body['items'][0]['snippet'].keys()), ['title'])
+        
+        request = urllib.request.Request(url, headers={'If-None-Match' : etag})
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            urllib.request.urlopen(request)
+        self.assertEqual(context.exception.code, 304)
+        
+        # Helper with a cache whose entries expire at once
+        # revalidates through the 304 path:
+        cache = MetadataCache(os.path.join(self.tmpdir, 'cache.sqlite'), default_ttl=0)
+        helper = YoutubeHelper(referer='test', api_key='test', cache=cache, api_endpoint=self.server.api_endpoint)
+        try:
+            first  = helper.get_video_info(['videoTitle'], 'vid1')
+            second = helper.get_video_info(['videoTitle'], 'vid1')
+        finally:
+            helper.close()
+            cache.close()
+        self.assertEqual(first, second)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_bulk_revalidation(self):
+        # Cache entries expire at once:
+        cache = MetadataCache(os.path.join(self.tmpdir, 'cache.sqlite'), default_ttl=0)
+        metrics = Metrics()
+        helper = YoutubeHelper(referer='test', api_key='test', cache=cache, metrics=metrics,
+                               api_endpoint=self.server.api_endpoint)
+        try:
+            first = list(helper.get_video_info_bulk(['videoTitle'], ['vid1', 'vid2']))
+            self.assertEqual(self.server.num_requests['videos.list'], 1)
+            
+            # Unchanged stale items are revalidated by their
+            # etags alone:
+            self.assertEqual(list(helper.get_video_info_bulk(['videoTitle'], ['vid1', 'vid2'])), first)
+            self.assertEqual(self.server.num_requests['videos.list'], 2)
+            self.assertEqual(metrics.snapshot()['cache']['revalidated'], 2)
+            
+            # Only the changed item is fetched in full:
+            plan = helper.query_plan(['videoTitle'], include_id=True)
+            cache_key = MetadataCache.make_key('videos.list', plan.part, plan.fields, 'vid2')
+            cache.store(cache_key, {'items' : [{'id' : 'vid2', 'snippet' : {'title' : 'Old'}}]}, etag='"old"')
+            self.assertEqual(list(helper.get_video_info_bulk(['videoTitle'], ['vid1', 'vid2'])), first)
+            self.assertEqual(self.server.num_requests['videos.list'], 4)
+            self.assertEqual(cache.lookup(cache_key)[1], self.server.video_item('vid2')['etag'])
+            
+            # Along with a cache miss, stale items are fetched
+            # in the same request:
+            list(helper.get_video_info_bulk(['videoTitle'], ['vid1', 'vid2', 'vid3']))
+            self.assertEqual(self.server.num_requests['videos.list'], 5)
+            self.assertEqual(metrics.snapshot()['cache']['revalidated'], 5)
+        finally:
+            helper.close()
+            cache.close()
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,556 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Client-side quota bookkeeping and retry scheduling for
+the YouTube data API. Every request a YoutubeHelper sends
+goes through a QuotaScheduler, which:
+
+    o Knows the quota cost of each API endpoint, and
+      tracks the units used against a daily budget.
+      The budget resets at midnight Pacific time, as
+      does Google's.
+    o Limits the request rate with a token bucket.
+    o Retries transient errors (HTTP 429, 5xx, 403
+      rateLimitExceeded, and broken or timed out connections)
+      with jittered exponential backoff.
+    o When the budget is spent, either raises QuotaExhaustedError,
+      or waits for the daily reset. Work that should run
+      after the reset can be queued with defer().
+
+Schedulers on several hosts that share one API key draw
+their units from a common budget through a QuotaLease.
+'''
+
+import datetime
+import json
+import random
+import socket
+import threading
+import time
+
+try:
+    from zoneinfo import ZoneInfo
+    PACIFIC_TZ = ZoneInfo('America/Los_Angeles')
+except Exception:
+    # No tz database; UTC-8 is close enough for
+    # deciding when the daily budget resets:
+    PACIFIC_TZ = datetime.timezone(datetime.timedelta(hours=-8))
+
+
+class QuotaExhaustedError(ValueError):
+    '''
+    Raised when a request would exceed the daily quota
+    budget, or the API reports that the quota is spent.
+    '''
+    pass
+
+
+class QuotaScheduler(object):
+    '''
+    Decides when API requests may be sent, and whether
+    failed requests are retried. Thread safe; one scheduler
+    may be shared by several helpers that use the same API key.
+    '''
+
+    # Quota units charged by the API for one call. See
+    # https://developers.google.com/youtube/v3/determine_quota_cost
+    # Endpoints not listed cost DEFAULT_COST:
+    ENDPOINT_COSTS = {
+                      'search.list'        : 100,
+                      'videos.list'        : 1,
+                      'channels.list'      : 1,
+                      'playlistItems.list' : 1,
+                      'captions.list'      : 50,
+                      'captions.download'  : 200,
+                      }
+    DEFAULT_COST = 1
+
+    # HTTP status codes that indicate a transient failure:
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    # Transport failures that are worth a retry. PooledHttp
+    # raises these; httplib2 raises subclasses of them:
+    RETRY_EXCEPTIONS = (ConnectionError, TimeoutError, socket.timeout)
+
+    # Reasons given with 403 errors. The first kind
+    # goes away if we slow down, the second only at the
+    # daily reset:
+    RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+    QUOTA_REASONS      = ('quotaExceeded', 'dailyLimitExceeded')
+
+    def __init__(self,
+                 daily_budget=None,
+                 requests_per_sec=None,
+                 burst=None,
+                 max_retries=5,
+                 base_delay=1.0,
+                 max_delay=64.0,
+                 wait_when_exhausted=False,
+                 units_used=0,
+                 quota_lease=None):
+        '''
+        :param daily_budget: quota units available per day; None: do not track a budget
+        :type daily_budget: int
+        :param requests_per_sec: sustained request rate; None: unlimited
+        :type requests_per_sec: float
+        :param burst: number of requests that may be sent back-to-back; default: requests_per_sec
+        :type burst: int
+        :param max_retries: number of times a transient failure is retried
+        :type max_retries: int
+        :param base_delay: seconds before the first retry; doubles with each retry
+        :type base_delay: float
+        :param max_delay: upper limit of the delay between retries
+        :type max_delay: float
+        :param wait_when_exhausted: if True, sleep until the daily reset when the
+            budget is spent; else raise QuotaExhaustedError.
+        :type wait_when_exhausted: bool
+        :param units_used: units already used today, for example by an earlier run
+        :type units_used: int
+        :param quota_lease: budget shared with schedulers elsewhere; each
+            request's cost is also drawn from it
+        :type quota_lease: QuotaLease
+        '''
+        self.daily_budget     = daily_budget
+        self.requests_per_sec = requests_per_sec
+        self.burst            = burst if burst is not None else max(1, int(requests_per_sec or 1))
+        self.max_retries      = max_retries
+        self.base_delay       = base_delay
+        self.max_delay        = max_delay
+        self.wait_when_exhausted = wait_when_exhausted
+        self.quota_lease      = quota_lease
+
+        self.lock = threading.Lock()
+        self.units_used  = units_used
+        self.budget_day  = self._pacific_today()
+        self.exhausted   = False
+        self.tokens      = float(self.burst)
+        self.last_refill = time.monotonic()
+        self.num_retries = 0
+        self.deferred    = []
+
+    #--------------------------------- Public Methods ------------
+
+    #-----------------------
+    # cost
+    #---------
+
+    def cost(self, endpoint):
+        '''
+        Return the quota units the API charges for one call.
+
+        :param endpoint: API method, such as 'videos.list'
+        :type endpoint: str
+        :rtype int
+        '''
+        return QuotaScheduler.ENDPOINT_COSTS.get(endpoint, QuotaScheduler.DEFAULT_COST)
+
+    #-----------------------
+    # units_remaining
+    #---------
+
+    def units_remaining(self):
+        '''
+        Return the quota units left today, or None if no
+        budget is tracked.
+        '''
+        if self.daily_budget is None:
+            return None
+        with self.lock:
+            self._reset_if_new_day()
+            if self.exhausted:
+                return 0
+            return max(0, self.daily_budget - self.units_used)
+
+    #-----------------------
+    # acquire
+    #---------
+
+    def acquire(self, endpoint):
+        '''
+        Block until a request to the given endpoint may be sent,
+        and charge its cost against the daily budget. The local
+        budget and rate are checked before units are taken from
+        a shared QuotaLease, so that a local refusal leaves the
+        shared budget untouched.
+
+        :param endpoint: API method, such as 'videos.list'
+        :type endpoint: str
+        :raise QuotaExhaustedError if the budget is spent, and
+            wait_when_exhausted is False.
+        '''
+        cost = self.cost(endpoint)
+        while True:
+            self._acquire_local(endpoint, cost)
+            if self.quota_lease is None or self.quota_lease.take(cost):
+                return
+            # The shared budget is spent; the request is not sent:
+            with self.lock:
+                self.units_used = max(0, self.units_used - cost)
+            if not self.wait_when_exhausted:
+                raise QuotaExhaustedError("Shared daily quota budget spent; '%s' needs %s units." % (endpoint, cost))
+            time.sleep(self.seconds_until_reset())
+
+    #-----------------------
+    # refund
+    #---------
+
+    def refund(self, endpoint):
+        '''
+        Return the cost of a call to the budget, for calls the
+        API did not charge for, such as 304 (Not Modified) answers.
+
+        :param endpoint: API method, such as 'videos.list'
+        :type endpoint: str
+        '''
+        with self.lock:
+            self.units_used = max(0, self.units_used - self.cost(endpoint))
+        if self.quota_lease is not None:
+            self.quota_lease.give_back(self.cost(endpoint))
+
+    #-----------------------
+    # call
+    #---------
+
+    def call(self, fn, endpoint):
+        '''
+        Call fn() once acquire() allows, retrying transient
+        failures with jittered exponential backoff.
+
+        :param fn: callable that sends one request, such as req.execute
+        :type fn: callable
+        :param endpoint: API method, such as 'videos.list'
+        :type endpoint: str
+        :returns fn's return value
+        :rtype <any>
+        :raise QuotaExhaustedError if the quota is spent
+        :raise the last exception from fn, if it is not transient, or
+            max_retries is exceeded.
+        '''
+        attempt = 0
+        while True:
+            self.acquire(endpoint)
+            try:
+                return fn()
+            except Exception as e:
+                (status, reason) = self.classify_error(e)
+                if reason in QuotaScheduler.QUOTA_REASONS:
+                    with self.lock:
+                        self.exhausted = True
+                    if self.quota_lease is not None:
+                        # Other hosts need not find out the hard way:
+                        self.quota_lease.exhaust()
+                    if not self.wait_when_exhausted:
+                        raise QuotaExhaustedError('API reports quota exceeded: %s' % e)
+                    # acquire() will wait for the reset:
+                    continue
+                transient = status in QuotaScheduler.RETRY_STATUSES or \
+                            reason in QuotaScheduler.RATE_LIMIT_REASONS or \
+                            isinstance(e, QuotaScheduler.RETRY_EXCEPTIONS)
+                if not transient or attempt >= self.max_retries:
+                    raise
+                with self.lock:
+                    self.num_retries += 1
+                time.sleep(self.backoff_delay(attempt))
+                attempt += 1
+
+    #-----------------------
+    # backoff_delay
+    #---------
+
+    def backoff_delay(self, attempt):
+        '''
+        Return the seconds to wait before retry number attempt
+        (counting from 0): a random time up to base_delay * 2**attempt,
+        capped at max_delay ("full jitter"). The randomness keeps
+        many workers that failed together from retrying together.
+
+        :param attempt: number of retries so far
+        :type attempt: int
+        :rtype float
+        '''
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    #-----------------------
+    # seconds_until_reset
+    #---------
+
+    def seconds_until_reset(self):
+        '''
+        Return the seconds until the next midnight, Pacific
+        time, when the API resets daily quotas.
+        '''
+        now = datetime.datetime.now(PACIFIC_TZ)
+        tomorrow = (now + datetime.timedelta(days=1)).date()
+        midnight = datetime.datetime.combine(tomorrow, datetime.time(0), tzinfo=PACIFIC_TZ)
+        return max(1.0, (midnight - now).total_seconds())
+
+    #-----------------------
+    # defer
+    #---------
+
+    def defer(self, fn, *args, **kwargs):
+        '''
+        Queue fn(*args, **kwargs) for run_deferred(). Typically
+        used when a QuotaExhaustedError was caught.
+
+        :param fn: callable to run later
+        :type fn: callable
+        '''
+        with self.lock:
+            self.deferred.append((fn, args, kwargs))
+
+    #-----------------------
+    # run_deferred
+    #---------
+
+    def run_deferred(self):
+        '''
+        Run the work queued with defer(), in the order it was
+        queued. Calls that fail with QuotaExhaustedError again
+        stay queued, as does all work after them.
+
+        :returns results of the calls that ran
+        :rtype [<any>]
+        '''
+        results = []
+        while True:
+            with self.lock:
+                if len(self.deferred) == 0:
+                    return results
+                (fn, args, kwargs) = self.deferred[0]
+            try:
+                results.append(fn(*args, **kwargs))
+            except QuotaExhaustedError:
+                return results
+            with self.lock:
+                self.deferred.pop(0)
+
+    #-----------------------
+    # classify_error
+    #---------
+
+    @staticmethod
+    def classify_error(exc):
+        '''
+        Extract HTTP status and API error reason from an
+        exception raised while executing a request. Works with
+        googleapiclient's HttpError, without requiring it.
+
+        :param exc: exception raised by a request
+        :type exc: Exception
+        :returns status (None if not an HTTP error), and the
+            reason string of the first error detail (or None)
+        :rtype (int, str)
+        '''
+        resp = getattr(exc, 'resp', None)
+        status = getattr(resp, 'status', None)
+        if status is not None:
+            status = int(status)
+        content = getattr(exc, 'content', None)
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', 'replace')
+        reason = None
+        try:
+            reason = json.loads(content)['error']['errors'][0]['reason']
+        except Exception:
+            pass
+        return (status, reason)
+
+    #--------------------------------- Private Utility Methods ------------
+
+    #-----------------------
+    # _acquire_local
+    #---------
+
+    def _acquire_local(self, endpoint, cost):
+        '''
+        Block until this scheduler's rate limit and daily budget
+        allow a request, and charge its cost to the budget.
+
+        :raise QuotaExhaustedError if the budget is spent, and
+            wait_when_exhausted is False.
+        '''
+        while True:
+            with self.lock:
+                self._reset_if_new_day()
+                over_budget = self.exhausted or \
+                              (self.daily_budget is not None and self.units_used + cost > self.daily_budget)
+                if not over_budget:
+                    delay = self._take_token()
+                    if delay == 0:
+                        self.units_used += cost
+                        return
+            if over_budget:
+                if not self.wait_when_exhausted:
+                    raise QuotaExhaustedError("Daily quota budget spent; '%s' needs %s units." % (endpoint, cost))
+                delay = self.seconds_until_reset()
+            time.sleep(delay)
+
+    #-----------------------
+    # _take_token
+    #---------
+
+    def _take_token(self):
+        '''
+        Token bucket: refill according to the time elapsed, and
+        take one token if available. Caller must hold self.lock.
+
+        :returns 0 if a token was taken, else seconds until one is available
+        :rtype float
+        '''
+        if self.requests_per_sec is None:
+            return 0
+        now = time.monotonic()
+        self.tokens = min(float(self.burst),
+                          self.tokens + (now - self.last_refill) * self.requests_per_sec)
+        self.last_refill = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.requests_per_sec
+
+    #-----------------------
+    # _reset_if_new_day
+    #---------
+
+    def _reset_if_new_day(self):
+        '''
+        Reset the units used at midnight Pacific time.
+        Caller must hold self.lock.
+        '''
+        today = self._pacific_today()
+        if today != self.budget_day:
+            self.budget_day = today
+            self.units_used = 0
+            self.exhausted  = False
+
+    #-----------------------
+    # _pacific_today
+    #---------
+
+    def _pacific_today(self):
+        return datetime.datetime.now(PACIFIC_TZ).date()
+
+
+class QuotaLease(object):
+    '''
+    A host's share of a daily quota budget that several hosts
+    draw from, kept by a broker such as the SqliteBroker or
+    RedisBroker of the work_queue module. Units are leased from
+    the broker in blocks, so that most requests are charged
+    locally, without a round trip to the broker. Units leased
+    but not used are returned by release().
+
+    The broker must provide:
+
+        lease_quota(day, units, daily_budget): grant up to units of
+            the day's budget; returns the number granted
+        return_quota(day, units): give back unused units
+        exhaust_quota(day, daily_budget): mark the day's budget spent
+    '''
+
+    # Units leased from the broker at a time:
+    DEFAULT_LEASE_UNITS = 100
+
+    def __init__(self, broker, daily_budget, lease_units=None):
+        '''
+        :param broker: keeper of the shared budget
+        :type broker: { SqliteBroker | RedisBroker }
+        :param daily_budget: units all hosts together may use per day
+        :type daily_budget: int
+        :param lease_units: units leased at a time; more means fewer
+            round trips, but more units idle on each host
+        :type lease_units: int
+        '''
+        self.broker       = broker
+        self.daily_budget = daily_budget
+        self.lease_units  = lease_units if lease_units is not None else QuotaLease.DEFAULT_LEASE_UNITS
+        self.lock  = threading.Lock()
+        self.day   = None
+        self.units = 0
+
+    #-----------------------
+    # take
+    #---------
+
+    def take(self, cost):
+        '''
+        Charge cost units, leasing more from the broker if needed.
+
+        :param cost: units to charge
+        :type cost: int
+        :returns False if the shared budget cannot cover the cost
+        :rtype bool
+        '''
+        with self.lock:
+            self._reset_if_new_day()
+            if self.units < cost:
+                self.units += self.broker.lease_quota(self.day,
+                                                      max(self.lease_units, cost - self.units),
+                                                      self.daily_budget)
+                if self.units < cost:
+                    return False
+            self.units -= cost
+            return True
+
+    #-----------------------
+    # give_back
+    #---------
+
+    def give_back(self, cost):
+        '''
+        Return the units of a request the API did not charge for.
+        '''
+        with self.lock:
+            self.units += cost
+
+    #-----------------------
+    # exhaust
+    #---------
+
+    def exhaust(self):
+        '''
+        Record that the API reports the quota spent, for all hosts.
+        '''
+        with self.lock:
+            self._reset_if_new_day()
+            self.units = 0
+            self.broker.exhaust_quota(self.day, self.daily_budget)
+
+    #-----------------------
+    # release
+    #---------
+
+    def release(self):
+        '''
+        Return the leased units not yet used to the broker.
+        '''
+        with self.lock:
+            if self.units > 0 and self.day == quota_day():
+                self.broker.return_quota(self.day, self.units)
+            self.units = 0
+
+    #--------------------------------- Private Utility Methods ------------
+
+    def _reset_if_new_day(self):
+        '''
+        Units leased on an earlier day are void. Caller
+        must hold self.lock.
+        '''
+        today = quota_day()
+        if today != self.day:
+            self.day = today
+            self.units = 0
+
+#-----------------------
+# quota_day
+#---------
+
+def quota_day():
+    '''
+    Return the current quota day, that is, the date in
+    Pacific time, as YYYY-MM-DD.
+    '''
+    return datetime.datetime.now(PACIFIC_TZ).date().isoformat()
@@ -0,0 +1,116 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import json
+import time
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils.quota import QuotaScheduler, QuotaExhaustedError
+
+DO_ALL = True
+
+class FakeResponse(object):
+    def __init__(self, status):
+        self.status = status
+
+class FakeHttpError(Exception):
+    '''
+    Mimics googleapiclient's HttpError, which carries
+    the response and the JSON error body.
+    '''
+    def __init__(self, status, reason=None):
+        self.resp = FakeResponse(status)
+        self.content = json.dumps({'error' : {'errors' : [{'reason' : reason}],
+                                              'message' : reason}}).encode('utf-8')
+
+class FakeLease(object):
+    '''
+    Stands in for a QuotaLease, with units
+    available on this host only.
+    '''
+    def __init__(self, units):
+        self.units = units
+
+    def take(self, cost):
+        if self.units < cost:
+            return False
+        self.units -= cost
+        return True
+
+    def give_back(self, cost):
+        self.units += cost
+
+class QuotaSchedulerTest(unittest.TestCase):
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_budget(self):
+        scheduler = QuotaScheduler(daily_budget=250)
+        scheduler.acquire('captions.download')
+        self.assertEqual(50, scheduler.units_remaining())
+        self.assertRaises(QuotaExhaustedError, scheduler.acquire, 'search.list')
+        scheduler.refund('captions.download')
+        scheduler.acquire('search.list')
+        self.assertEqual(150, scheduler.units_remaining())
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_local_budget_before_lease(self):
+        lease = FakeLease(1000)
+        scheduler = QuotaScheduler(daily_budget=150, quota_lease=lease)
+        scheduler.acquire('search.list')
+        # Refused locally, without taking shared units:
+        self.assertRaises(QuotaExhaustedError, scheduler.acquire, 'search.list')
+        self.assertEqual(900, lease.units)
+        # Refused by the lease, without charging locally:
+        lease.units = 0
+        self.assertRaises(QuotaExhaustedError, scheduler.acquire, 'videos.list')
+        self.assertEqual(50, scheduler.units_remaining())
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_rate_limit(self):
+        scheduler = QuotaScheduler(requests_per_sec=50, burst=1)
+        start = time.monotonic()
+        for _i in range(6):
+            scheduler.acquire('videos.list')
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_retry_transient(self):
+        scheduler = QuotaScheduler(daily_budget=100, base_delay=0.001, max_retries=3)
+        failures = [FakeHttpError(503), FakeHttpError(403, 'rateLimitExceeded')]
+        def flaky():
+            if len(failures) > 0:
+                raise failures.pop(0)
+            return 'done'
+        self.assertEqual('done', scheduler.call(flaky, 'videos.list'))
+        self.assertEqual(2, scheduler.num_retries)
+        # Each attempt is charged:
+        self.assertEqual(97, scheduler.units_remaining())
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_no_retry_on_permanent_error(self):
+        scheduler = QuotaScheduler(base_delay=0.001)
+        def not_found():
+            raise FakeHttpError(404, 'videoNotFound')
+        self.assertRaises(FakeHttpError, scheduler.call, not_found, 'videos.list')
+        self.assertEqual(0, scheduler.num_retries)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_quota_exceeded_and_defer(self):
+        scheduler = QuotaScheduler(daily_budget=1000)
+        def over_quota():
+            raise FakeHttpError(403, 'quotaExceeded')
+        self.assertRaises(QuotaExhaustedError, scheduler.call, over_quota, 'videos.list')
+        self.assertEqual(0, scheduler.units_remaining())
+        
+        scheduler.defer(scheduler.call, lambda: 'later', 'videos.list')
+        self.assertListEqual([], scheduler.run_deferred())
+        # Simulate the daily reset:
+        scheduler.budget_day = None
+        self.assertListEqual(['later'], scheduler.run_deferred())
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,313 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Incremental handling of API responses, so that memory use does
+not grow with the size of a response:
+
+    o stream_url() sends a GET request, and returns the response
+      body as a generator of byte chunks, decompressed if the
+      server sent it gzipped. PooledHttp.stream_request() does
+      the same over pooled connections.
+    o iter_json_items() turns the chunks of a JSON response into
+      the elements of its items array, one at a time, without
+      ever holding the whole document. It uses ijson if that
+      is installed, and a built-in scanner otherwise.
+    o DescriptionFiles is a sink for video descriptions, for use
+      with YoutubeHelper.iter_video_info_stream(), which writes
+      each description to its own file rather than keeping it
+      in the result.
+'''
+from collections import namedtuple
+import codecs
+import json
+import os
+import re
+import urllib.error
+import urllib.request
+import zlib
+
+# Bytes read from a response at a time:
+CHUNK_SIZE = 64 * 1024
+
+# Seconds to wait for a connection, and for response data:
+DEFAULT_TIMEOUT = 60
+
+# Status, headers with lower case names, and generator
+# of the body's byte chunks:
+StreamedResponse = namedtuple('StreamedResponse', ['status', 'headers', 'chunks'])
+
+#-----------------------
+# stream_url
+#---------
+
+def stream_url(uri, headers=None, timeout=None):
+    '''
+    Send a GET request with the standard library, and return
+    the response without reading its body. The body is
+    gunzipped as it is read. Responses with error statuses are
+    returned like others.
+
+    :param uri: the URL
+    :type uri: str
+    :param headers: request headers
+    :type headers: { str : str }
+    :param timeout: seconds to wait for the connection and for data
+    :type timeout: float
+    :rtype StreamedResponse
+    :raise ConnectionError if no connection could be made
+    :raise TimeoutError if the connection timed out
+    '''
+    request = urllib.request.Request(uri, headers=headers or {})
+    try:
+        resp = urllib.request.urlopen(request, timeout=timeout if timeout is not None else DEFAULT_TIMEOUT)
+        status = resp.status
+    except urllib.error.HTTPError as e:
+        (resp, status) = (e, e.code)
+    except urllib.error.URLError as e:
+        if isinstance(e.reason, TimeoutError):
+            raise TimeoutError(str(e.reason))
+        raise ConnectionError(str(e.reason))
+    response_headers = {key.lower() : value for (key, value) in resp.headers.items()}
+    gzipped = response_headers.get('content-encoding') == 'gzip'
+    return StreamedResponse(status, response_headers, _read_chunks(resp, gzipped))
+
+#-----------------------
+# iter_json_items
+#---------
+
+def iter_json_items(chunks, array_name='items'):
+    '''
+    Generator of the elements of an array at the top level of
+    a JSON object, such as the items of an API response, parsed
+    from byte chunks as they arrive. Only one element at a time
+    is held in memory. Other top level values are skipped.
+
+    :param chunks: the document's bytes, in pieces of any size
+    :type chunks: iterable of bytes
+    :param array_name: key of the array
+    :type array_name: str
+    :returns generator of the array's elements
+    :rtype { <any> }
+    :raise ValueError if the document is not valid JSON
+    '''
+    ijson = _ijson()
+    if ijson is not None:
+        return ijson.items(_ChunkReader(chunks), array_name + '.item', use_float=True)
+    return _scan_items(chunks, array_name)
+
+
+class DescriptionFiles(object):
+    '''
+    Description sink that writes each description to
+    <directory>/<videoId>.txt.
+
+    Usage:
+        sink = DescriptionFiles('/data/descriptions')
+        for info in helper.iter_video_info_stream(['videoTitle', 'description'],
+                                                  video_ids,
+                                                  description_sink=sink):
+            ...
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __call__(self, video_id, description):
+        with open(self.path(video_id), 'w', encoding='utf-8') as fd:
+            fd.write(description)
+
+    def path(self, video_id):
+        return os.path.join(self.directory, video_id + '.txt')
+
+#--------------------------------- Private Utility Methods ------------
+
+#-----------------------
+# _read_chunks
+#---------
+
+def _read_chunks(resp, gzipped):
+    '''
+    Generator of the body of a urllib response. Closes the
+    response when the body is consumed, or the generator closed.
+    '''
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    try:
+        while True:
+            try:
+                chunk = resp.read(CHUNK_SIZE)
+            except OSError as e:
+                raise ConnectionError(str(e))
+            if not chunk:
+                break
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk)
+            if chunk:
+                yield chunk
+        if decompressor is not None:
+            rest = decompressor.flush()
+            if rest:
+                yield rest
+    finally:
+        resp.close()
+
+#-----------------------
+# _ijson
+#---------
+
+_ijson_module = None
+
+def _ijson():
+    '''
+    Return the ijson module, or None if it is not
+    installed. Imported on first use.
+    '''
+    global _ijson_module
+    if _ijson_module is None:
+        try:
+            import ijson
+            _ijson_module = ijson
+        except ImportError:
+            _ijson_module = False
+    return _ijson_module or None
+
+#-----------------------
+# _scan_items
+#---------
+
+def _scan_items(chunks, array_name):
+    '''
+    The built-in counterpart of ijson.items(). Scans the
+    top level object; each array element, and each skipped
+    value, is decoded with json's own decoder once enough of
+    it has arrived.
+    '''
+    scanner = _JsonScanner(chunks)
+    scanner.expect('{')
+    if scanner.peek() == '}':
+        return
+    while True:
+        key = scanner.value()
+        scanner.expect(':')
+        if key == array_name and scanner.peek() == '[':
+            scanner.expect('[')
+            if scanner.peek() == ']':
+                scanner.expect(']')
+            else:
+                while True:
+                    yield scanner.value()
+                    if scanner.expect(',]') == ']':
+                        break
+        else:
+            scanner.value()
+        if scanner.expect(',}') == '}':
+            return
+
+
+class _JsonScanner(object):
+    '''
+    Text buffer over a stream of UTF-8 chunks, from which
+    whole JSON values are taken. Text before the current
+    position is dropped whenever more text is read.
+    '''
+
+    NON_SPACE = re.compile(r'\S')
+
+    def __init__(self, chunks):
+        self.chunks       = iter(chunks)
+        self.utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def peek(self):
+        '''
+        Return the next character that is not white space,
+        without consuming it.
+        '''
+        while True:
+            match = _JsonScanner.NON_SPACE.search(self.buf, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self._read_more():
+                raise ValueError('JSON document ends prematurely')
+
+    def expect(self, chars):
+        '''
+        Consume the next character that is not white space,
+        which must be one of chars, and return it.
+        '''
+        char = self.peek()
+        if char not in chars:
+            raise ValueError("Expected one of '%s' in JSON document, found '%s'" % (chars, char))
+        self.pos += 1
+        return char
+
+    def value(self):
+        '''
+        Consume the next JSON value, reading as many chunks
+        as it takes, and return it decoded.
+        '''
+        self.peek()
+        while True:
+            try:
+                (value, end) = self.json_decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._read_more():
+                    raise ValueError('Invalid JSON document')
+                continue
+            # A number at the end of the buffer may continue
+            # in the next chunk:
+            if end == len(self.buf) and not self.eof and isinstance(value, (int, float)):
+                self._read_more()
+                continue
+            self.pos = end
+            return value
+
+    def _read_more(self):
+        '''
+        Append the next chunk's text to the buffer.
+
+        :returns False if there is no more text
+        :rtype bool
+        '''
+        if self.eof:
+            return False
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        for chunk in self.chunks:
+            text = self.utf8_decoder.decode(chunk)
+            if text:
+                self.buf += text
+                return True
+        self.buf += self.utf8_decoder.decode(b'', final=True)
+        self.eof = True
+        return True
+
+
+class _ChunkReader(object):
+    '''
+    File-like read() over a stream of byte chunks, for ijson.
+    '''
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.pending) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.pending += chunk
+        if size < 0 or size >= len(self.pending):
+            (data, self.pending) = (self.pending, b'')
+        else:
+            (data, self.pending) = (self.pending[:size], self.pending[size:])
+        return data
@@ -0,0 +1,110 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils.metrics import Metrics
+from youtube_utils.mock_api import MockYoutubeServer
+from youtube_utils.quota import QuotaScheduler
+from youtube_utils.streaming import DescriptionFiles, _scan_items, iter_json_items, stream_url
+from youtube_utils.transport import PooledHttp
+from youtube_utils.youtube_utils import YoutubeHelper
+
+DO_ALL = True
+
+class StreamingTest(unittest.TestCase):
+
+    DOC = {'kind'  : 'youtube#videoListResponse',
+           'etag'  : 'abc',
+           'items' : [{'id' : 'vid1', 'snippet' : {'title' : 'Café ☃ "quoted" \\ back\nslash'}},
+                      {'id' : 'vid2', 'statistics' : {'viewCount' : '12345'}, 'rank' : 1234567, 'score' : -1.5e3},
+                      {'id' : 'vid3', 'tags' : [], 'flags' : [True, False, None]}],
+           'pageInfo' : {'totalResults' : 3}}
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_scan_items(self):
+        body = json.dumps(self.DOC, ensure_ascii=False, indent=1).encode('utf-8')
+        # Chunk boundaries anywhere, including inside
+        # multi-byte characters and numbers:
+        for chunk_size in (1, 2, 3, 7, 64, len(body)):
+            chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+            self.assertEqual(list(_scan_items(chunks, 'items')), self.DOC['items'])
+        self.assertEqual(list(iter_json_items([body])), self.DOC['items'])
+
+        self.assertEqual(list(_scan_items([b'{}'], 'items')), [])
+        self.assertEqual(list(_scan_items([b'{"items" : [ ]}'], 'items')), [])
+        self.assertEqual(list(_scan_items([b'{"etag" : "x"}'], 'items')), [])
+        with self.assertRaises(ValueError):
+            list(_scan_items([b'{"items" : [{"id" : "vid1"}, {"id" : '], 'items'))
+        with self.assertRaises(ValueError):
+            list(_scan_items([b'["vid1"]'], 'items'))
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_stream_url(self):
+        with MockYoutubeServer() as server:
+            uri = server.api_endpoint + '/youtube/v3/videos?part=id&id=vid1,vid2'
+            response = stream_url(uri, headers={'accept-encoding' : 'gzip'})
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.headers['content-encoding'], 'gzip')
+            self.assertEqual([item['id'] for item in iter_json_items(response.chunks)], ['vid1', 'vid2'])
+            response = stream_url(server.api_endpoint + '/youtube/v3/nothing')
+            self.assertEqual(response.status, 404)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_iter_video_info_stream(self):
+        video_ids = ['vid%03d' % i for i in range(120)] + ['missing1']
+        with MockYoutubeServer(error_rate=0.3, seed=4) as server:
+            for http in (None, PooledHttp()):
+                metrics = Metrics()
+                with YoutubeHelper(referer='test',
+                                   api_key='test',
+                                   api_endpoint=server.api_endpoint,
+                                   http=http,
+                                   scheduler=QuotaScheduler(base_delay=0.01, max_delay=0.02),
+                                   metrics=metrics) as helper:
+                    missing = []
+                    streamed = list(helper.iter_video_info_stream(['videoTitle', 'duration', 'viewCount'],
+                                                                  iter(video_ids),
+                                                                  missing_ids=missing))
+                    bulk = list(helper.get_video_info_bulk(['videoTitle', 'duration', 'viewCount'], video_ids))
+                self.assertEqual(streamed, bulk)
+                self.assertEqual(len(streamed), 120)
+                self.assertIsInstance(streamed[0]['viewCount'], int)
+                self.assertEqual(missing, ['missing1'])
+                self.assertGreater(metrics.snapshot()['endpoints']['videos.list']['bytes'], 0)
+                if http is not None:
+                    http.close()
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_description_sink(self):
+        sink = DescriptionFiles(os.path.join(self.tmpdir, 'descriptions'))
+        with MockYoutubeServer() as server:
+            with YoutubeHelper(referer='test',
+                               api_key='test',
+                               api_endpoint=server.api_endpoint) as helper:
+                infos = list(helper.iter_video_info_stream(['videoTitle', 'description'],
+                                                           ['vid1', 'vid2'],
+                                                           description_sink=sink))
+                expected = list(helper.get_video_info_bulk(['description'], ['vid1', 'vid2']))
+        self.assertEqual(infos, [{'videoId' : 'vid1', 'videoTitle' : 'Lecture vid1'},
+                                 {'videoId' : 'vid2', 'videoTitle' : 'Lecture vid2'}])
+        for info in expected:
+            with open(sink.path(info['videoId']), 'r', encoding='utf-8') as fd:
+                self.assertEqual(fd.read(), info['description'])
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,901 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Local full-text index over caption cues and video descriptions,
+so that searching what was said in a collection of videos costs
+no quota. Phrase queries return (videoId, ms) hits, ms being the
+start time of the cue in which the phrase begins (None for hits
+in descriptions):
+
+    index = CaptionIndex('/var/lib/mooc/text_index')
+    index.add_caption_file('Hlfeeqf5tdc', 'Hlfeeqf5tdc_en.srt')
+    index.add_description('Hlfeeqf5tdc', 'Means, medians, and modes.')
+    index.flush()
+    index.search('standard deviation')
+    -> [('Hlfeeqf5tdc', 61250), ('Hlfeeqf5tdc', 312400)]
+
+The index is a list of immutable segment files, each memory-mapped.
+Added documents collect in memory, where they are searchable at
+once, and are written as a new segment by flush(), or when
+flush_docs documents have accumulated. Segments are grouped in
+tiers by size: tier 0 holds segments of up to flush_docs documents,
+and each tier segments of up to merge_factor times the documents
+of the tier below. Once a tier holds merge_factor segments, a
+background thread merges them into one segment of the next tier,
+so that each document is rewritten about log(num_docs / flush_docs)
+times, rather than on every merge. Merges stream the postings of
+the merged segments, term by term, into the new segment file.
+Adding a video's captions or description again replaces the
+earlier version.
+
+A segment file holds, after its header:
+
+    doc offsets       (num_docs + 1) uint64
+    term offsets      (num_terms + 1) uint64
+    postings offsets  (num_terms + 1) uint64
+    docs              per doc: video id, field, and its cue table:
+                      the token position at which each cue starts,
+                      and the cue's start time, as two uint32 columns
+    terms             sorted UTF-8 terms
+    postings          per term: the docs that contain it, and the
+                      token positions in each doc
+
+Postings are varints, doc ids and positions delta encoded. Cue
+tables are fixed-width, so that a hit's time is found by binary
+search, without decoding the table.
+'''
+from array import array
+import bisect
+from collections import OrderedDict
+import heapq
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+
+from .captions import caption_format_of, parse_captions
+
+# What counts as a word. Apostrophes within words are
+# kept, so that "don't" does not match "don t":
+TOKEN_PATTERN = re.compile(r"\w+(?:'\w+)*")
+
+# Document fields, and their codes in segment files:
+FIELD_CAPTIONS    = 'captions'
+FIELD_DESCRIPTION = 'description'
+FIELD_CODES = {FIELD_CAPTIONS : 0, FIELD_DESCRIPTION : 1}
+FIELD_NAMES = {code : field for (field, code) in FIELD_CODES.items()}
+
+#-----------------------
+# tokenize
+#---------
+
+def tokenize(text):
+    '''
+    Split text into lower case words.
+
+    :param text: text to split
+    :type text: str
+    :returns the words, in order
+    :rtype [str]
+    '''
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+class CaptionIndex(object):
+    '''
+    Inverted index over caption cues and descriptions, kept
+    in a directory. Thread safe.
+    '''
+
+    MANIFEST_NAME = 'manifest.json'
+
+    # Documents buffered in memory before a segment is written:
+    DEFAULT_FLUSH_DOCS = 1000
+
+    # Number of segments in a tier that triggers their merge:
+    DEFAULT_MERGE_FACTOR = 8
+
+    def __init__(self, index_dir, flush_docs=None, merge_factor=None, background_merge=True):
+        '''
+        :param index_dir: directory of the index; created if needed
+        :type index_dir: str
+        :param flush_docs: documents buffered in memory before they are
+            written as a segment
+        :type flush_docs: int
+        :param merge_factor: number of segments of similar size at
+            which they are merged; at least 2
+        :type merge_factor: int
+        :param background_merge: if False, merges only happen when
+            merge() is called
+        :type background_merge: bool
+        '''
+        self.index_dir    = index_dir
+        self.flush_docs   = flush_docs if flush_docs is not None else CaptionIndex.DEFAULT_FLUSH_DOCS
+        self.merge_factor = merge_factor if merge_factor is not None else CaptionIndex.DEFAULT_MERGE_FACTOR
+        if self.merge_factor < 2:
+            raise ValueError('merge_factor must be at least 2, not %s' % self.merge_factor)
+        self.background_merge = background_merge
+        if not os.path.isdir(index_dir):
+            os.makedirs(index_dir)
+
+        # Queries hold the lock for their whole run; they take
+        # microseconds, and no segment can be closed under them:
+        self.lock = threading.RLock()
+        # Held while segments are merged:
+        self.merge_lock = threading.Lock()
+        # Set while a background merge runs; cleared
+        # under self.lock once no tier is left to merge:
+        self.merge_thread = None
+        self.merge_error  = None
+
+        try:
+            with open(os.path.join(index_dir, CaptionIndex.MANIFEST_NAME), 'r') as fd:
+                manifest = json.load(fd)
+        except (IOError, ValueError):
+            manifest = {'segments' : [], 'next_segment' : 0, 'deleted' : {}}
+        self.next_segment = manifest['next_segment']
+        self.segments = []
+        for name in manifest['segments']:
+            segment = _Segment(os.path.join(index_dir, name))
+            segment.deleted.update(manifest['deleted'].get(name, []))
+            self.segments.append(segment)
+        self.buffer = _MemorySegment()
+
+        # Where the current version of each document lives:
+        # (video_id, field) -> (segment, doc_id):
+        self.doc_locations = {}
+        for segment in self.segments:
+            for doc_id in range(segment.num_docs):
+                if doc_id not in segment.deleted:
+                    (video_id, field) = segment.doc_key(doc_id)
+                    self.doc_locations[(video_id, field)] = (segment, doc_id)
+
+    #--------------------------------- Public Methods ------------
+
+    #-----------------------
+    # add_captions
+    #---------
+
+    def add_captions(self, video_id, cues):
+        '''
+        Index the captions of a video, replacing any indexed earlier.
+
+        :param video_id: YouTube video id
+        :type video_id: str
+        :param cues: the video's cues, in time order
+        :type cues: iterable of Cue
+        '''
+        tokens = []
+        cue_table = []
+        for cue in cues:
+            cue_tokens = tokenize(cue.text)
+            if len(cue_tokens) > 0:
+                cue_table.append((len(tokens), cue.start_ms))
+                tokens.extend(cue_tokens)
+        self._add(video_id, FIELD_CAPTIONS, tokens, cue_table)
+
+    #-----------------------
+    # add_caption_file
+    #---------
+
+    def add_caption_file(self, video_id, caption_path, caption_format=None):
+        '''
+        Index a caption file, such as one written by
+        YoutubeHelper.get_caption_files().
+
+        :param video_id: YouTube video id
+        :type video_id: str
+        :param caption_path: the caption file
+        :type caption_path: str
+        :param caption_format: format of the file; default: from the
+            file's extension, or from its content
+        :type caption_format: { str | CaptionFormat }
+        '''
+        if caption_format is None:
+            caption_format = caption_format_of(caption_path)
+        with open(caption_path, 'r', encoding='utf-8-sig') as fd:
+            self.add_captions(video_id, parse_captions(fd, caption_format))
+
+    #-----------------------
+    # add_description
+    #---------
+
+    def add_description(self, video_id, description):
+        '''
+        Index the description of a video, replacing any indexed earlier.
+
+        :param video_id: YouTube video id
+        :type video_id: str
+        :param description: the description, as returned for
+            the 'description' video info
+        :type description: str
+        '''
+        self._add(video_id, FIELD_DESCRIPTION, tokenize(description), [])
+
+    #-----------------------
+    # search
+    #---------
+
+    def search(self, phrase, field=None, limit=None):
+        '''
+        Find the places where all words of a phrase occur in
+        sequence. Case and punctuation are ignored.
+
+        :param phrase: one or more words
+        :type phrase: str
+        :param field: 'captions' or 'description'; default: both
+        :type field: str
+        :param limit: maximum number of hits
+        :type limit: int
+        :returns (videoId, ms) for each hit, ms being the start time
+            of the cue in which the phrase begins, or None for hits
+            in descriptions. Sorted by video id and time.
+        :rtype [(str, int)]
+        '''
+        terms = tokenize(phrase)
+        if len(terms) == 0:
+            return []
+        field_code = FIELD_CODES[field] if field is not None else None
+        hits = []
+        with self.lock:
+            for segment in self.segments + [self.buffer]:
+                hits.extend(self._search_segment(segment, terms, field_code))
+        hits.sort(key=lambda hit: (hit[0], -1 if hit[1] is None else hit[1]))
+        return hits if limit is None else hits[:limit]
+
+    #-----------------------
+    # flush
+    #---------
+
+    def flush(self):
+        '''
+        Write the documents buffered in memory as a new segment.
+        Adds and replacements are durable once flush() returns.
+        '''
+        with self.lock:
+            self._raise_merge_error()
+            buffer = self.buffer
+            if buffer.num_docs == len(buffer.deleted):
+                if len(buffer.deleted) > 0 or buffer.dirty:
+                    self.buffer = _MemorySegment()
+                    self._save_manifest()
+                return
+            path = self._new_segment_path()
+            doc_ids = [doc_id for doc_id in range(buffer.num_docs) if doc_id not in buffer.deleted]
+            _write_segment(path,
+                           [buffer.doc(doc_id) for doc_id in doc_ids],
+                           _merged_postings([(buffer, dict(zip(doc_ids, range(len(doc_ids)))))]))
+            segment = _Segment(path)
+            for (new_id, doc_id) in enumerate(doc_ids):
+                (video_id, field) = buffer.doc_key(doc_id)
+                self.doc_locations[(video_id, field)] = (segment, new_id)
+            self.segments.append(segment)
+            self.buffer = _MemorySegment()
+            self._save_manifest()
+            if self.background_merge and self.merge_thread is None and \
+               self._tier_to_merge() is not None:
+                self.merge_thread = threading.Thread(target=self._merge_in_background, daemon=True)
+                self.merge_thread.start()
+
+    #-----------------------
+    # merge
+    #---------
+
+    def merge(self):
+        '''
+        Flush, then merge all segments into one, dropping replaced
+        documents. Waits for a running background merge first.
+        '''
+        self.flush()
+        self.wait_for_merge()
+        self._merge()
+
+    #-----------------------
+    # wait_for_merge
+    #---------
+
+    def wait_for_merge(self):
+        '''
+        Block until a running background merge is done.
+        '''
+        thread = self.merge_thread
+        if thread is not None:
+            thread.join()
+        with self.lock:
+            self._raise_merge_error()
+
+    #-----------------------
+    # num_docs
+    #---------
+
+    def num_docs(self):
+        '''
+        Return the number of indexed documents: one per video
+        with captions, plus one per video with a description.
+        '''
+        with self.lock:
+            return len(self.doc_locations)
+
+    #-----------------------
+    # close
+    #---------
+
+    def close(self):
+        '''
+        Flush, wait for merging to finish, and unmap all segments.
+        '''
+        self.flush()
+        self.wait_for_merge()
+        with self.lock:
+            for segment in self.segments:
+                segment.close()
+            self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    #--------------------------------- Private Utility Methods ------------
+
+    #-----------------------
+    # _add
+    #---------
+
+    def _add(self, video_id, field, tokens, cue_table):
+        with self.lock:
+            previous = self.doc_locations.get((video_id, field))
+            if previous is not None:
+                (segment, doc_id) = previous
+                segment.deleted.add(doc_id)
+                if segment is not self.buffer:
+                    # Persisted with the next manifest:
+                    self.buffer.dirty = True
+            doc_id = self.buffer.add(video_id, FIELD_CODES[field], tokens, cue_table)
+            self.doc_locations[(video_id, field)] = (self.buffer, doc_id)
+            if self.buffer.num_docs >= self.flush_docs:
+                self.flush()
+
+    #-----------------------
+    # _search_segment
+    #---------
+
+    def _search_segment(self, segment, terms, field_code):
+        '''
+        Return the (videoId, ms) hits of a phrase in one segment.
+        '''
+        # Look up the rarest term first; the others
+        # are only decoded for docs that contain it:
+        postings = []
+        for term in set(terms):
+            term_postings = segment.postings(term)
+            if term_postings is None:
+                return []
+            postings.append((len(term_postings), term, term_postings))
+        postings.sort(key=lambda entry: entry[0])
+        candidates = postings[0][2]
+        positions_by_term = {postings[0][1] : candidates}
+        for (_size, term, term_postings) in postings[1:]:
+            candidates = {doc_id : positions for (doc_id, positions) in candidates.items()
+                          if doc_id in term_postings}
+            positions_by_term[term] = term_postings
+            if len(candidates) == 0:
+                return []
+
+        hits = []
+        for doc_id in sorted(candidates):
+            if doc_id in segment.deleted:
+                continue
+            # Phrase starts whose following positions hold
+            # the phrase's following terms:
+            starts = set(positions_by_term[terms[0]][doc_id])
+            for (offset, term) in enumerate(terms[1:], 1):
+                term_positions = positions_by_term[term][doc_id]
+                starts = set(start for start in starts if start + offset in term_positions)
+                if len(starts) == 0:
+                    break
+            if len(starts) == 0:
+                continue
+            (video_id, doc_field) = segment.doc_info(doc_id)
+            if field_code is not None and doc_field != field_code:
+                continue
+            for start in sorted(starts):
+                hits.append((video_id, segment.cue_time(doc_id, start)))
+        return hits
+
+    #-----------------------
+    # _merge_in_background
+    #---------
+
+    def _merge_in_background(self):
+        '''
+        Merge tiers until none is full. Segments flushed
+        meanwhile are seen by the check under the lock.
+        '''
+        try:
+            while True:
+                with self.lock:
+                    if self._tier_to_merge() is None:
+                        self.merge_thread = None
+                        return
+                self._merge(tiered=True)
+        except Exception as e:
+            # Reported by the next flush() or wait_for_merge():
+            with self.lock:
+                self.merge_error = e
+                self.merge_thread = None
+
+    #-----------------------
+    # _tier_to_merge
+    #---------
+
+    def _tier_to_merge(self):
+        '''
+        Return merge_factor segments of the smallest tier that
+        holds that many, or None if no tier does. A segment's
+        tier depends on its documents that were not replaced.
+        Caller must hold self.lock.
+
+        :rtype { [_Segment] | None }
+        '''
+        tiers = {}
+        for segment in self.segments:
+            num_live = segment.num_docs - len(segment.deleted)
+            (tier, tier_limit) = (0, self.flush_docs)
+            while num_live > tier_limit:
+                tier += 1
+                tier_limit *= self.merge_factor
+            tiers.setdefault(tier, []).append(segment)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][:self.merge_factor]
+        return None
+
+    #-----------------------
+    # _merge
+    #---------
+
+    def _merge(self, tiered=False):
+        '''
+        Merge segments into one: all current segments, or with
+        tiered True, those returned by _tier_to_merge(). Segments
+        are only read while merging; documents added or replaced
+        meanwhile are reconciled when the merged segment is put
+        in place.
+        '''
+        with self.merge_lock:
+            with self.lock:
+                if tiered:
+                    segments = self._tier_to_merge()
+                    if segments is None:
+                        return
+                else:
+                    segments = list(self.segments)
+                    if len(segments) == 0 or \
+                       (len(segments) == 1 and len(segments[0].deleted) == 0):
+                        return
+                deleted_at_start = {segment : set(segment.deleted) for segment in segments}
+                path = self._new_segment_path()
+            self._merge_segments(segments, deleted_at_start, path)
+
+    #-----------------------
+    # _merge_segments
+    #---------
+
+    def _merge_segments(self, segments, deleted_at_start, path):
+        '''
+        Write the merged segment, and put it in place of
+        the segments it was merged from.
+        '''
+        # Old (segment, doc_id) to doc id in the merged segment:
+        doc_maps = []
+        num_docs = 0
+        for segment in segments:
+            doc_map = {}
+            for doc_id in range(segment.num_docs):
+                if doc_id not in deleted_at_start[segment]:
+                    doc_map[doc_id] = num_docs
+                    num_docs += 1
+            doc_maps.append((segment, doc_map))
+        # Docs and postings are read from the segments
+        # as the merged segment is written:
+        docs = (segment.doc(doc_id) for (segment, doc_map) in doc_maps for doc_id in doc_map)
+        _write_segment(path, docs, _merged_postings(doc_maps))
+        merged = _Segment(path)
+
+        with self.lock:
+            for (segment, doc_map) in doc_maps:
+                for doc_id in segment.deleted - deleted_at_start[segment]:
+                    merged.deleted.add(doc_map[doc_id])
+            doc_maps = dict(doc_maps)
+            for (key, (segment, doc_id)) in list(self.doc_locations.items()):
+                if segment in doc_maps:
+                    self.doc_locations[key] = (merged, doc_maps[segment][doc_id])
+            position = self.segments.index(segments[0])
+            self.segments = self.segments[:position] + [merged] + \
+                            [segment for segment in self.segments[position:] if segment not in deleted_at_start]
+            self._save_manifest()
+            for segment in segments:
+                segment.close()
+                os.remove(segment.path)
+
+    #-----------------------
+    # _new_segment_path
+    #---------
+
+    def _new_segment_path(self):
+        '''
+        Reserve the name of a new segment. Caller must hold self.lock.
+        '''
+        name = 'segment_%06d.idx' % self.next_segment
+        self.next_segment += 1
+        return os.path.join(self.index_dir, name)
+
+    #-----------------------
+    # _save_manifest
+    #---------
+
+    def _save_manifest(self):
+        '''
+        Atomically write the list of segments and their deleted
+        documents. Caller must hold self.lock.
+        '''
+        manifest = {'segments'     : [os.path.basename(segment.path) for segment in self.segments],
+                    'next_segment' : self.next_segment,
+                    'deleted'      : {os.path.basename(segment.path) : sorted(segment.deleted)
+                                      for segment in self.segments if len(segment.deleted) > 0}}
+        (fd, tmp_path) = tempfile.mkstemp(dir=self.index_dir, suffix='.part')
+        with os.fdopen(fd, 'w') as tmp_fd:
+            json.dump(manifest, tmp_fd)
+        os.replace(tmp_path, os.path.join(self.index_dir, CaptionIndex.MANIFEST_NAME))
+
+    #-----------------------
+    # _raise_merge_error
+    #---------
+
+    def _raise_merge_error(self):
+        if self.merge_error is not None:
+            (error, self.merge_error) = (self.merge_error, None)
+            raise error
+
+
+class _MemorySegment(object):
+    '''
+    The documents added since the last flush, with the same
+    lookup methods as an on-disk _Segment.
+    '''
+
+    def __init__(self):
+        self.docs = []
+        self.term_postings = {}
+        self.deleted = set()
+        # True if documents of on-disk segments were
+        # replaced since the last manifest was saved:
+        self.dirty = False
+
+    @property
+    def num_docs(self):
+        return len(self.docs)
+
+    def add(self, video_id, field_code, tokens, cue_table):
+        doc_id = len(self.docs)
+        self.docs.append((video_id,
+                          field_code,
+                          [position for (position, _ms) in cue_table],
+                          [ms for (_position, ms) in cue_table]))
+        for (position, token) in enumerate(tokens):
+            self.term_postings.setdefault(token, {}).setdefault(doc_id, []).append(position)
+        return doc_id
+
+    def doc(self, doc_id):
+        return self.docs[doc_id]
+
+    def doc_info(self, doc_id):
+        return self.docs[doc_id][:2]
+
+    def doc_key(self, doc_id):
+        (video_id, field_code) = self.docs[doc_id][:2]
+        return (video_id, FIELD_NAMES[field_code])
+
+    def cue_time(self, doc_id, position):
+        (_video_id, _field_code, cue_positions, cue_times) = self.docs[doc_id]
+        if len(cue_positions) == 0:
+            return None
+        return cue_times[bisect.bisect_right(cue_positions, position) - 1]
+
+    def postings(self, term):
+        return self.term_postings.get(term)
+
+    def iter_postings(self):
+        for term in sorted(self.term_postings.keys()):
+            yield (term, self.term_postings[term])
+
+
+class _Segment(object):
+    '''
+    One memory-mapped segment file. See the module comment
+    for the layout.
+    '''
+
+    MAGIC = b'YTIDX001'
+    HEADER = struct.Struct('<8sII')
+
+    # Number of terms whose decoded postings are kept:
+    POSTINGS_CACHE_SIZE = 4096
+
+    def __init__(self, path):
+        self.path = path
+        self.deleted = set()
+        # Segments never change, so decoded postings of
+        # frequently queried terms can be reused:
+        self.postings_cache = OrderedDict()
+        with open(path, 'rb') as fd:
+            self.mm = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.num_docs, self.num_terms) = _Segment.HEADER.unpack_from(self.mm, 0)
+        if magic != _Segment.MAGIC:
+            self.mm.close()
+            raise ValueError('Not an index segment: %s' % path)
+        self.doc_offsets_at      = _Segment.HEADER.size
+        self.term_offsets_at     = self.doc_offsets_at + 8 * (self.num_docs + 1)
+        self.postings_offsets_at = self.term_offsets_at + 8 * (self.num_terms + 1)
+        self.docs_at             = self.postings_offsets_at + 8 * (self.num_terms + 1)
+        self.terms_at            = self.docs_at + self._offset(self.doc_offsets_at, self.num_docs)
+        self.postings_at         = self.terms_at + self._offset(self.term_offsets_at, self.num_terms)
+
+    def doc(self, doc_id):
+        '''
+        Return a document's video id, field code, and cue table
+        as lists of token positions and start times.
+        '''
+        (video_id, field_code, num_cues, table_at) = self._doc_header(doc_id)
+        cue_positions = list(struct.unpack_from('<%sI' % num_cues, self.mm, table_at))
+        cue_times = list(struct.unpack_from('<%sI' % num_cues, self.mm, table_at + 4 * num_cues))
+        return (video_id, field_code, cue_positions, cue_times)
+
+    def doc_info(self, doc_id):
+        return self._doc_header(doc_id)[:2]
+
+    def doc_key(self, doc_id):
+        (video_id, field_code) = self._doc_header(doc_id)[:2]
+        return (video_id, FIELD_NAMES[field_code])
+
+    def cue_time(self, doc_id, position):
+        '''
+        Return the start time of the cue that contains the token
+        at position, or None if the doc has no cues.
+        '''
+        (_video_id, _field_code, num_cues, table_at) = self._doc_header(doc_id)
+        if num_cues == 0:
+            return None
+        # Last cue that starts at or before position:
+        (low, high) = (0, num_cues)
+        while low < high:
+            middle = (low + high) // 2
+            if struct.unpack_from('<I', self.mm, table_at + 4 * middle)[0] <= position:
+                low = middle + 1
+            else:
+                high = middle
+        return struct.unpack_from('<I', self.mm, table_at + 4 * (num_cues + low - 1))[0]
+
+    def postings(self, term):
+        '''
+        Return {doc_id : [position, ...]} for the docs that
+        contain term, or None if none does.
+        '''
+        try:
+            postings = self.postings_cache[term]
+            self.postings_cache.move_to_end(term)
+            return postings
+        except KeyError:
+            pass
+        term_bytes = term.encode('utf-8')
+        (low, high) = (0, self.num_terms)
+        while low < high:
+            middle = (low + high) // 2
+            if self.term(middle) < term_bytes:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.num_terms or self.term(low) != term_bytes:
+            postings = None
+        else:
+            postings = self._decode_postings(low)
+        self.postings_cache[term] = postings
+        if len(self.postings_cache) > _Segment.POSTINGS_CACHE_SIZE:
+            self.postings_cache.popitem(last=False)
+        return postings
+
+    def term(self, term_no):
+        start = self.terms_at + self._offset(self.term_offsets_at, term_no)
+        end = self.terms_at + self._offset(self.term_offsets_at, term_no + 1)
+        return self.mm[start:end]
+
+    def iter_postings(self):
+        '''
+        Generator over (term, postings) in term order.
+        '''
+        for term_no in range(self.num_terms):
+            yield (self.term(term_no).decode('utf-8'), self._decode_postings(term_no))
+
+    def close(self):
+        self.mm.close()
+
+    def _doc_header(self, doc_id):
+        '''
+        Return a doc's video id, field code, number of cues,
+        and the file position of its cue table.
+        '''
+        pos = self.docs_at + self._offset(self.doc_offsets_at, doc_id)
+        (id_len, pos) = _read_varint(self.mm, pos)
+        video_id = self.mm[pos:pos + id_len].decode('utf-8')
+        (field_code, pos) = _read_varint(self.mm, pos + id_len)
+        (num_cues, pos) = _read_varint(self.mm, pos)
+        return (video_id, field_code, num_cues, pos)
+
+    def _offset(self, table_at, i):
+        return struct.unpack_from('<Q', self.mm, table_at + 8 * i)[0]
+
+    def _decode_postings(self, term_no):
+        pos = self.postings_at + self._offset(self.postings_offsets_at, term_no)
+        (num_docs, pos) = _read_varint(self.mm, pos)
+        postings = {}
+        doc_id = 0
+        for _i in range(num_docs):
+            (doc_delta, pos) = _read_varint(self.mm, pos)
+            (num_positions, pos) = _read_varint(self.mm, pos)
+            doc_id += doc_delta
+            positions = []
+            position = 0
+            for _j in range(num_positions):
+                (position_delta, pos) = _read_varint(self.mm, pos)
+                position += position_delta
+                positions.append(position)
+            postings[doc_id] = positions
+        return postings
+
+#--------------------------------- Segment Writing ------------
+
+#-----------------------
+# _merged_postings
+#---------
+
+def _merged_postings(doc_maps):
+    '''
+    Generator over (term, {new_doc_id : positions}) in term order,
+    combining the postings of several segments.
+
+    :param doc_maps: for each segment, in order, the segment and a dict
+        from its surviving doc ids to their ids in the new segment
+    :type doc_maps: [(segment, { int : int })]
+    '''
+    term_streams = [_numbered_postings(seg_no, segment) for (seg_no, (segment, _doc_map)) in enumerate(doc_maps)]
+    current_term = None
+    current = {}
+    for (term, seg_no, postings) in heapq.merge(*term_streams, key=lambda entry: entry[:2]):
+        if term != current_term:
+            if len(current) > 0:
+                yield (current_term, current)
+            (current_term, current) = (term, {})
+        doc_map = doc_maps[seg_no][1]
+        for (doc_id, positions) in postings.items():
+            if doc_id in doc_map:
+                current[doc_map[doc_id]] = positions
+    if len(current) > 0:
+        yield (current_term, current)
+
+def _numbered_postings(seg_no, segment):
+    for (term, postings) in segment.iter_postings():
+        yield (term, seg_no, postings)
+
+#-----------------------
+# _write_segment
+#---------
+
+def _write_segment(path, docs, term_postings):
+    '''
+    Atomically write a segment file. Docs, terms, and postings
+    are spilled to temporary files as they arrive, and copied
+    behind the header and offset tables once their sizes are
+    known; only the offsets are kept in memory.
+
+    :param path: the segment file
+    :type path: str
+    :param docs: per doc: video id, field code, cue positions, cue times
+    :type docs: iterable of (str, int, [int], [int])
+    :param term_postings: (term, {doc_id : positions}) in term order
+    :type term_postings: iterable
+    '''
+    dir_path = os.path.dirname(path)
+    with tempfile.TemporaryFile(dir=dir_path) as docs_fd, \
+         tempfile.TemporaryFile(dir=dir_path) as terms_fd, \
+         tempfile.TemporaryFile(dir=dir_path) as postings_fd:
+        doc_offsets = array('Q', [0])
+        for (video_id, field_code, cue_positions, cue_times) in docs:
+            doc_blob = bytearray()
+            video_id_bytes = video_id.encode('utf-8')
+            _write_varint(doc_blob, len(video_id_bytes))
+            doc_blob += video_id_bytes
+            _write_varint(doc_blob, field_code)
+            _write_varint(doc_blob, len(cue_positions))
+            doc_blob += struct.pack('<%sI' % len(cue_positions), *cue_positions)
+            doc_blob += struct.pack('<%sI' % len(cue_times), *cue_times)
+            docs_fd.write(doc_blob)
+            doc_offsets.append(doc_offsets[-1] + len(doc_blob))
+
+        term_offsets = array('Q', [0])
+        postings_offsets = array('Q', [0])
+        for (term, postings) in term_postings:
+            term_bytes = term.encode('utf-8')
+            terms_fd.write(term_bytes)
+            term_offsets.append(term_offsets[-1] + len(term_bytes))
+            postings_blob = bytearray()
+            _write_varint(postings_blob, len(postings))
+            doc_id = 0
+            for new_doc_id in sorted(postings):
+                positions = postings[new_doc_id]
+                _write_varint(postings_blob, new_doc_id - doc_id)
+                _write_varint(postings_blob, len(positions))
+                position = 0
+                for new_position in positions:
+                    _write_varint(postings_blob, new_position - position)
+                    position = new_position
+                doc_id = new_doc_id
+            postings_fd.write(postings_blob)
+            postings_offsets.append(postings_offsets[-1] + len(postings_blob))
+
+        num_docs = len(doc_offsets) - 1
+        num_terms = len(term_offsets) - 1
+        (fd, tmp_path) = tempfile.mkstemp(dir=dir_path, suffix='.part')
+        with os.fdopen(fd, 'wb') as out_fd:
+            out_fd.write(_Segment.HEADER.pack(_Segment.MAGIC, num_docs, num_terms))
+            for offsets in (doc_offsets, term_offsets, postings_offsets):
+                # Segment files are little-endian:
+                if sys.byteorder != 'little':
+                    offsets.byteswap()
+                offsets.tofile(out_fd)
+            for spill_fd in (docs_fd, terms_fd, postings_fd):
+                spill_fd.seek(0)
+                shutil.copyfileobj(spill_fd, out_fd)
+    os.replace(tmp_path, path)
+
+#-----------------------
+# varints
+#---------
+
+def _write_varint(out, value):
+    '''
+    Append value to the bytearray out, seven bits per byte,
+    low bits first; the high bit marks bytes that follow.
+    '''
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(buf, pos):
+    '''
+    Decode the varint at buf[pos].
+
+    :returns the value, and the position after it
+    :rtype (int, int)
+    '''
+    byte = buf[pos]
+    if byte < 0x80:
+        return (byte, pos + 1)
+    value = byte & 0x7f
+    shift = 7
+    while True:
+        pos += 1
+        byte = buf[pos]
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return (value, pos + 1)
+        shift += 7
@@ -0,0 +1,121 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils.captions import Cue
+from youtube_utils.text_index import CaptionIndex, tokenize, _read_varint, _write_varint
+
+DO_ALL = True
+
+LECTURE_CUES = [Cue(1000, 4000, 'Welcome to Statistics in Medicine.'),
+                Cue(4000, 8000, 'Today: the standard'),
+                Cue(8000, 12000, 'deviation, and why the standard error differs.')]
+
+class TextIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp(prefix='youtube_utils_index_test')
+
+    def tearDown(self):
+        shutil.rmtree(self.index_dir)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_varints(self):
+        buf = bytearray()
+        values = [0, 1, 127, 128, 300, 2 ** 40]
+        for value in values:
+            _write_varint(buf, value)
+        self.assertEqual(len(buf), 1 + 1 + 1 + 2 + 2 + 6)
+        pos = 0
+        for value in values:
+            (decoded, pos) = _read_varint(buf, pos)
+            self.assertEqual(decoded, value)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Don't panic: it's 42, Ünïcode!"),
+                         ["don't", 'panic', "it's", '42', 'ünïcode'])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_phrase_search(self):
+        with CaptionIndex(self.index_dir) as index:
+            index.add_captions('vid1', LECTURE_CUES)
+            index.add_description('vid1', 'Lecture on the Standard Deviation.')
+            index.add_captions('vid2', [Cue(500, 900, 'deviation standard')])
+            # Searchable before flush:
+            self.assertEqual(index.search('standard deviation'), [('vid1', None), ('vid1', 4000)])
+            index.flush()
+            # Phrases may span cues; hits carry the time of
+            # the cue in which they start:
+            self.assertEqual(index.search('STANDARD deviation', field='captions'), [('vid1', 4000)])
+            self.assertEqual(index.search('standard'),
+                             [('vid1', None), ('vid1', 4000), ('vid1', 8000), ('vid2', 500)])
+            self.assertEqual(index.search('standard', limit=1), [('vid1', None)])
+            self.assertEqual(index.search('deviation the'), [])
+            self.assertEqual(index.search('variance'), [])
+            self.assertEqual(index.search('...'), [])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_replace_and_reopen(self):
+        with CaptionIndex(self.index_dir) as index:
+            index.add_captions('vid1', LECTURE_CUES)
+            index.flush()
+            index.add_captions('vid1', [Cue(0, 1000, 'Corrected captions')])
+            self.assertEqual(index.search('welcome'), [])
+            self.assertEqual(index.search('corrected captions'), [('vid1', 0)])
+        with CaptionIndex(self.index_dir) as index:
+            self.assertEqual(index.num_docs(), 1)
+            self.assertEqual(index.search('welcome'), [])
+            self.assertEqual(index.search('corrected captions'), [('vid1', 0)])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_merge(self):
+        with CaptionIndex(self.index_dir, flush_docs=2, merge_factor=3) as index:
+            for i in range(20):
+                index.add_captions('vid%s' % i, [Cue(i * 1000, i * 1000 + 500, 'video number %s' % i)])
+            index.add_captions('vid3', [Cue(0, 1000, 'replaced')])
+            index.wait_for_merge()
+            index.merge()
+            self.assertEqual(len(index.segments), 1)
+            self.assertEqual(len(index.search('video number')), 19)
+            self.assertEqual(index.search('number 7'), [('vid7', 7000)])
+            self.assertEqual(index.search('number 3'), [])
+            self.assertEqual(index.search('replaced'), [('vid3', 0)])
+        segment_files = [name for name in os.listdir(self.index_dir) if name.endswith('.idx')]
+        self.assertEqual(len(segment_files), 1)
+        with CaptionIndex(self.index_dir) as index:
+            self.assertEqual(index.num_docs(), 20)
+            self.assertEqual(index.search('number 19'), [('vid19', 19000)])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_tiered_merge(self):
+        with CaptionIndex(self.index_dir, flush_docs=2, merge_factor=3) as index:
+            written = []
+            merge_segments = index._merge_segments
+            def recording_merge(segments, deleted_at_start, path):
+                written.append(sum(segment.num_docs for segment in segments))
+                merge_segments(segments, deleted_at_start, path)
+            index._merge_segments = recording_merge
+            for i in range(20):
+                index.add_captions('vid%s' % i, [Cue(i * 1000, i * 1000 + 500, 'video number %s' % i)])
+            index.wait_for_merge()
+            # Three merges of three flushed segments, then one
+            # of their three results; the last flush waits for
+            # two more of its size:
+            self.assertEqual(written, [6, 6, 6, 18])
+            self.assertEqual(sorted(segment.num_docs for segment in index.segments), [2, 18])
+            self.assertEqual(len(index.search('video number')), 20)
+            self.assertEqual(index.search('number 13'), [('vid13', 13000)])
+        with self.assertRaises(ValueError):
+            CaptionIndex(self.index_dir, merge_factor=1)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,257 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Local conversion between caption formats. The YouTube API
+converts captions on request (the tfmt parameter of
+captions.download), but each download costs 200 quota units,
+so serving a track in three formats costs 600. A
+CaptionTranscoder instead keeps each track once in the
+format it was uploaded in, and derives other formats from
+that copy locally:
+
+    with CaptionTranscoder('/var/cache/mooc/captions') as transcoder:
+        for caption_format in ('srt', 'vtt', 'txt'):
+            helper.get_caption_files('Hlfeeqf5tdc', caption_format,
+                                     outdir='/srv/captions/' + caption_format,
+                                     transcoder=transcoder)
+
+downloads each track of the video once. The cache is keyed by
+the tracks' etags, so a track that changes is downloaded and
+converted anew, while its old versions stay behind until
+prune() removes them.
+
+Conversions stream cues from the parsers of the captions
+module to its writers, and run in a process pool, so that
+converting thousands of tracks uses all cores.
+'''
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from .captions import CAPTION_WRITERS, parse_captions, write_captions
+
+#-----------------------
+# convert_caption_file
+#---------
+
+def convert_caption_file(src_path, dest_path, caption_format, src_format=None):
+    '''
+    Convert one caption file to another format. The destination
+    is written to a temporary file that is renamed once complete.
+    Module level, so that process pools can run it.
+
+    :param src_path: file to convert
+    :type src_path: str
+    :param dest_path: file to create or replace
+    :type dest_path: str
+    :param caption_format: format of the new file; one of CAPTION_WRITERS
+    :type caption_format: { str | CaptionFormat }
+    :param src_format: format of src_path; None: guess from its content
+    :type src_format: { str | CaptionFormat | None }
+    :returns number of cues converted
+    :rtype int
+    :raise ValueError if a format is not supported
+    '''
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    (fd, tmp_path) = tempfile.mkstemp(dir=dest_dir, prefix='.' + os.path.basename(dest_path), suffix='.part')
+    try:
+        with open(src_path, 'r', encoding='utf-8-sig') as in_fd, \
+             os.fdopen(fd, 'w', encoding='utf-8') as out_fd:
+            num_cues = write_captions(parse_captions(in_fd, src_format), out_fd, caption_format)
+        os.replace(tmp_path, dest_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return num_cues
+
+
+class CaptionTranscoder(object):
+    '''
+    Cache of caption tracks in their native format, and of
+    the formats derived from them, in one directory. Files are
+    named by a hash of the track's etag, with extension 'orig'
+    for the native format. Thread safe; one transcoder may serve
+    all threads of a helper.
+    '''
+
+    NATIVE = 'orig'
+
+    def __init__(self, cache_dir, processes=None):
+        '''
+        :param cache_dir: directory of the cache; created if necessary
+        :type cache_dir: str
+        :param processes: size of the process pool for conversions;
+            None: one per CPU; 0: convert in the calling thread
+        :type processes: int
+        '''
+        self.cache_dir = cache_dir
+        self.processes = processes if processes is not None else os.cpu_count()
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.executor = None
+        self.executor_lock = threading.Lock()
+
+    #--------------------------------- Public Methods ------------
+
+    #-----------------------
+    # native_path
+    #---------
+
+    def native_path(self, etag):
+        '''
+        Path at which the track with the given etag is, or
+        is to be, kept in its native format.
+        '''
+        return self.path(etag, CaptionTranscoder.NATIVE)
+
+    #-----------------------
+    # path
+    #---------
+
+    def path(self, etag, caption_format):
+        caption_format = getattr(caption_format, 'caption_format', caption_format)
+        return os.path.join(self.cache_dir, '%s.%s' % (hashlib.sha1(etag.encode('utf-8')).hexdigest(), caption_format))
+
+    #-----------------------
+    # cached
+    #---------
+
+    def cached(self, etag, caption_format):
+        '''
+        Return the path of the track in the given format if
+        the cache has it, else None.
+
+        :param etag: the caption track's etag
+        :type etag: str
+        :param caption_format: one of CAPTION_WRITERS, or NATIVE
+        :type caption_format: { str | CaptionFormat }
+        :rtype { str | None }
+        '''
+        path = self.path(etag, caption_format)
+        return path if os.path.exists(path) else None
+
+    #-----------------------
+    # transcode
+    #---------
+
+    def transcode(self, etag, caption_format):
+        '''
+        Return the path of the track in the given format,
+        converting it from the native copy if not yet cached.
+        Conversion runs in the process pool; the calling thread
+        waits for it.
+
+        :param etag: the caption track's etag
+        :type etag: str
+        :param caption_format: one of CAPTION_WRITERS
+        :type caption_format: { str | CaptionFormat }
+        :returns path to the converted file
+        :rtype str
+        :raise KeyError if the native copy of the track is not cached
+        :raise ValueError if a format is not supported
+        '''
+        return self.transcode_many([(etag, caption_format)])[0]
+
+    #-----------------------
+    # transcode_many
+    #---------
+
+    def transcode_many(self, etag_format_pairs):
+        '''
+        Like transcode(), for many tracks and formats at once,
+        converted in parallel.
+
+        :param etag_format_pairs: etags of cached tracks, and the format for each
+        :type etag_format_pairs: iterable of (str, str)
+        :returns paths of the converted files, in the order of the pairs
+        :rtype [str]
+        :raise KeyError if the native copy of a track is not cached
+        :raise ValueError if a format is not supported
+        '''
+        paths = []
+        pending = []
+        for (etag, caption_format) in etag_format_pairs:
+            caption_format = getattr(caption_format, 'caption_format', caption_format)
+            if caption_format not in CAPTION_WRITERS:
+                raise ValueError("Cannot write caption format: '%s'" % caption_format)
+            path = self.path(etag, caption_format)
+            paths.append(path)
+            if os.path.exists(path):
+                continue
+            native_path = self.cached(etag, CaptionTranscoder.NATIVE)
+            if native_path is None:
+                raise KeyError("No cached caption track with etag '%s'" % etag)
+            pending.append((native_path, path, caption_format))
+
+        if self.processes == 0:
+            for (native_path, path, caption_format) in pending:
+                convert_caption_file(native_path, path, caption_format)
+        elif len(pending) > 0:
+            futures = [self._get_executor().submit(convert_caption_file, native_path, path, caption_format)
+                       for (native_path, path, caption_format) in pending]
+            for future in futures:
+                future.result()
+        return paths
+
+    #-----------------------
+    # prune
+    #---------
+
+    def prune(self, max_age_secs):
+        '''
+        Remove cached files not modified for the given number of
+        seconds, such as those of outdated track versions.
+
+        :param max_age_secs: age beyond which files are removed
+        :type max_age_secs: float
+        :returns number of files removed
+        :rtype int
+        '''
+        cutoff = time.time() - max_age_secs
+        num_removed = 0
+        for file_name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, file_name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    num_removed += 1
+            except OSError:
+                # Removed concurrently:
+                pass
+        return num_removed
+
+    #-----------------------
+    # close
+    #---------
+
+    def close(self):
+        '''
+        Shut down the process pool, if one was started.
+        '''
+        with self.executor_lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    #--------------------------------- Private Utility Methods ------------
+
+    def _get_executor(self):
+        '''
+        Return the process pool, started on first use.
+        '''
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.processes)
+            return self.executor
@@ -0,0 +1,107 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils.captions import Cue, parse_captions, write_captions
+from youtube_utils.mock_api import MockYoutubeServer
+from youtube_utils.quota import QuotaScheduler
+from youtube_utils.transcode import CaptionTranscoder, convert_caption_file
+from youtube_utils.youtube_utils import YoutubeHelper
+
+DO_ALL = True
+
+class TranscodeTest(unittest.TestCase):
+
+    CUES = [Cue(i * 3000, i * 3000 + 2500, 'Cue %s' % i) for i in range(20)]
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, path, caption_format):
+        with open(path, 'w', encoding='utf-8') as fd:
+            write_captions(TranscodeTest.CUES, fd, caption_format)
+
+    def _cues(self, path, caption_format=None):
+        with open(path, 'r', encoding='utf-8') as fd:
+            return list(parse_captions(fd, caption_format))
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_convert_caption_file(self):
+        src_path = os.path.join(self.tmpdir, 'track.orig')
+        self._write(src_path, 'ttml')
+        for caption_format in ('srt', 'vtt', 'sbv'):
+            dest_path = os.path.join(self.tmpdir, 'track.' + caption_format)
+            self.assertEqual(convert_caption_file(src_path, dest_path, caption_format), 20)
+            self.assertEqual(self._cues(dest_path, caption_format), TranscodeTest.CUES)
+        with self.assertRaises(ValueError):
+            convert_caption_file(src_path, os.path.join(self.tmpdir, 'track.docx'), 'docx')
+        # No partial files are left behind:
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['track.orig', 'track.sbv', 'track.srt', 'track.vtt'])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_transcoder(self):
+        with CaptionTranscoder(self.cache_dir, processes=2) as transcoder:
+            etags = ['"etag%s"' % i for i in range(4)]
+            for etag in etags:
+                self._write(transcoder.native_path(etag), 'srt')
+            pairs = [(etag, caption_format) for etag in etags for caption_format in ('vtt', 'txt')]
+            paths = transcoder.transcode_many(pairs)
+            self.assertEqual(paths, [transcoder.path(etag, caption_format) for (etag, caption_format) in pairs])
+            self.assertEqual(self._cues(paths[0], 'vtt'), TranscodeTest.CUES)
+            with open(paths[1], 'r') as fd:
+                self.assertEqual(fd.readline(), 'Cue 0\n')
+            self.assertEqual(transcoder.cached(etags[0], 'vtt'), paths[0])
+            self.assertIsNone(transcoder.cached(etags[0], 'sbv'))
+            with self.assertRaises(KeyError):
+                transcoder.transcode('"unknown"', 'vtt')
+            with self.assertRaises(ValueError):
+                transcoder.transcode(etags[0], 'scc')
+            self.assertEqual(transcoder.prune(3600), 0)
+            self.assertEqual(transcoder.prune(-1), 12)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_get_caption_files(self):
+        outdirs = {caption_format : os.path.join(self.tmpdir, caption_format) for caption_format in ('srt', 'vtt', 'txt')}
+        for outdir in outdirs.values():
+            os.mkdir(outdir)
+        with MockYoutubeServer(caption_cues=5) as server:
+            with YoutubeHelper(referer='test',
+                               api_key='test',
+                               api_endpoint=server.api_endpoint,
+                               scheduler=QuotaScheduler(daily_budget=10000)) as helper, \
+                 CaptionTranscoder(self.cache_dir, processes=0) as transcoder:
+                for (caption_format, outdir) in outdirs.items():
+                    paths = helper.get_caption_files('vid1', caption_format, outdir=outdir, transcoder=transcoder)
+                    self.assertEqual([os.path.basename(path) for path in paths],
+                                     ['vid1_en.%s' % caption_format, 'vid1_en_asr.%s' % caption_format])
+                # Each track was downloaded once, for all three formats:
+                self.assertEqual(server.num_requests['captions.download'], 2)
+                self.assertEqual(helper.scheduler.units_used, 3 * 50 + 2 * 200)
+
+                # Concurrent retrieval, and again in a format
+                # already in the cache:
+                os.remove(os.path.join(outdirs['vtt'], 'vid1_en.vtt'))
+                results = list(helper.get_caption_files_concurrent(['vid1', 'vid2'], 'vtt',
+                                                                   outdir=outdirs['vtt'],
+                                                                   transcoder=transcoder))
+                self.assertEqual(len(results), 4)
+                self.assertEqual(server.num_requests['captions.download'], 4)
+        with open(os.path.join(outdirs['txt'], 'vid1_en.txt'), 'r') as fd:
+            self.assertEqual(fd.readline(), 'Cue 1 of caption track vid1.en\n')
+        self.assertEqual(self._cues(os.path.join(outdirs['vtt'], 'vid2_en_asr.vtt'))[0],
+                         Cue(0, 2500, 'Cue 1 of caption track vid2.en.asr'))
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
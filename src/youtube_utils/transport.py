@@ -0,0 +1,218 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Pooled HTTP transport for YoutubeHelper. The default
+httplib2 transport of googleapiclient keeps one connection
+per Http object, and cannot be shared between threads. A
+PooledHttp instead keeps a bounded pool of keep-alive
+connections, can be shared by all threads of all helpers,
+asks for gzip compressed responses, and applies connect
+and read timeouts.
+
+PooledHttp implements the request() method of httplib2.Http,
+so it can be handed to googleapiclient wherever an Http
+object is expected:
+
+    http = PooledHttp(pool_size=32, timeout=(5, 30))
+    helper1 = YoutubeHelper(referer='mooc-analyzer', http=http)
+    helper2 = YoutubeHelper(referer='mooc-analyzer', http=http)
+
+By default the transport is a requests Session. With
+http2=True it is an httpx Client instead, which requires
+the httpx and h2 packages.
+
+stream_request() sends a GET request and returns the response
+body as a generator of decompressed chunks, for the streaming
+methods of YoutubeHelper.
+'''
+import httplib2
+
+from .streaming import CHUNK_SIZE, StreamedResponse
+
+
+class PooledHttp(object):
+    '''
+    Thread safe, connection pooling stand-in for httplib2.Http.
+    Transport failures are raised as the builtin ConnectionError
+    and TimeoutError, which the QuotaScheduler retries.
+    '''
+
+    DEFAULT_POOL_SIZE = 16
+
+    # Seconds to wait for a connection, and for response data:
+    DEFAULT_TIMEOUT = (10, 60)
+
+    def __init__(self, pool_size=None, timeout=None, http2=False):
+        '''
+        :param pool_size: maximum number of open connections per host
+        :type pool_size: int
+        :param timeout: seconds for connect and read; one number for both
+        :type timeout: { float | (float, float) }
+        :param http2: use HTTP/2 via httpx, rather than HTTP/1.1 via requests
+        :type http2: bool
+        '''
+        self.pool_size = pool_size if pool_size is not None else PooledHttp.DEFAULT_POOL_SIZE
+        self.timeout   = timeout if timeout is not None else PooledHttp.DEFAULT_TIMEOUT
+        self.http2     = http2
+        if http2:
+            import httpx
+            (connect_timeout, read_timeout) = self._timeout_pair()
+            self.client = httpx.Client(http2=True,
+                                       limits=httpx.Limits(max_connections=self.pool_size,
+                                                           max_keepalive_connections=self.pool_size),
+                                       timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                                       headers={'accept-encoding' : 'gzip'})
+        else:
+            import requests
+            from requests.adapters import HTTPAdapter
+            self.client = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size,
+                                  pool_maxsize=self.pool_size,
+                                  max_retries=0)
+            self.client.mount('https://', adapter)
+            self.client.mount('http://', adapter)
+            self.client.headers['accept-encoding'] = 'gzip'
+
+    #-----------------------
+    # request
+    #---------
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=5, connection_type=None):
+        '''
+        Same signature and return as httplib2.Http.request().
+        The body is decompressed if it came gzipped.
+
+        :returns response headers and status, and the response body
+        :rtype (httplib2.Response, bytes)
+        :raise ConnectionError if no connection could be made, or it broke
+        :raise TimeoutError if the connection or the response timed out
+        '''
+        resp = self._send(uri, method, body, headers, stream=False)
+        return (self._httplib2_response(resp, len(resp.content)), resp.content)
+
+    #-----------------------
+    # stream_request
+    #---------
+
+    def stream_request(self, uri, headers=None):
+        '''
+        Send a GET request without reading the response body.
+        The body is read, and decompressed, as the returned
+        chunk generator is consumed; the connection goes back
+        to the pool when the generator is exhausted or closed.
+
+        :param uri: the URL
+        :type uri: str
+        :param headers: request headers
+        :type headers: { str : str }
+        :rtype streaming.StreamedResponse
+        :raise ConnectionError if no connection could be made, or it broke
+        :raise TimeoutError if the connection or the response timed out
+        '''
+        resp = self._send(uri, 'GET', None, headers, stream=True)
+        response_headers = {key.lower() : value for (key, value) in resp.headers.items()}
+        # The client decompresses the chunks:
+        response_headers.pop('content-encoding', None)
+        return StreamedResponse(resp.status_code, response_headers, self._iter_chunks(resp))
+
+    #-----------------------
+    # close
+    #---------
+
+    def close(self):
+        '''
+        Close all pooled connections.
+        '''
+        self.client.close()
+
+    #--------------------------------- Private Utility Methods ------------
+
+    #-----------------------
+    # _send
+    #---------
+
+    def _send(self, uri, method, body, headers, stream):
+        '''
+        Send one request through the pooled client, translating
+        the client library's transport errors into builtin ones.
+        '''
+        if self.http2:
+            import httpx
+            try:
+                if stream:
+                    req = self.client.build_request(method, uri, content=body, headers=headers)
+                    return self.client.send(req, stream=True)
+                return self.client.request(method, uri, content=body, headers=headers)
+            except httpx.TimeoutException as e:
+                raise TimeoutError(str(e))
+            except httpx.TransportError as e:
+                raise ConnectionError(str(e))
+        import requests
+        try:
+            return self.client.request(method,
+                                       uri,
+                                       data=body,
+                                       headers=headers,
+                                       timeout=self.timeout,
+                                       stream=stream)
+        except requests.Timeout as e:
+            raise TimeoutError(str(e))
+        except requests.ConnectionError as e:
+            raise ConnectionError(str(e))
+
+    #-----------------------
+    # _iter_chunks
+    #---------
+
+    def _iter_chunks(self, resp):
+        '''
+        Generator of the decompressed body of a streamed
+        response, translating transport errors like _send().
+        '''
+        if self.http2:
+            import httpx
+            (chunks, timeout_error, transport_error) = \
+                (resp.iter_bytes(CHUNK_SIZE), httpx.TimeoutException, httpx.TransportError)
+        else:
+            import requests
+            (chunks, timeout_error, transport_error) = \
+                (resp.iter_content(CHUNK_SIZE), requests.Timeout, requests.RequestException)
+        try:
+            for chunk in chunks:
+                yield chunk
+        except timeout_error as e:
+            raise TimeoutError(str(e))
+        except transport_error as e:
+            raise ConnectionError(str(e))
+        finally:
+            resp.close()
+
+    #-----------------------
+    # _httplib2_response
+    #---------
+
+    def _httplib2_response(self, resp, content_length):
+        '''
+        Turn a requests or httpx response into the httplib2.Response
+        googleapiclient expects. The client already decompressed the
+        body, so the encoding and length headers must describe the
+        decompressed body.
+        '''
+        info = {key.lower() : value for (key, value) in resp.headers.items()}
+        info.pop('content-encoding', None)
+        info['content-length'] = str(content_length)
+        info['status'] = str(resp.status_code)
+        http_resp = httplib2.Response(info)
+        http_resp.reason = resp.reason if hasattr(resp, 'reason') else resp.reason_phrase
+        return http_resp
+
+    #-----------------------
+    # _timeout_pair
+    #---------
+
+    def _timeout_pair(self):
+        if isinstance(self.timeout, (tuple, list)):
+            return tuple(self.timeout)
+        return (self.timeout, self.timeout)
@@ -0,0 +1,105 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import gzip
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import json
+import threading
+import time
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils.transport import PooledHttp
+
+DO_ALL = True
+
+class StubHandler(BaseHTTPRequestHandler):
+    '''
+    Answers /videos with a gzipped JSON body, /slow after a
+    delay, and everything else with 404. Records the client
+    port of each request, to show connection reuse.
+    '''
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.client_ports.add(self.client_address[1])
+        if self.path.startswith('/slow'):
+            time.sleep(0.5)
+        if self.path.startswith('/videos') or self.path.startswith('/slow'):
+            body = gzip.compress(json.dumps({'items' : [{'id' : 'hlFeEQF5tDc'}]}).encode('utf-8'))
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Encoding', 'gzip')
+        else:
+            body = b'{"error" : {"message" : "not found"}}'
+            self.send_response(404)
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients that time out leave broken pipes behind:
+        pass
+
+class PooledHttpTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubServer(('127.0.0.1', 0), StubHandler)
+        cls.server.client_ports = set()
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.base_url = 'http://127.0.0.1:%s' % cls.server.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.client_ports.clear()
+        self.http = PooledHttp(pool_size=2, timeout=(1, 0.2))
+
+    def tearDown(self):
+        self.http.close()
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_gzip_and_keep_alive(self):
+        for _i in range(5):
+            (resp, content) = self.http.request(self.base_url + '/videos?id=hlFeEQF5tDc')
+            self.assertEqual(200, resp.status)
+            self.assertDictEqual({'items' : [{'id' : 'hlFeEQF5tDc'}]}, json.loads(content))
+            self.assertNotIn('content-encoding', resp)
+            self.assertEqual(str(len(content)), resp['content-length'])
+        # All requests went over one connection:
+        self.assertEqual(1, len(self.server.client_ports))
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_error_status(self):
+        (resp, _content) = self.http.request(self.base_url + '/nothing')
+        self.assertEqual(404, resp.status)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_stream_request(self):
+        for _i in range(3):
+            response = self.http.stream_request(self.base_url + '/videos?id=hlFeEQF5tDc')
+            self.assertEqual(200, response.status)
+            self.assertNotIn('content-encoding', response.headers)
+            self.assertDictEqual({'items' : [{'id' : 'hlFeEQF5tDc'}]}, json.loads(b''.join(response.chunks)))
+        # Consumed streams return their connection to the pool:
+        self.assertEqual(1, len(self.server.client_ports))
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_timeout(self):
+        self.assertRaises(TimeoutError, self.http.request, self.base_url + '/slow')
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,794 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+
+Distributed retrieval of video info: video IDs are put into a
+shared queue, and workers on any number of hosts lease batches
+of up to 50 IDs, retrieve their info, and hand the results back
+to the queue. A broker keeps the queue, the results, and the
+daily quota budget that all workers of one API key share:
+
+    o SqliteBroker keeps them in an SQLite file, for workers
+      on one host, or in tests.
+    o RedisBroker keeps them in a Redis server, for workers
+      on several hosts. Requires the redis package.
+
+Each ID is queued at most once, and its result is stored at
+most once, however often it is enqueued or retrieved. Leases
+expire, so that the IDs of a worker that dies are handed to
+another worker. IDs whose retrieval fails max_attempts times
+are set aside as failed.
+
+Quota is drawn from the shared budget through a QuotaLease in
+each worker's QuotaScheduler, so that together the workers
+stop at the budget, rather than each at its own.
+
+Example, with a Redis server on host 'broker':
+
+    youtube-queue --broker redis://broker:6379/0 enqueue video_ids.txt
+    # On each worker host:
+    youtube-queue --broker redis://broker:6379/0 work --fields videoTitle,duration --daily-budget 10000
+    # Anywhere:
+    youtube-queue --broker redis://broker:6379/0 export --output videos.jsonl
+
+Durations are exported as integer seconds.
+'''
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from .bulk_enrich import _json_value
+from .quota import QuotaExhaustedError, QuotaLease, QuotaScheduler, quota_day
+from .youtube_utils import YoutubeHelper
+
+# Seconds a worker may hold a batch before it is
+# handed to another worker:
+DEFAULT_LEASE_SECS = 300
+
+# Retrievals of an ID that may fail before it is
+# set aside as failed:
+DEFAULT_MAX_ATTEMPTS = 3
+
+class SqliteBroker(object):
+    '''
+    Work queue, result store, and shared quota budget in an
+    SQLite file. Safe to use from multiple threads, and from
+    multiple processes that share the database file.
+    '''
+
+    # States of work items:
+    PENDING = 0
+    LEASED  = 1
+    DONE    = 2
+    MISSING = 3
+    FAILED  = 4
+
+    STATE_NAMES = {PENDING : 'pending',
+                   LEASED  : 'leased',
+                   DONE    : 'done',
+                   MISSING : 'missing',
+                   FAILED  : 'failed'}
+
+    def __init__(self, db_path, max_attempts=None):
+        '''
+        Open or create the broker database.
+
+        :param db_path: file for the SQLite store
+        :type db_path: str
+        :param max_attempts: failed retrievals after which an ID is set aside
+        :type max_attempts: int
+        '''
+        self.db_path = db_path
+        self.max_attempts = max_attempts if max_attempts is not None else DEFAULT_MAX_ATTEMPTS
+        self.lock = threading.Lock()
+        # Transactions are started explicitly, so that leases
+        # are taken under a write lock:
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS work (
+                                 video_id      TEXT PRIMARY KEY,
+                                 state         INTEGER NOT NULL,
+                                 owner         TEXT,
+                                 lease_expires REAL,
+                                 attempts      INTEGER NOT NULL DEFAULT 0
+                                 )''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS work_state ON work (state, lease_expires)')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS results (
+                                 video_id TEXT PRIMARY KEY,
+                                 info     TEXT NOT NULL
+                                 )''')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS quota (
+                                 day        TEXT PRIMARY KEY,
+                                 units_used INTEGER NOT NULL
+                                 )''')
+
+    #--------------------------------- Public Methods ------------
+
+    #-----------------------
+    # enqueue
+    #---------
+
+    def enqueue(self, video_ids):
+        '''
+        Add video IDs to the queue. IDs that were queued
+        before, whatever their state, are ignored.
+
+        :param video_ids: YouTube video IDs
+        :type video_ids: iterable of str
+        :returns number of IDs newly queued
+        :rtype int
+        '''
+        with self.lock, self._transaction():
+            before = self.conn.total_changes
+            self.conn.executemany('INSERT OR IGNORE INTO work (video_id, state) VALUES (?, ?)',
+                                  ((video_id, SqliteBroker.PENDING) for video_id in video_ids))
+            return self.conn.total_changes - before
+
+    #-----------------------
+    # lease
+    #---------
+
+    def lease(self, worker_id, max_items, lease_secs=None):
+        '''
+        Take up to max_items pending IDs, in the order they were
+        queued, for lease_secs seconds. IDs whose earlier lease
+        expired are pending again.
+
+        :param worker_id: identifies the worker
+        :type worker_id: str
+        :param max_items: maximum number of IDs
+        :type max_items: int
+        :param lease_secs: seconds until the IDs are handed to others
+        :type lease_secs: float
+        :returns the leased IDs; empty if none are pending
+        :rtype [str]
+        '''
+        lease_secs = lease_secs if lease_secs is not None else DEFAULT_LEASE_SECS
+        now = time.time()
+        with self.lock, self._transaction():
+            self.conn.execute('UPDATE work SET state = ?, owner = NULL WHERE state = ? AND lease_expires < ?',
+                              (SqliteBroker.PENDING, SqliteBroker.LEASED, now))
+            video_ids = [row[0] for row in
+                         self.conn.execute('SELECT video_id FROM work WHERE state = ? ORDER BY rowid LIMIT ?',
+                                           (SqliteBroker.PENDING, max_items))]
+            self.conn.executemany('''UPDATE work SET state = ?, owner = ?, lease_expires = ?, attempts = attempts + 1
+                                     WHERE video_id = ?''',
+                                  ((SqliteBroker.LEASED, worker_id, now + lease_secs, video_id)
+                                   for video_id in video_ids))
+        return video_ids
+
+    #-----------------------
+    # complete
+    #---------
+
+    def complete(self, worker_id, infos, missing_ids=()):
+        '''
+        Store the results of leased IDs, and mark the IDs done.
+        If an ID already has a result, because its lease expired
+        and another worker retrieved it too, the first result is
+        kept.
+
+        :param worker_id: identifies the worker
+        :type worker_id: str
+        :param infos: result dicts, each with a 'videoId'
+        :type infos: [{ str : <any> }]
+        :param missing_ids: IDs for which the API returned no info
+        :type missing_ids: [str]
+        :returns number of results newly stored
+        :rtype int
+        '''
+        rows = [(info['videoId'], json.dumps(info, default=_json_value)) for info in infos]
+        with self.lock, self._transaction():
+            before = self.conn.total_changes
+            self.conn.executemany('INSERT OR IGNORE INTO results (video_id, info) VALUES (?, ?)', rows)
+            num_new = self.conn.total_changes - before
+            self.conn.executemany('UPDATE work SET state = ?, owner = NULL WHERE video_id = ?',
+                                  ((SqliteBroker.DONE, video_id) for (video_id, _info) in rows))
+            self.conn.executemany('UPDATE work SET state = ?, owner = NULL WHERE video_id = ? AND state != ?',
+                                  ((SqliteBroker.MISSING, video_id, SqliteBroker.DONE) for video_id in missing_ids))
+        return num_new
+
+    #-----------------------
+    # release
+    #---------
+
+    def release(self, worker_id, video_ids, failed=True):
+        '''
+        Give leased IDs back to the queue. IDs of a failed
+        retrieval that reached max_attempts are set aside as
+        failed instead.
+
+        :param worker_id: identifies the worker
+        :type worker_id: str
+        :param video_ids: the IDs
+        :type video_ids: [str]
+        :param failed: False if the IDs were not attempted, such
+            as when the quota is spent; the lease then does not
+            count as an attempt
+        :type failed: bool
+        '''
+        with self.lock, self._transaction():
+            if not failed:
+                self.conn.executemany('''UPDATE work SET state = ?, owner = NULL, attempts = attempts - 1
+                                         WHERE video_id = ? AND owner = ?''',
+                                      ((SqliteBroker.PENDING, video_id, worker_id) for video_id in video_ids))
+                return
+            self.conn.executemany('''UPDATE work SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, owner = NULL
+                                     WHERE video_id = ? AND owner = ?''',
+                                  ((self.max_attempts, SqliteBroker.FAILED, SqliteBroker.PENDING, video_id, worker_id)
+                                   for video_id in video_ids))
+
+    #-----------------------
+    # counts
+    #---------
+
+    def counts(self):
+        '''
+        Return the number of IDs in each state.
+
+        :returns state name to number of IDs
+        :rtype { str : int }
+        '''
+        counts = {name : 0 for name in SqliteBroker.STATE_NAMES.values()}
+        with self.lock:
+            for (state, count) in self.conn.execute('SELECT state, COUNT(*) FROM work GROUP BY state'):
+                counts[SqliteBroker.STATE_NAMES[state]] = count
+        return counts
+
+    #-----------------------
+    # num_unfinished
+    #---------
+
+    def num_unfinished(self):
+        '''
+        Return the number of IDs pending or leased.
+        '''
+        counts = self.counts()
+        return counts['pending'] + counts['leased']
+
+    #-----------------------
+    # iter_results
+    #---------
+
+    def iter_results(self):
+        '''
+        Generator of (video_id, info) pairs of all stored results.
+        Durations in the info are integer seconds.
+        '''
+        with self.lock:
+            rows = self.conn.execute('SELECT video_id, info FROM results ORDER BY rowid').fetchall()
+        for (video_id, info) in rows:
+            yield (video_id, json.loads(info))
+
+    #-----------------------
+    # ids_in_state
+    #---------
+
+    def ids_in_state(self, state_name):
+        '''
+        Return the IDs in one state, such as 'missing' or 'failed'.
+        '''
+        state = {name : state for (state, name) in SqliteBroker.STATE_NAMES.items()}[state_name]
+        with self.lock:
+            return [row[0] for row in self.conn.execute('SELECT video_id FROM work WHERE state = ? ORDER BY rowid',
+                                                        (state,))]
+
+    #-----------------------
+    # lease_quota
+    #---------
+
+    def lease_quota(self, day, units, daily_budget):
+        '''
+        Grant up to units of a day's shared quota budget.
+        See QuotaLease.
+
+        :returns number of units granted; 0 if the budget is spent
+        :rtype int
+        '''
+        with self.lock, self._transaction():
+            row = self.conn.execute('SELECT units_used FROM quota WHERE day = ?', (day,)).fetchone()
+            used = row[0] if row is not None else 0
+            granted = max(0, min(units, daily_budget - used))
+            if granted > 0:
+                self.conn.execute('INSERT OR REPLACE INTO quota (day, units_used) VALUES (?, ?)',
+                                  (day, used + granted))
+        return granted
+
+    #-----------------------
+    # return_quota
+    #---------
+
+    def return_quota(self, day, units):
+        with self.lock, self._transaction():
+            self.conn.execute('UPDATE quota SET units_used = MAX(0, units_used - ?) WHERE day = ?', (units, day))
+
+    #-----------------------
+    # exhaust_quota
+    #---------
+
+    def exhaust_quota(self, day, daily_budget):
+        with self.lock, self._transaction():
+            self.conn.execute('INSERT OR REPLACE INTO quota (day, units_used) VALUES (?, ?)', (day, daily_budget))
+
+    #-----------------------
+    # quota_used
+    #---------
+
+    def quota_used(self, day):
+        with self.lock:
+            row = self.conn.execute('SELECT units_used FROM quota WHERE day = ?', (day,)).fetchone()
+        return row[0] if row is not None else 0
+
+    #-----------------------
+    # close
+    #---------
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    #--------------------------------- Private Utility Methods ------------
+
+    #-----------------------
+    # _transaction
+    #---------
+
+    def _transaction(self):
+        '''
+        Context manager for a transaction that holds the
+        database's write lock from its start, so that
+        concurrent leases from other processes cannot
+        take the same IDs. Caller must hold self.lock.
+        '''
+        return _ImmediateTransaction(self.conn)
+
+
+class _ImmediateTransaction(object):
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.conn.execute('COMMIT' if exc_type is None else 'ROLLBACK')
+
+
+class RedisBroker(object):
+    '''
+    Work queue, result store, and shared quota budget in a
+    Redis server, for workers on several hosts. Offers the
+    same methods as SqliteBroker. Lease expiry is judged by
+    the workers' clocks, which should therefore be synchronized
+    to well within the lease time.
+
+    Keys, all prefixed with the namespace:
+
+        ids       set of all IDs ever queued
+        pending   list of IDs waiting for a worker
+        leased    sorted set of leased IDs, scored by lease expiry
+        owners    hash of leased ID to worker
+        attempts  hash of ID to number of leases
+        results   hash of ID to JSON result
+        missing   set of IDs without info
+        failed    set of IDs set aside after max_attempts
+        quota:<day>  units of the day's budget leased so far
+    '''
+
+    # Moves expired leases back to the queue, then leases
+    # up to ARGV[3] IDs:
+    LEASE_SCRIPT = '''
+        local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+        for _, video_id in ipairs(expired) do
+            redis.call('ZREM', KEYS[2], video_id)
+            redis.call('LPUSH', KEYS[1], video_id)
+        end
+        local video_ids = {}
+        for i = 1, tonumber(ARGV[3]) do
+            local video_id = redis.call('LPOP', KEYS[1])
+            if not video_id then break end
+            redis.call('ZADD', KEYS[2], ARGV[2], video_id)
+            redis.call('HSET', KEYS[3], video_id, ARGV[4])
+            redis.call('HINCRBY', KEYS[4], video_id, 1)
+            video_ids[#video_ids + 1] = video_id
+        end
+        return video_ids
+        '''
+
+    ENQUEUE_SCRIPT = '''
+        local num_new = 0
+        for _, video_id in ipairs(ARGV) do
+            if redis.call('SADD', KEYS[1], video_id) == 1 then
+                redis.call('RPUSH', KEYS[2], video_id)
+                num_new = num_new + 1
+            end
+        end
+        return num_new
+        '''
+
+    QUOTA_SCRIPT = '''
+        local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+        local granted = math.min(tonumber(ARGV[1]), tonumber(ARGV[2]) - used)
+        if granted <= 0 then return 0 end
+        redis.call('INCRBY', KEYS[1], granted)
+        redis.call('EXPIRE', KEYS[1], ARGV[3])
+        return granted
+        '''
+
+    # Quota keys outlive their day by enough for
+    # hosts whose clocks are a little behind:
+    QUOTA_KEY_SECS = 3 * 24 * 3600
+
+    # IDs sent to the server per enqueue script call:
+    ENQUEUE_BATCH_SIZE = 1000
+
+    def __init__(self, url='redis://localhost:6379/0', namespace='youtube_utils', max_attempts=None, client=None):
+        '''
+        :param url: address of the Redis server
+        :type url: str
+        :param namespace: prefix of all keys, so that several
+            queues can share one server
+        :type namespace: str
+        :param max_attempts: failed retrievals after which an ID is set aside
+        :type max_attempts: int
+        :param client: Redis client to use instead of connecting to url
+        :type client: redis.Redis
+        :raise ImportError if the redis package is not installed
+        '''
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ImportError('RedisBroker requires the redis package: pip install redis')
+            client = redis.Redis.from_url(url)
+        self.redis = client
+        self.namespace = namespace
+        self.max_attempts = max_attempts if max_attempts is not None else DEFAULT_MAX_ATTEMPTS
+        self.lease_script   = client.register_script(RedisBroker.LEASE_SCRIPT)
+        self.enqueue_script = client.register_script(RedisBroker.ENQUEUE_SCRIPT)
+        self.quota_script   = client.register_script(RedisBroker.QUOTA_SCRIPT)
+
+    #--------------------------------- Public Methods ------------
+
+    def enqueue(self, video_ids):
+        num_new = 0
+        batch = []
+        for video_id in video_ids:
+            batch.append(video_id)
+            if len(batch) >= RedisBroker.ENQUEUE_BATCH_SIZE:
+                num_new += self.enqueue_script(keys=[self._key('ids'), self._key('pending')], args=batch)
+                batch = []
+        if len(batch) > 0:
+            num_new += self.enqueue_script(keys=[self._key('ids'), self._key('pending')], args=batch)
+        return num_new
+
+    def lease(self, worker_id, max_items, lease_secs=None):
+        lease_secs = lease_secs if lease_secs is not None else DEFAULT_LEASE_SECS
+        now = time.time()
+        video_ids = self.lease_script(keys=[self._key('pending'), self._key('leased'),
+                                            self._key('owners'), self._key('attempts')],
+                                      args=[now, now + lease_secs, max_items, worker_id])
+        return [_text(video_id) for video_id in video_ids]
+
+    def complete(self, worker_id, infos, missing_ids=()):
+        pipe = self.redis.pipeline()
+        for info in infos:
+            pipe.hsetnx(self._key('results'), info['videoId'], json.dumps(info, default=_json_value))
+        for video_id in missing_ids:
+            pipe.sadd(self._key('missing'), video_id)
+        done_ids = [info['videoId'] for info in infos] + list(missing_ids)
+        if len(done_ids) > 0:
+            pipe.zrem(self._key('leased'), *done_ids)
+            pipe.hdel(self._key('owners'), *done_ids)
+        replies = pipe.execute()
+        return sum(1 for reply in replies[:len(infos)] if reply)
+
+    def release(self, worker_id, video_ids, failed=True):
+        video_ids = list(video_ids)
+        if len(video_ids) == 0:
+            return
+        owners   = self.redis.hmget(self._key('owners'), video_ids)
+        attempts = self.redis.hmget(self._key('attempts'), video_ids)
+        pipe = self.redis.pipeline()
+        for (video_id, owner, num_attempts) in zip(video_ids, owners, attempts):
+            if owner is None or _text(owner) != worker_id:
+                # Lease expired, and the ID went to another worker:
+                continue
+            pipe.zrem(self._key('leased'), video_id)
+            pipe.hdel(self._key('owners'), video_id)
+            if not failed:
+                pipe.hincrby(self._key('attempts'), video_id, -1)
+                pipe.lpush(self._key('pending'), video_id)
+            elif int(num_attempts or 0) >= self.max_attempts:
+                pipe.sadd(self._key('failed'), video_id)
+            else:
+                pipe.rpush(self._key('pending'), video_id)
+        pipe.execute()
+
+    def counts(self):
+        pipe = self.redis.pipeline()
+        pipe.llen(self._key('pending'))
+        pipe.zcard(self._key('leased'))
+        pipe.hlen(self._key('results'))
+        pipe.scard(self._key('missing'))
+        pipe.scard(self._key('failed'))
+        (pending, leased, done, missing, failed) = pipe.execute()
+        return {'pending' : pending, 'leased' : leased, 'done' : done, 'missing' : missing, 'failed' : failed}
+
+    def num_unfinished(self):
+        counts = self.counts()
+        return counts['pending'] + counts['leased']
+
+    def iter_results(self):
+        for (video_id, info) in self.redis.hscan_iter(self._key('results')):
+            yield (_text(video_id), json.loads(_text(info)))
+
+    def ids_in_state(self, state_name):
+        if state_name == 'pending':
+            return [_text(video_id) for video_id in self.redis.lrange(self._key('pending'), 0, -1)]
+        if state_name == 'leased':
+            return [_text(video_id) for video_id in self.redis.zrange(self._key('leased'), 0, -1)]
+        if state_name == 'done':
+            return [_text(video_id) for video_id in self.redis.hkeys(self._key('results'))]
+        return sorted(_text(video_id) for video_id in self.redis.smembers(self._key(state_name)))
+
+    def lease_quota(self, day, units, daily_budget):
+        return int(self.quota_script(keys=[self._key('quota:' + day)],
+                                     args=[units, daily_budget, RedisBroker.QUOTA_KEY_SECS]))
+
+    def return_quota(self, day, units):
+        self.redis.decrby(self._key('quota:' + day), units)
+
+    def exhaust_quota(self, day, daily_budget):
+        self.redis.set(self._key('quota:' + day), daily_budget, ex=RedisBroker.QUOTA_KEY_SECS)
+
+    def quota_used(self, day):
+        return int(self.redis.get(self._key('quota:' + day)) or 0)
+
+    def close(self):
+        self.redis.close()
+
+    #--------------------------------- Private Utility Methods ------------
+
+    def _key(self, name):
+        return '%s:%s' % (self.namespace, name)
+
+
+class QueueWorker(object):
+    '''
+    Leases batches of IDs from a broker, retrieves their info
+    with a YoutubeHelper, and hands the results back, until
+    the queue is empty.
+    '''
+
+    def __init__(self,
+                 broker,
+                 helper,
+                 param_arr,
+                 worker_id=None,
+                 lease_secs=None,
+                 poll_interval=1.0):
+        '''
+        :param broker: the shared queue
+        :type broker: { SqliteBroker | RedisBroker }
+        :param helper: retrieves the info; its scheduler should hold
+            the QuotaLease of the shared budget
+        :type helper: YoutubeHelper
+        :param param_arr: video info names to retrieve
+        :type param_arr: [str]
+        :param worker_id: identifies the worker; default: host, process, and a random part
+        :type worker_id: str
+        :param lease_secs: seconds a batch may take before it is handed to others
+        :type lease_secs: float
+        :param poll_interval: seconds between looks at the queue while
+            other workers hold all remaining IDs
+        :type poll_interval: float
+        '''
+        self.broker     = broker
+        self.helper     = helper
+        self.param_arr  = param_arr
+        self.worker_id  = worker_id if worker_id is not None else \
+                          '%s-%s-%s' % (socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        self.lease_secs = lease_secs if lease_secs is not None else DEFAULT_LEASE_SECS
+        self.poll_interval = poll_interval
+        self.num_done   = 0
+        self.num_errors = 0
+
+    #-----------------------
+    # run
+    #---------
+
+    def run(self, max_batches=None, wait=False):
+        '''
+        Process batches until no IDs are left, that is, until
+        none are pending, and none are leased by other workers.
+        Leases of other workers that expire are taken over.
+
+        :param max_batches: stop after this many batches; None: no limit
+        :type max_batches: int
+        :param wait: if True, keep waiting for new IDs when the
+            queue is empty, rather than returning
+        :type wait: bool
+        :returns number of videos whose info this worker stored
+        :rtype int
+        :raise QuotaExhaustedError if the quota is spent; the
+            batch in progress is returned to the queue.
+        '''
+        num_batches = 0
+        while max_batches is None or num_batches < max_batches:
+            video_ids = self.broker.lease(self.worker_id, YoutubeHelper.BULK_BATCH_SIZE, self.lease_secs)
+            if len(video_ids) == 0:
+                if not wait and self.broker.num_unfinished() == 0:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            num_batches += 1
+            self._process(video_ids)
+        return self.num_done
+
+    #--------------------------------- Private Utility Methods ------------
+
+    def _process(self, video_ids):
+        '''
+        Retrieve and store the info of one leased batch.
+        '''
+        missing_ids = []
+        try:
+            infos = list(self.helper.get_video_info_bulk(self.param_arr, video_ids, missing_ids=missing_ids))
+        except QuotaExhaustedError:
+            self.broker.release(self.worker_id, video_ids, failed=False)
+            raise
+        except Exception as e:
+            self.num_errors += 1
+            sys.stderr.write('Worker %s: batch of %s IDs failed: %s\n' % (self.worker_id, len(video_ids), e))
+            self.broker.release(self.worker_id, video_ids)
+            return
+        self.num_done += self.broker.complete(self.worker_id, infos, missing_ids)
+
+#-----------------------
+# open_broker
+#---------
+
+def open_broker(url, max_attempts=None):
+    '''
+    Open the broker at a URL: sqlite:///<path> for an
+    SqliteBroker, redis://<host>:<port>/<db> for a RedisBroker.
+
+    :param url: the broker's address
+    :type url: str
+    :param max_attempts: failed retrievals after which an ID is set aside
+    :type max_attempts: int
+    :rtype { SqliteBroker | RedisBroker }
+    :raise ValueError if the URL scheme is not supported
+    '''
+    if url.startswith('sqlite://'):
+        return SqliteBroker(url[len('sqlite://'):], max_attempts=max_attempts)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBroker(url, max_attempts=max_attempts)
+    raise ValueError("Broker URL must start with sqlite:// or redis://, not '%s'" % url)
+
+#-----------------------
+# main
+#---------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]),
+                                     formatter_class=argparse.RawTextHelpFormatter,
+                                     description='Retrieve YouTube video info with workers that share a queue.'
+                                     )
+    parser.add_argument('-b', '--broker',
+                        help='sqlite:///<path> or redis://<host>:<port>/<db>',
+                        required=True)
+    parser.add_argument('--max-attempts',
+                        type=int,
+                        help='failed retrievals after which an ID is set aside; default: %s' % DEFAULT_MAX_ATTEMPTS,
+                        default=None)
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='add video IDs to the queue')
+    enqueue_parser.add_argument('id_file',
+                                nargs='?',
+                                help='file with one video ID per line; default: stdin',
+                                default='-')
+
+    work_parser = subparsers.add_parser('work', help='retrieve info for queued IDs until none are left')
+    work_parser.add_argument('-f', '--fields',
+                             help='comma separated video info names; default: %s' %
+                                  ','.join(YoutubeHelper.DEFAULT_VIDEO_INFO),
+                             default=None)
+    work_parser.add_argument('--daily-budget',
+                             type=int,
+                             help='quota units all workers together may use per day; default: no limit',
+                             default=None)
+    work_parser.add_argument('--lease-secs',
+                             type=float,
+                             help='seconds a worker may hold a batch; default: %s' % DEFAULT_LEASE_SECS,
+                             default=None)
+    work_parser.add_argument('--wait',
+                             action='store_true',
+                             help='keep waiting for new IDs when the queue is empty')
+    work_parser.add_argument('--referer',
+                             help='referer of the API key; default: mooc-analyzer',
+                             default='mooc-analyzer')
+    work_parser.add_argument('--api-key',
+                             help='Google API key; default: contents of ~/.ssh/googleApiKey.txt',
+                             default=None)
+
+    subparsers.add_parser('status', help='print the number of IDs in each state, and today\'s shared quota use')
+
+    export_parser = subparsers.add_parser('export', help='write all results as JSON lines')
+    export_parser.add_argument('-o', '--output', help='output file; default: stdout', default=None)
+    export_parser.add_argument('--missing', help='file for IDs without info, and failed IDs', default=None)
+    args = parser.parse_args(argv)
+
+    broker = open_broker(args.broker, args.max_attempts)
+    try:
+        if args.command == 'enqueue':
+            if args.id_file == '-':
+                num_new = broker.enqueue(_id_lines(sys.stdin))
+            else:
+                with open(args.id_file, 'r') as fd:
+                    num_new = broker.enqueue(_id_lines(fd))
+            print('%s new IDs queued' % num_new)
+        elif args.command == 'work':
+            fields = args.fields.split(',') if args.fields is not None else YoutubeHelper.DEFAULT_VIDEO_INFO
+            for field in fields:
+                if field not in YoutubeHelper.video_info_names:
+                    parser.error("Unknown video info '%s'" % field)
+            quota_lease = QuotaLease(broker, args.daily_budget) if args.daily_budget is not None else None
+            helper = YoutubeHelper(referer=args.referer,
+                                   api_key=args.api_key,
+                                   scheduler=QuotaScheduler(quota_lease=quota_lease))
+            worker = QueueWorker(broker, helper, fields, lease_secs=args.lease_secs)
+            try:
+                worker.run(wait=args.wait)
+            except QuotaExhaustedError as e:
+                sys.stderr.write('%s\n' % e)
+                return 2
+            finally:
+                helper.close()
+                if quota_lease is not None:
+                    quota_lease.release()
+            print('%s videos retrieved; %s failed batches' % (worker.num_done, worker.num_errors))
+        elif args.command == 'status':
+            for (state, count) in broker.counts().items():
+                print('%-8s %s' % (state, count))
+            print('quota    %s units used today' % broker.quota_used(quota_day()))
+        else:
+            out_fd = open(args.output, 'w') if args.output is not None else sys.stdout
+            try:
+                for (_video_id, info) in broker.iter_results():
+                    out_fd.write(json.dumps(info) + '\n')
+            finally:
+                if out_fd is not sys.stdout:
+                    out_fd.close()
+            if args.missing is not None:
+                with open(args.missing, 'w') as fd:
+                    for video_id in broker.ids_in_state('missing') + broker.ids_in_state('failed'):
+                        fd.write(video_id + '\n')
+    finally:
+        broker.close()
+    return 0
+
+#--------------------------------- Private Utility Methods ------------
+
+def _id_lines(fd):
+    for line in fd:
+        video_id = line.strip()
+        if len(video_id) > 0:
+            yield video_id
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+if __name__ == '__main__':
+    sys.exit(main())
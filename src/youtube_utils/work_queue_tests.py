@@ -0,0 +1,161 @@
+'''
+Created on Oct 18, 2026
+
+@author: paepcke
+'''
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.case import skipIf
+
+from youtube_utils.mock_api import MockYoutubeServer
+from youtube_utils.quota import QuotaExhaustedError, QuotaLease, QuotaScheduler, quota_day
+from youtube_utils.work_queue import QueueWorker, SqliteBroker, main, open_broker
+from youtube_utils.youtube_utils import YoutubeHelper
+
+DO_ALL = True
+
+class WorkQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, 'queue.sqlite')
+        self.broker = SqliteBroker(self.db_path, max_attempts=2)
+
+    def tearDown(self):
+        self.broker.close()
+        shutil.rmtree(self.tmpdir)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_lease_and_complete(self):
+        self.assertEqual(self.broker.enqueue(['vid%03d' % i for i in range(120)]), 120)
+        # Already queued IDs are ignored:
+        self.assertEqual(self.broker.enqueue(['vid000', 'vid119', 'vid120']), 1)
+
+        batch1 = self.broker.lease('w1', 50)
+        batch2 = self.broker.lease('w2', 50)
+        self.assertEqual(batch1, ['vid%03d' % i for i in range(50)])
+        self.assertEqual(len(set(batch1) & set(batch2)), 0)
+
+        self.assertEqual(self.broker.complete('w1', [{'videoId' : video_id, 'n' : 1} for video_id in batch1[:-1]],
+                                              batch1[-1:]), 49)
+        # A late duplicate does not replace the first result:
+        self.assertEqual(self.broker.complete('w2', [{'videoId' : batch1[0], 'n' : 2}]), 0)
+        results = dict(self.broker.iter_results())
+        self.assertEqual(results[batch1[0]], {'videoId' : batch1[0], 'n' : 1})
+        self.assertEqual(self.broker.ids_in_state('missing'), batch1[-1:])
+        self.assertEqual(self.broker.counts(), {'pending' : 21, 'leased' : 50, 'done' : 49, 'missing' : 1, 'failed' : 0})
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_expiry_and_failure(self):
+        self.broker.enqueue(['a', 'b'])
+        self.assertEqual(self.broker.lease('w1', 50, lease_secs=0.05), ['a', 'b'])
+        self.assertEqual(self.broker.lease('w2', 50), [])
+        time.sleep(0.1)
+        # Expired leases go to the next worker:
+        self.assertEqual(self.broker.lease('w2', 50), ['a', 'b'])
+        # Releases by the former holder are ignored:
+        self.broker.release('w1', ['a', 'b'])
+        self.assertEqual(self.broker.counts()['leased'], 2)
+
+        # Unattempted batches do not count towards max_attempts:
+        self.broker.release('w2', ['a', 'b'], failed=False)
+        self.assertEqual(self.broker.lease('w2', 50), ['a', 'b'])
+        self.broker.release('w2', ['a', 'b'])
+        self.assertEqual(self.broker.counts()['failed'], 2)
+        self.assertEqual(self.broker.lease('w2', 50), [])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_quota_lease(self):
+        leases = [QuotaLease(self.broker, 250, lease_units=100) for _i in range(2)]
+        charged = 0
+        for _i in range(300):
+            for lease in leases:
+                if lease.take(1):
+                    charged += 1
+        self.assertEqual(charged, 250)
+        self.assertEqual(self.broker.quota_used(quota_day()), 250)
+        self.assertFalse(leases[0].take(1))
+
+        leases[0].give_back(3)
+        leases[0].release()
+        self.assertEqual(self.broker.quota_used(quota_day()), 247)
+        self.assertTrue(leases[1].take(3))
+
+        leases[1].exhaust()
+        self.assertEqual(self.broker.quota_used(quota_day()), 250)
+
+        scheduler = QuotaScheduler(quota_lease=QuotaLease(self.broker, 250))
+        with self.assertRaises(QuotaExhaustedError):
+            scheduler.acquire('videos.list')
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_workers(self):
+        video_ids = ['vid%03d' % i for i in range(130)] + ['missing1']
+        self.broker.enqueue(video_ids)
+        with MockYoutubeServer() as server:
+            workers = []
+            for _i in range(3):
+                helper = YoutubeHelper(referer='test',
+                                       api_key='test',
+                                       api_endpoint=server.api_endpoint,
+                                       scheduler=QuotaScheduler(quota_lease=QuotaLease(self.broker, 1000, lease_units=1)))
+                workers.append(QueueWorker(self.broker, helper, ['videoTitle', 'duration'], poll_interval=0.01))
+            threads = [threading.Thread(target=worker.run) for worker in workers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for worker in workers:
+                worker.helper.close()
+            # 131 IDs in batches of 50:
+            self.assertEqual(server.num_requests['videos.list'], 3)
+        self.assertEqual(sum(worker.num_done for worker in workers), 130)
+        results = dict(self.broker.iter_results())
+        self.assertEqual(sorted(results.keys()), video_ids[:-1])
+        self.assertEqual(results['vid001']['videoTitle'], 'Lecture vid001')
+        self.assertIsInstance(results['vid001']['duration'], int)
+        self.assertEqual(self.broker.ids_in_state('missing'), ['missing1'])
+        self.assertEqual(self.broker.quota_used(quota_day()), 3)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_shared_budget_stops_workers(self):
+        self.broker.enqueue(['vid%03d' % i for i in range(200)])
+        with MockYoutubeServer() as server:
+            with YoutubeHelper(referer='test',
+                               api_key='test',
+                               api_endpoint=server.api_endpoint,
+                               scheduler=QuotaScheduler(quota_lease=QuotaLease(self.broker, 2))) as helper:
+                worker = QueueWorker(self.broker, helper, ['videoTitle'])
+                with self.assertRaises(QuotaExhaustedError):
+                    worker.run()
+        self.assertEqual(self.broker.counts(), {'pending' : 100, 'leased' : 0, 'done' : 100, 'missing' : 0, 'failed' : 0})
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_command_line(self):
+        url = 'sqlite://' + self.db_path
+        broker = open_broker(url)
+        self.assertIsInstance(broker, SqliteBroker)
+        broker.close()
+        self.assertRaises(ValueError, open_broker, 'mysql://localhost/queue')
+        id_path = os.path.join(self.tmpdir, 'ids.txt')
+        with open(id_path, 'w') as fd:
+            fd.write('vid1\nvid2\n\nvid1\n')
+        self.assertEqual(main(['--broker', url, 'enqueue', id_path]), 0)
+        self.assertEqual(self.broker.counts()['pending'], 2)
+        self.broker.lease('w1', 50)
+        self.broker.complete('w1', [{'videoId' : 'vid1', 'videoTitle' : 'One'}], ['vid2'])
+        out_path = os.path.join(self.tmpdir, 'out.jsonl')
+        missing_path = os.path.join(self.tmpdir, 'missing.txt')
+        self.assertEqual(main(['--broker', url, 'export', '--output', out_path, '--missing', missing_path]), 0)
+        with open(out_path, 'r') as fd:
+            self.assertEqual(fd.read(), '{"videoId": "vid1", "videoTitle": "One"}\n')
+        with open(missing_path, 'r') as fd:
+            self.assertEqual(fd.read(), 'vid2\n')
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -4,20 +4,39 @@ Created on Jun 19, 2016
 @author: paepcke
 '''
 import ast
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import json
 import os
+import re
+import shutil
 import sys
+import tempfile
+import threading
+import time
 
 from googleapiclient.errors import HttpError
-import isodate
+from googleapiclient.http import MediaIoBaseDownload
+import httplib2
 
-from apiclient.discovery import build
+from apiclient.discovery import build_from_document
+
+from .coalesce import BatchCoalescer, SingleFlight
+from .columnar import ColumnarBuilder
+from .discovery import load_discovery_document
+from .durations import parse_duration
+from .metrics import Metrics
+from .quota import QuotaScheduler
+from .streaming import iter_json_items, stream_url
+from .transcode import CaptionTranscoder
 
 class CaptionFormat():
-    sbv  = 'sbv',   # SubViewer subtitle
-    scc  = 'scc',   # Scenarist Closed Caption format
-    srt  = 'srt',   # SubRip subtitle
-    ttml = 'ttml',  # Timed Text Markup Language caption
+    sbv  = 'sbv'    # SubViewer subtitle
+    scc  = 'scc'    # Scenarist Closed Caption format
+    srt  = 'srt'    # SubRip subtitle
+    ttml = 'ttml'   # Timed Text Markup Language caption
     vtt  = 'vtt'    # Web Video Text Tracks caption
+    txt  = 'txt'    # Plain text; only by local conversion, see transcode.py
     
     def __init__(self, format_str):
         self.caption_format = format_str
@@ -36,9 +55,251 @@ class CaptionFormat():
             return('Timed Text Markup Language caption')
         elif self.caption_format == 'vtt':
             return('Web Video Text Tracks caption')
+        elif self.caption_format == 'txt':
+            return('Plain text')
         else:
             raise ValueError("Unknow caption format: '%s'" % self.caption_format)
         
+class CaptionManifest(object):
+    '''
+    Record of the caption files in a directory: for each
+    file, the caption track id, the track's etag when it was
+    downloaded, and the file size. Kept in the directory 
+    itself as a log of JSON lines, one appended per file
+    written, so that recording a file costs the same however
+    many the directory holds. Later lines supersede earlier
+    ones for the same file. A line cut short by an interrupted
+    run is ignored. The log is compacted when it is opened, 
+    if most of its lines are superseded.
+    '''
+    
+    MANIFEST_NAME = '.caption_manifest.jsonl'
+    
+    def __init__(self, outdir):
+        self.outdir = outdir
+        self.manifest_path = os.path.join(outdir, CaptionManifest.MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.entries = {}
+        num_lines = 0
+        try:
+            with open(self.manifest_path, 'r') as fd:
+                for line in fd:
+                    num_lines += 1
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry.pop('file')] = entry
+                    except (ValueError, KeyError):
+                        pass
+        except IOError:
+            pass
+        if num_lines > 2 * len(self.entries) + 100:
+            self._compact()
+    
+    def is_complete(self, file_name, caption_id, etag):
+        '''
+        Return True if file_name exists, and holds the complete
+        download of the given version of the caption track.
+        '''
+        with self.lock:
+            entry = self.entries.get(file_name)
+        if entry is None or entry['captionId'] != caption_id or entry['etag'] != etag:
+            return False
+        try:
+            return os.path.getsize(os.path.join(self.outdir, file_name)) == entry['bytes']
+        except OSError:
+            return False
+    
+    def record(self, file_name, caption_id, etag, num_bytes):
+        '''
+        Note that file_name now holds the given caption track.
+        '''
+        entry = {'captionId' : caption_id,
+                 'etag'      : etag,
+                 'bytes'     : num_bytes}
+        line = json.dumps(dict(entry, file=file_name), sort_keys=True) + '\n'
+        with self.lock:
+            self.entries[file_name] = entry
+            with open(self.manifest_path, 'a') as fd:
+                fd.write(line)
+    
+    def _compact(self):
+        '''
+        Rewrite the log with one line per file, atomically.
+        '''
+        (fd, tmp_path) = tempfile.mkstemp(dir=self.outdir, prefix='.manifest', suffix='.part')
+        with os.fdopen(fd, 'w') as tmp_fd:
+            for (file_name, entry) in sorted(self.entries.items()):
+                tmp_fd.write(json.dumps(dict(entry, file=file_name), sort_keys=True) + '\n')
+        os.replace(tmp_path, self.manifest_path)
+
+class QueryPlan(object):
+    '''
+    Everything needed to request and parse one combination of
+    video info names, computed once: the part and fields 
+    parameters of the request, and a flat list of extractors.
+    Each extractor is a tuple:
+    
+        (api_name_root, api_name_leaf, user_name, converter)
+        
+    api_name_leaf is None for values at the item's top level, 
+    such as the plain video id that videos().list returns, and
+    a tuple of keys for values nested more than one level deep,
+    such as snippet/thumbnails/high/url. converter is None for 
+    values returned as the API provides them.
+    
+    The part parameter lists only the parts that hold requested
+    info, unless parts are given explicitly. That serves requests
+    whose values depend on other parts, such as etags, which
+    cover the parts requested. The fields mask selects only the requested values,
+    with values that share a parent grouped, as in
+    items(id,snippet(title,channelTitle),statistics/viewCount).
+    
+    Plans are obtained via YoutubeHelper.query_plan(), which 
+    caches them.
+    '''
+    
+    # Parts of search().list results:
+    SEARCH_PARTS = ('id', 'snippet')
+    
+    def __init__(self, param_arr, include_id=False, endpoint='videos.list', part=None):
+        '''
+        :param param_arr: user-level names of the requested info
+        :type param_arr: [str]
+        :param include_id: if True, the video id is always requested
+        :type include_id: bool
+        :param endpoint: API method the plan is for: 'videos.list' or 'search.list'
+        :type endpoint: str
+        :param part: part parameter to send; default: the parts
+            that hold the requested info
+        :type part: str
+        :raise ValueError if a requested info name does not exist, or
+            is not part of search results on a search.list plan.
+        '''
+        self.user_names = tuple(param_arr)
+        self.endpoint   = endpoint
+        
+        parts = []
+        api_names = []
+        self.extractors = []
+        if include_id and 'videoId' not in param_arr:
+            param_arr = ['videoId'] + list(param_arr)
+        for user_name in param_arr:
+            try:
+                api_name = YoutubeHelper.video_info_names[user_name]
+            except KeyError:
+                raise ValueError("Video info '%s' not supported." % user_name)
+            if '/' in api_name:
+                (api_name_root, api_name_leaf) = api_name.split('/', 1)
+                if '/' in api_name_leaf:
+                    api_name_leaf = tuple(api_name_leaf.split('/'))
+            else:
+                # Item-level values, such as the etag, need no part:
+                (api_name_root, api_name_leaf) = (api_name, None)
+            if endpoint == 'search.list' and api_name_leaf is not None and \
+               api_name_root not in QueryPlan.SEARCH_PARTS:
+                raise ValueError("Video info '%s' is not available in search results." % user_name)
+            if user_name == 'videoId' and endpoint == 'videos.list':
+                # In videos().list results the id is a plain
+                # string, not the id/videoId of search results:
+                api_name = 'id'
+                api_name_leaf = None
+            elif api_name_leaf is not None and api_name_root not in parts and api_name_root != 'id':
+                parts.append(api_name_root)
+            if api_name not in api_names:
+                api_names.append(api_name)
+                self.extractors.append((api_name_root,
+                                        api_name_leaf,
+                                        user_name,
+                                        YoutubeHelper.value_converters.get(user_name)))
+        if len(parts) == 0:
+            parts.append('id')
+        self.part = part if part is not None else ','.join(parts)
+        self.item_fields = 'items(' + QueryPlan.fields_mask(api_names) + ')'
+        # The etag allows cached responses to be revalidated:
+        self.fields = 'etag,' + self.item_fields
+        # Items cached one by one need their own etags:
+        if 'etag' in api_names:
+            self.item_etag_fields = self.fields
+        else:
+            self.item_etag_fields = 'etag,items(etag,' + QueryPlan.fields_mask(api_names) + ')'
+        
+    def parse(self, res):
+        '''
+        Turn an API result into a list of dicts that map
+        the plan's user-level info names to values. Fields the
+        API omitted from an item are omitted from its dict.
+
+        :param res: result JSON from call to YouTube V3 data API
+        :type res: { <any> }
+        :return list of dicts from info names to result values.
+        :rtype [{ str : <any> }]
+        '''
+        extractors = self.extractors
+        res_dicts = []
+        for api_res_dict in res.get('items', ()):
+            user_res_dict = {}
+            for (api_name_root, api_name_leaf, user_name, converter) in extractors:
+                try:
+                    if api_name_leaf is None:
+                        value = api_res_dict[api_name_root]
+                    elif type(api_name_leaf) is tuple:
+                        value = api_res_dict[api_name_root]
+                        for key in api_name_leaf:
+                            value = value[key]
+                    else:
+                        value = api_res_dict[api_name_root][api_name_leaf]
+                except KeyError:
+                    continue
+                if converter is not None:
+                    value = converter(value)
+                user_res_dict[user_name] = value
+            res_dicts.append(user_res_dict)
+        return res_dicts
+    
+    @staticmethod
+    def fields_mask(api_names):
+        '''
+        Combine API names into a fields mask, grouping names
+        with a common prefix: 
+        
+            ['id', 'snippet/title', 'snippet/thumbnails/high/url', 'statistics/viewCount']
+            
+        becomes
+        
+            'id,snippet(title,thumbnails/high/url),statistics/viewCount'
+        
+        :param api_names: paths of the requested values
+        :type api_names: [str]
+        :rtype str
+        '''
+        # Tree of nested dicts, in request order; leaves are None:
+        tree = {}
+        for api_name in api_names:
+            node = tree
+            path = api_name.split('/')
+            for name in path[:-1]:
+                if name in node and node[name] is None:
+                    # The whole subtree is already requested:
+                    break
+                node = node.setdefault(name, {})
+            else:
+                node[path[-1]] = None
+        return QueryPlan._mask_of(tree)
+    
+    @staticmethod
+    def _mask_of(tree):
+        specs = []
+        for (name, subtree) in tree.items():
+            # Follow single-child chains as a/b/c:
+            while subtree is not None and len(subtree) == 1:
+                (child, subtree) = next(iter(subtree.items()))
+                name = name + '/' + child
+            if subtree is None:
+                specs.append(name)
+            else:
+                specs.append('%s(%s)' % (name, QueryPlan._mask_of(subtree)))
+        return ','.join(specs)
+
 
 class YoutubeHelper(object):
     '''
@@ -60,8 +321,12 @@ class YoutubeHelper(object):
     '''
 
     # Video info clients can ask for, and the necessary
-    # fields definitions as understood by the YouTube API V3.
-    # To extend, just add key-value pairs:
+    # fields definitions as understood by the YouTube API V3:
+    # <part>/<field>, with deeper paths for nested values.
+    # Values of fields that are only visible to a video's
+    # owner (fileDetails, processingDetails, suggestions) are
+    # not included. To extend, call register_video_info(), 
+    # which keeps the derived lookup structures below consistent:
     
     video_info_names = {
                         'channelTitle' : 'snippet/channelTitle', 
@@ -70,12 +335,139 @@ class YoutubeHelper(object):
                         'videoId'      : 'id/videoId',
                         'captionsAvailable' : 'contentDetails/caption',
                         'duration'     : 'contentDetails/duration',
-                        'description'  : 'snippet/description'
+                        'description'  : 'snippet/description',
+                        'etag'         : 'etag',
+                        
+                        # snippet:
+                        'channelId'        : 'snippet/channelId',
+                        'tags'             : 'snippet/tags',
+                        'categoryId'       : 'snippet/categoryId',
+                        'liveBroadcastContent' : 'snippet/liveBroadcastContent',
+                        'defaultLanguage'  : 'snippet/defaultLanguage',
+                        'defaultAudioLanguage' : 'snippet/defaultAudioLanguage',
+                        'localizedTitle'   : 'snippet/localized/title',
+                        'thumbnailUrl'     : 'snippet/thumbnails/default/url',
+                        'thumbnailHighUrl' : 'snippet/thumbnails/high/url',
+                        
+                        # contentDetails:
+                        'dimension'        : 'contentDetails/dimension',
+                        'definition'       : 'contentDetails/definition',
+                        'licensedContent'  : 'contentDetails/licensedContent',
+                        'projection'       : 'contentDetails/projection',
+                        'regionAllowed'    : 'contentDetails/regionRestriction/allowed',
+                        'regionBlocked'    : 'contentDetails/regionRestriction/blocked',
+                        'ytRating'         : 'contentDetails/contentRating/ytRating',
+                        
+                        # status:
+                        'uploadStatus'     : 'status/uploadStatus',
+                        'privacyStatus'    : 'status/privacyStatus',
+                        'license'          : 'status/license',
+                        'embeddable'       : 'status/embeddable',
+                        'publicStatsViewable' : 'status/publicStatsViewable',
+                        'madeForKids'      : 'status/madeForKids',
+                        
+                        # statistics:
+                        'viewCount'        : 'statistics/viewCount',
+                        'likeCount'        : 'statistics/likeCount',
+                        'favoriteCount'    : 'statistics/favoriteCount',
+                        'commentCount'     : 'statistics/commentCount',
+                        
+                        # topicDetails:
+                        'topicCategories'  : 'topicDetails/topicCategories',
+                        
+                        # recordingDetails:
+                        'recordingDate'    : 'recordingDetails/recordingDate',
+                        
+                        # liveStreamingDetails:
+                        'actualStartTime'  : 'liveStreamingDetails/actualStartTime',
+                        'actualEndTime'    : 'liveStreamingDetails/actualEndTime',
+                        'scheduledStartTime' : 'liveStreamingDetails/scheduledStartTime',
+                        'concurrentViewers'  : 'liveStreamingDetails/concurrentViewers',
+                        
+                        # player:
+                        'embedHtml'        : 'player/embedHtml'
+                        }
+    
+    # Info returned where callers ask for "all" info, such as
+    # by bulk_enrich without --fields. Requesting every entry
+    # of video_info_names would fetch seven parts:
+    DEFAULT_VIDEO_INFO = ['videoTitle', 'channelTitle', 'pubDate', 'videoId',
+                          'captionsAvailable', 'duration', 'description']
+    
+    # Reverse of video_info_names:
+    api_info_names = {api_name : user_name for (user_name, api_name) in video_info_names.items()}
+    
+    # Functions applied to raw API values before they are
+    # returned. Values without an entry are returned as
+    # the API provides them. The API returns counts as
+    # strings, because they may exceed 32 bits:
+    value_converters = {
+                        'duration'      : parse_duration,
+                        'viewCount'     : int,
+                        'likeCount'     : int,
+                        'favoriteCount' : int,
+                        'commentCount'  : int,
+                        'concurrentViewers' : int
                         }
+    
+    # QueryPlan instances, keyed by tuple of requested
+    # info names, include_id flag, and endpoint:
+    query_plans = {}
+
+    # Maximum number of video IDs the API accepts
+    # in a single videos().list request:
+    BULK_BATCH_SIZE = 50
+    
+    # Bytes requested at a time when streaming
+    # caption files to disk:
+    MEDIA_CHUNK_SIZE = 1024 * 1024
+    
+    # Number of threads used by the concurrent
+    # methods, unless specified in __init__():
+    DEFAULT_NUM_WORKERS = 8
 
-    def __init__(self, referer=None, api_key=None):
+    def __init__(self, 
+                 referer=None, 
+                 api_key=None, 
+                 cache=None, 
+                 num_workers=None, 
+                 scheduler=None, 
+                 http=None,
+                 coalesce_window=None,
+                 api_endpoint=None,
+                 metrics=None):
         '''
         Constructor
+        
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param api_key: Google API key; default: contents of ~/.ssh/googleApiKey.txt
+        :type api_key: str
+        :param cache: optional store for API responses, which are then
+            reused until they expire, and revalidated via their etag after that.
+        :type cache: MetadataCache
+        :param num_workers: number of threads used by the *_concurrent() methods
+        :type num_workers: int
+        :param scheduler: paces requests, tracks the daily quota budget, and 
+            retries transient errors. Share one scheduler among all helpers
+            that use the same API key. Default: a scheduler that retries, 
+            but neither limits the rate nor tracks a budget.
+        :type scheduler: QuotaScheduler
+        :param http: transport for all requests, such as a PooledHttp, which
+            may be shared among helpers. Default: one httplib2.Http per thread.
+        :type http: { PooledHttp | httplib2.Http }
+        :param coalesce_window: if provided, get_video_info() calls from different
+            threads that arrive within this many seconds of each other are
+            merged into one batched request. Suits services with bursty
+            load; each call waits up to the window before its request is sent.
+        :type coalesce_window: float
+        :param api_endpoint: base URL of the API, such as that of a proxy, or
+            of a MockYoutubeServer; default: Google's
+        :type api_endpoint: str
+        :param metrics: if provided, records request latencies, wait times,
+            bytes, quota units, retries, cache lookups, and parse times.
+            May be shared among helpers.
+        :type metrics: Metrics
         '''
         # Look for Google API Key, if necessary:
         if api_key is None:
@@ -90,11 +482,123 @@ class YoutubeHelper(object):
             self.api_key = api_key
                  
         self.referer = referer                 
-        self.service = build('youtube', 'v3', developerKey = api_key)
+        self.cache   = cache
+        self.num_workers = num_workers if num_workers is not None else YoutubeHelper.DEFAULT_NUM_WORKERS
+        self.scheduler   = scheduler if scheduler is not None else QuotaScheduler()
+        self.http        = http
+        self.api_endpoint = api_endpoint
+        self.metrics     = metrics
+        
+        # Service objects are not thread safe. Each thread
+        # therefore gets its own, built on first use, so
+        # that construction of a helper is cheap:
+        self.thread_local = threading.local()
+        self.executor = None
+        self.executor_lock = threading.Lock()
+        self.caption_manifests = {}
+        
+        # Identical concurrent requests share one call:
+        self.single_flight = SingleFlight()
+        self.coalescer = None
+        if coalesce_window is not None:
+            self.coalescer = BatchCoalescer(self._coalesced_video_items,
+                                            coalesce_window,
+                                            YoutubeHelper.BULK_BATCH_SIZE)
+        
+    #-----------------------
+    # preload_discovery
+    #---------
+    
+    @classmethod
+    def preload_discovery(cls, http=None):
+        '''
+        Load and parse the API's discovery document now, rather
+        than when the first service object is built. Call this 
+        before forking worker processes, so that they all share 
+        the parent's parsed copy.
+        
+        :param http: transport used if the document must be fetched
+        :type http: { PooledHttp | httplib2.Http }
+        '''
+        load_discovery_document(http)
+        
+    #-----------------------
+    # service
+    #---------
+    
+    @property
+    def service(self):
+        '''
+        The calling thread's YouTube service object.
+        '''
+        try:
+            return self.thread_local.service
+        except AttributeError:
+            self.thread_local.service = self._build_service()
+            return self.thread_local.service
 
     #--------------------------------- Public Methods ------------    
 
   
+    #-----------------------
+    # register_video_info
+    #---------
+    
+    @classmethod
+    def register_video_info(cls, user_name, api_name, converter=None):
+        '''
+        Make an additional piece of video info available to
+        get_video_info() and friends.
+        
+        Example:
+            YoutubeHelper.register_video_info('localizedDescription', 'snippet/localized/description')
+        
+        :param user_name: name under which clients request the info
+        :type user_name: str
+        :param api_name: location of the info in API results, as <part>/<field>,
+            or <part>/<field>/.../<field> for nested values
+        :type api_name: str
+        :param converter: function applied to the API's value before returning it
+        :type converter: callable
+        '''
+        cls.video_info_names[user_name] = api_name
+        cls.api_info_names[api_name] = user_name
+        if converter is not None:
+            cls.value_converters[user_name] = converter
+        else:
+            cls.value_converters.pop(user_name, None)
+        cls.query_plans.clear()
+    
+    #-----------------------
+    # query_plan
+    #---------
+    
+    @classmethod
+    def query_plan(cls, param_arr, include_id=False, endpoint='videos.list', part=None):
+        '''
+        Return the QueryPlan for a combination of requested
+        video info names, creating it on first request.
+        
+        :param param_arr: user-level names of the requested info
+        :type param_arr: [str]
+        :param include_id: if True, the video id is always requested
+        :type include_id: bool
+        :param endpoint: API method the plan is for: 'videos.list' or 'search.list'
+        :type endpoint: str
+        :param part: part parameter to send; default: the parts
+            that hold the requested info
+        :type part: str
+        :rtype QueryPlan
+        :raise ValueError if a requested info name does not exist.
+        '''
+        key = (tuple(param_arr), include_id, endpoint, part)
+        try:
+            return cls.query_plans[key]
+        except KeyError:
+            plan = QueryPlan(param_arr, include_id, endpoint, part)
+            cls.query_plans[key] = plan
+            return plan
+    
     #-----------------------
     # get_video_info
     #---------
@@ -121,6 +625,10 @@ class YoutubeHelper(object):
         Callers can obtain a user-readable string (H:MM:SS) via str(duration), or
         the number of seconds as duration.total_seconds().               
         
+        Concurrent calls for the same video and info share one request.
+        If the helper was created with a coalesce_window, concurrent calls
+        for different videos are merged into batched requests as well.
+        
         :param param_arr: individual result field, or array of multiple fields
         :type param_arr: { str | [str] }
         :param video_id: YouTube id of video
@@ -141,227 +649,1661 @@ class YoutubeHelper(object):
             else:
                 raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
         
-        content_details_required = False
-        snippet_required = False
+        plan = self.query_plan(param_arr)
         
-        for info_req in param_arr:
-            try:
-                if YoutubeHelper.video_info_names[info_req].startswith('contentDetails/'):
-                    content_details_required = True
-                else:
-                    snippet_required = True
-            except KeyError:
-                raise ValueError("Video info '%s' not supported." % info_req)
-
-        parts = []
-        if snippet_required:
-            parts.append('snippet')
-        if content_details_required:
-            parts.append('contentDetails')
-        part = ','.join(parts)
-            
-        field_list = []
-        for info_request in param_arr:
-            field_list.append(YoutubeHelper.video_info_names[info_request])
-        fields = 'items(' + ','.join(field_list) + ')'
+        if self.coalescer is not None:
+            id_plan = self.query_plan(param_arr, include_id=True)
+            item = self.coalescer.get((id_plan.fields, referer), (id_plan, referer), video_id)
+            return self.parse_api_result({'items' : [item] if item is not None else []}, plan)
         
-        req = self.service.videos().list(part=part,
-                                         fields=fields,
-                                         id=video_id,
-                                         key=self.api_key)
-        req.headers['referer'] = self.referer
-        res = req.execute()
+        res = self.single_flight.do(('videos.list', plan.part, plan.fields, video_id, referer),
+                                    lambda: self._video_info_single(video_id, plan, referer))
         
-        user_res_dict = self.parse_api_result(res)
+        user_res_dict = self.parse_api_result(res, plan)
         return(user_res_dict)
             
 
     #-----------------------
-    # get_caption_files 
+    # get_video_info_bulk
     #---------
-    
-    def get_caption_files(self, video_id, caption_format=None, outdir=None, file_prefix=None, referer=None):
+
+    def get_video_info_bulk(self, param_arr, video_ids, referer=None, missing_ids=None):
+        '''
+        Like get_video_info(), but for any number of videos. The
+        video IDs may be any iterable, including a generator. They
+        are sent to the API in batches of BULK_BATCH_SIZE (50, the
+        maximum the videos().list endpoint accepts), so 10,000 videos 
+        cost 200 requests instead of 10,000.
         
-        caption_ids = self.get_caption_file_ids(video_id, referer=referer)
-        if len(caption_ids) == 0:
-            return(None)
+        Results are yielded one dict per video as each batch arrives,
+        in the order of the input IDs. Each dict always contains
+        'videoId', whether or not it was requested, so that results 
+        can be matched back to their inputs.
+        
+        IDs for which the API returns nothing (deleted, private, or
+        misspelled videos) are not yielded. If a list is passed in 
+        missing_ids, those IDs are appended to it.
+        
+        Example:
+              missing = []
+              for info in helper.get_video_info_bulk(['duration'], id_file_lines, missing_ids=missing):
+                  print(info['videoId'], info['duration'])
 
+        :param param_arr: individual result field, or array of multiple fields
+        :type param_arr: { str | [str] }
+        :param video_ids: YouTube ids of videos
+        :type video_ids: iterable of str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param missing_ids: optional list to which unknown or private IDs are appended
+        :type missing_ids: [str]
+        :returns generator of result dicts
+        :rtype { str : str }
+        :raise ValueError if no referer found, or if requested return field does not exist.
+        '''
+        if not isinstance(param_arr, (list, tuple)):
+            param_arr = [param_arr]
+        if len(param_arr) == 0:
+            return
+        
         if referer is None:
             if self.referer is not None:
                 referer = self.referer
             else:
                 raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
-
-        for caption_id in caption_ids:
-            if caption_format is None:
-                req = self.service.captions().download(id=caption_id,
-    			                                       key=self.api_key)
-            else:
-                req = self.service.captions().download(id=caption_id,
-                                                       tfmt=caption_format,
-    			                                       key=self.api_key)
-                         
-        req.headers['referer'] = referer
-        try:
-            api_res_dict = req.execute()
-        except HttpError as e:
-            raise ValueError('Error downloading caption files: %s' % self.msg_from_http_error(e))
         
-        print(api_res_dict)
-    
+        # The id is needed to match results to inputs,
+        # so always ask for it:
+        plan = self.query_plan(param_arr, include_id=True)
+        
+        for batch in self._batches(video_ids):
+            for info in self._video_info_batch(batch, plan, referer, missing_ids):
+                yield info
+
     #-----------------------
-    # get_caption_file_ids 
+    # iter_video_info_stream
     #---------
 
-    def get_caption_file_ids(self, video_id,  referer=None):
+    def iter_video_info_stream(self, param_arr, video_ids, referer=None, missing_ids=None, description_sink=None):
         '''
-        Given a YouTube video id, retrieve the caption 
-        file IDs, if captions exist.
+        Like get_video_info_bulk(), but memory use does not grow
+        with the size of the responses: the items of each response
+        are parsed as its bytes arrive, and are yielded one at a
+        time. The whole response body is never held. Videos are 
+        yielded in the order the API returns them.
         
-        The raw API return is this; the method returns a simple
-        list of values in the items' id fields:
-        {
-           u'items':[
-              {
-                 u'kind':u'youtube#caption',
-                 u'etag':u'"5g01s4-wS2b4VpScndqCYc5Y-8k/a10fXTkUBDTu9gCLrZfjQStUo1M"',
-                 u'id':u'vXlAeY5R6WE56Q3S2cb9b3agjQid8jSC-lwrvGWboh0='
-              },
-              {
-                 u'kind':u'youtube#caption',
-                 u'etag':u'"5g01s4-wS2b4VpScndqCYc5Y-8k/N0UIGw0FX2himVFG0fxbKXfwekQ"',
-                 u'id':u'5-c6BoK6O8gJmY_liC5y-YRPso9GpV47'
-              }
-           ],
-           u'kind':u'youtube#captionListResponse',
-           u'etag':u'"5g01s4-wS2b4VpScndqCYc5Y-8k/QuU60LZawWZmh79BRJ1QXGWpxsI"'
-        }
-
-        :param video_id: YouTube video id
-        :type video_id: str
+        Descriptions are by far the largest values. If a
+        description_sink is provided, and 'description' is
+        requested, each description is handed to the sink as
+        description_sink(video_id, description), and is removed
+        from the yielded dict. A streaming.DescriptionFiles
+        instance writes them to files; the add_description()
+        method of a text_index.CaptionIndex indexes them.
+        
+        Responses are neither taken from nor stored in the cache.
+        The helper's http should be a PooledHttp; with any other
+        transport the responses are streamed over a new connection
+        per request. Requests are retried by the scheduler until
+        their response starts to arrive; a connection that breaks
+        after that raises ConnectionError. Items are parsed with 
+        ijson if it is installed, else with a built-in scanner.
+        
+        :param param_arr: individual result field, or array of multiple fields
+        :type param_arr: { str | [str] }
+        :param video_ids: YouTube ids of videos
+        :type video_ids: iterable of str
         :param referer: one of the referer strings associated with the API
         :type referer: str
-        :returns list of caption file ids
-        :rtype [ str ]
-       '''
-
+        :param missing_ids: optional list to which unknown or private IDs are appended
+        :type missing_ids: [str]
+        :param description_sink: optional callable that receives descriptions
+        :type description_sink: callable
+        :returns generator of result dicts, which always include videoId
+        :rtype { str : str }
+        :raise ValueError if no referer found, if requested return field 
+            does not exist, or if a request fails
+        '''
+        if not isinstance(param_arr, (list, tuple)):
+            param_arr = [param_arr]
+        if len(param_arr) == 0:
+            return
+        
         if referer is None:
             if self.referer is not None:
                 referer = self.referer
             else:
                 raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
-
         
-        req = self.service.captions().list(part='id',
-                                           videoId=video_id,
-			                               key=self.api_key)             
-        req.headers['referer'] = referer
-        api_res_dict = req.execute()
-        caption_ids = [] 
-        for caption_id_item in api_res_dict['items']:
-            caption_ids.append(caption_id_item['id'])
-        return(caption_ids)
-    
+        plan = self.query_plan(param_arr, include_id=True)
+        
+        for batch in self._batches(video_ids):
+            req = self.service.videos().list(part=plan.part,
+                                             fields=plan.fields,
+                                             id=','.join(batch),
+                                             key=self.api_key)
+            try:
+                items = self._stream_items(req, 'videos.list', referer)
+            except HttpError as e:
+                raise ValueError('Error retrieving video info: %s' % self.msg_from_http_error(e))
+            found_ids = set()
+            for item in items:
+                found_ids.add(item['id'])
+                # Only one item is parsed at a time:
+                info = self.parse_api_result({'items' : [item]}, plan)[0]
+                if description_sink is not None and 'description' in info:
+                    description_sink(info['videoId'], info.pop('description'))
+                yield info
+            if missing_ids is not None:
+                missing_ids.extend(video_id for video_id in batch if video_id not in found_ids)
+
     #-----------------------
-    # search_metadata 
+    # get_video_info_columnar
     #---------
     
-    def search_metadata(self, search_terms, return_fields=None, max_results=None, referer=None):
-
+    def get_video_info_columnar(self, param_arr, video_ids, referer=None, missing_ids=None, concurrent=False):
+        '''
+        Like get_video_info_bulk(), but returns a ColumnarResult:
+        one typed NumPy array per field, rather than one dict per 
+        video. Durations are int64 seconds, captionsAvailable is
+        bool, and pubDate is datetime64. Rows are in the order of
+        video_ids, minus the missing IDs. The videoId column is 
+        always included. Requires NumPy.
+        
+        :param param_arr: individual result field, or array of multiple fields
+        :type param_arr: { str | [str] }
+        :param video_ids: YouTube ids of videos
+        :type video_ids: iterable of str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param missing_ids: optional list to which unknown or private IDs are appended
+        :type missing_ids: [str]
+        :param concurrent: if True, batches are retrieved on the thread pool
+        :type concurrent: bool
+        :returns the table of results
+        :rtype ColumnarResult
+        :raise ValueError if no referer found, or if requested return field does not exist.
+        :raise ImportError if NumPy is not installed
+        '''
+        if not isinstance(param_arr, (list, tuple)):
+            param_arr = [param_arr]
+        
         if referer is None:
             if self.referer is not None:
                 referer = self.referer
             else:
                 raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
-            
-        if max_results is not None and type(max_results) != 'int':
-            raise ValueError("Maximum number of results must be an integer, was '%s'" % max_results)
-        
-        if type(search_terms) == 'list':
-            search_terms = ','.join(search_terms)
-         
-        if return_fields is not None:
-            api_fields = []
-            if not type(return_fields) == 'list':
-                return_fields = [return_fields]
-            for ret_field in return_fields:
-                try:
-                    api_fields.append(YoutubeHelper.video_info_names[ret_field])
-                except KeyError:
-                    raise ValueError ("Legal field names are %s, not '%s'" % (YoutubeHelper.video_info_names.keys(), ret_field))
-            field_spec = 'items(' + ','.join(api_fields) + ')'
-        
-        kwargs = {'part' : 'id,snippet',
-                  'q' : search_terms,
-                  'key' : self.api_key}
-        if max_results is not None:
-            kwargs['maxResults'] = max_results
-        if return_fields is not None:
-            kwargs['fields'] = field_spec
         
-        req = self.service.search().list(**kwargs)
-            
-        req.headers['referer'] = referer
-        try:
-            res = req.execute()
-        except HttpError as e:
-            raise ValueError('Error downloading caption files: %s' % self.msg_from_http_error(e))
+        plan = self.query_plan(param_arr, include_id=True)
+        builder = ColumnarBuilder(plan)
+        batch_args = ((batch, plan, referer, missing_ids) for batch in self._batches(video_ids))
+        if concurrent:
+            items_iter = self.map_concurrent(self._video_info_items, batch_args)
+        else:
+            items_iter = (self._video_info_items(*args) for args in batch_args)
+        for items in items_iter:
+            builder.add_items(items)
+        return builder.finish()
 
-        return self.parse_api_result(res)
-    
-    #--------------------------------- Private Utility Methods ------------    
-    
-    
     #-----------------------
-    # parse_api_result 
+    # get_video_info_concurrent
     #---------
-
-    def parse_api_result(self, res):
+    
+    def get_video_info_concurrent(self, param_arr, video_ids, referer=None, missing_ids=None):
         '''
-        Given a return JSON structure from the YouTube API,
-        create a simple dict that maps keys from the video_info_names
-        dict to their corresponding values in the result.
-        
-        For one snippet-info only, should get something like:
-          {u'items': [{u'snippet': {u'channelTitle': u'StatsSpring2013'}}]}
+        Like get_video_info_bulk(), but with up to num_workers
+        batches of BULK_BATCH_SIZE videos in flight at once.
+        Results are still yielded in the order of video_ids.
+        IDs are consumed lazily, so video_ids may be a generator 
+        over millions of IDs. 
         
-        For one contentDetails-info only:
-          {u'items': [{u'contentDetails': {u'caption': u'true'}}]}
+        :param param_arr: individual result field, or array of multiple fields
+        :type param_arr: { str | [str] }
+        :param video_ids: YouTube ids of videos
+        :type video_ids: iterable of str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param missing_ids: optional list to which unknown or private IDs are appended
+        :type missing_ids: [str]
+        :returns generator of result dicts
+        :rtype { str : str }
+        :raise ValueError if no referer found, or if requested return field does not exist.
+        '''
+        if not isinstance(param_arr, (list, tuple)):
+            param_arr = [param_arr]
+        if len(param_arr) == 0:
+            return
         
-        For multiple snippet-info items, should get something like:
-          {u'items': [{u'snippet': {u'channelTitle': u'StatsSpring2013', u'title': u'Unit 1 Module 5 part 1'}}]}
+        if referer is None:
+            if self.referer is not None:
+                referer = self.referer
+            else:
+                raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
         
-        For multiple contentDetails-info items, should get something like:
-          {u'items': [{u'contentDetails': {u'duration': u'PT11M2S', u'caption': u'true'}}]}
+        plan = self.query_plan(param_arr, include_id=True)
         
-        For multiple snippet+contentDetails-info items, should get something like:
-          {u'items': [{u'snippet': {u'channelTitle': u'StatsSpring2013',
-                                    u'title': u'Unit 1 Module 5 part 1'},
+        for batch_res in self.map_concurrent(self._video_info_batch,
+                                             ((batch, plan, referer, missing_ids)
+                                              for batch in self._batches(video_ids))):
+            for info in batch_res:
+                yield info
+
+    #-----------------------
+    # get_caption_file_ids_concurrent
+    #---------
+    
+    def get_caption_file_ids_concurrent(self, video_ids, referer=None):
+        '''
+        Retrieve the caption file IDs of many videos, with up
+        to num_workers requests in flight at once. Yields
+        (video_id, [caption_id, ...]) tuples in the order of
+        video_ids.
+        
+        :param video_ids: YouTube ids of videos
+        :type video_ids: iterable of str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :returns generator of video id and caption id lists
+        :rtype (str, [str])
+        '''
+        video_ids = list(video_ids)
+        res_iter = self.map_concurrent(self.get_caption_file_ids,
+                                       ((video_id,) for video_id in video_ids),
+                                       referer=referer)
+        for (video_id, caption_ids) in zip(video_ids, res_iter):
+            yield (video_id, caption_ids)
+
+    #-----------------------
+    # submit
+    #---------
+    
+    def submit(self, method, *args, **kwargs):
+        '''
+        Run method(*args, **kwargs) on one of the helper's worker
+        threads. Any public method of this class may be passed,
+        for example:
+        
+            future = helper.submit(helper.get_video_info, ['duration'], 'hlFeEQF5tDc')
+            ...
+            info = future.result()
+        
+        :param method: callable to run
+        :type method: callable
+        :returns future for the method's result
+        :rtype concurrent.futures.Future
+        '''
+        return self._get_executor().submit(method, *args, **kwargs)
+
+    #-----------------------
+    # map_concurrent
+    #---------
+    
+    def map_concurrent(self, method, arg_tuples, **kwargs):
+        '''
+        Call method(*arg_tuple, **kwargs) for each arg_tuple, with
+        up to num_workers calls running at once. Results are yielded
+        in the order of arg_tuples. Only a bounded number of calls
+        are scheduled ahead of the caller, so arg_tuples may be a 
+        long generator. Exceptions are raised when the result of 
+        the failed call is reached.
+        
+        Example: download captions of many videos:
+            for res in helper.map_concurrent(helper.get_caption_files, [(vid,) for vid in vids]):
+                ...
+        
+        :param method: callable to run
+        :type method: callable
+        :param arg_tuples: positional arguments for each call
+        :type arg_tuples: iterable of tuples
+        :returns generator of method results
+        :rtype <any>
+        '''
+        executor = self._get_executor()
+        max_in_flight = 2 * self.num_workers
+        in_flight = deque()
+        for arg_tuple in arg_tuples:
+            in_flight.append(executor.submit(method, *arg_tuple, **kwargs))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+        while len(in_flight) > 0:
+            yield in_flight.popleft().result()
+
+    #-----------------------
+    # close
+    #---------
+    
+    def close(self):
+        '''
+        Shut down the worker threads, if any were started.
+        '''
+        with self.executor_lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    #-----------------------
+    # get_video_etags
+    #---------
+    
+    def get_video_etags(self, video_ids, param_arr=None, referer=None):
+        '''
+        Return the current etag of each video, as an inexpensive
+        way to find out whether a video changed since an earlier 
+        retrieval. Etags are requested with the parts needed for 
+        param_arr, but without any of those parts' fields, so 
+        responses are tiny. Costs one quota unit per 50 videos.
+        Etags are only comparable between calls with the same
+        param_arr.
+        
+        :param video_ids: YouTube ids of videos
+        :type video_ids: iterable of str
+        :param param_arr: info names whose parts determine the etag; 
+            default: DEFAULT_VIDEO_INFO
+        :type param_arr: [str]
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :returns video id to etag, for all videos the API returned
+        :rtype { str : str }
+        '''
+        if referer is None:
+            if self.referer is not None:
+                referer = self.referer
+            else:
+                raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
+        if param_arr is None:
+            param_arr = YoutubeHelper.DEFAULT_VIDEO_INFO
+        
+        # Etags cover the parts requested, so the etag-only
+        # request asks for those of param_arr:
+        etag_plan = self.query_plan(['etag'], include_id=True, part=self.query_plan(param_arr).part)
+        
+        etags = {}
+        for batch in self._batches(video_ids):
+            # Cached etags would hide changes:
+            for item in self._video_info_items(batch, etag_plan, referer, use_cache=False):
+                etags[item['id']] = item['etag']
+        return etags
+
+    #-----------------------
+    # get_uploads_playlist_id
+    #---------
+    
+    def get_uploads_playlist_id(self, channel_id, referer=None):
+        '''
+        Return the id of the playlist that holds all uploads
+        of a channel.
+        
+        :param channel_id: YouTube channel id
+        :type channel_id: str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :returns the playlist id
+        :rtype str
+        :raise ValueError if the channel does not exist
+        '''
+        if referer is None:
+            if self.referer is not None:
+                referer = self.referer
+            else:
+                raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
+        
+        fields = 'etag,items(contentDetails/relatedPlaylists/uploads)'
+        req = self.service.channels().list(part='contentDetails',
+                                           id=channel_id,
+                                           fields=fields,
+                                           key=self.api_key)
+        try:
+            res = self._execute_request(req,
+                                        'channels.list',
+                                        referer,
+                                        cache_key=self._cache_key('channels.list', 'contentDetails', fields, channel_id))
+        except HttpError as e:
+            raise ValueError('Error retrieving channel: %s' % self.msg_from_http_error(e))
+        items = res.get('items', [])
+        if len(items) == 0:
+            raise ValueError("Channel '%s' not found." % channel_id)
+        return items[0]['contentDetails']['relatedPlaylists']['uploads']
+
+    #-----------------------
+    # iter_playlist_items
+    #---------
+    
+    def iter_playlist_items(self, playlist_id, referer=None):
+        '''
+        Generator over the videos in a playlist. Yields dicts
+        with the 'videoId' and 'videoPublishedAt' of each video.
+        Pages of 50 are requested as the caller consumes them,
+        so a caller may stop early at no further cost. For a 
+        channel's uploads playlist, the newest videos come first.
+        
+        :param playlist_id: YouTube playlist id
+        :type playlist_id: str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :returns generator of video ids and publication times
+        :rtype { str : str }
+        '''
+        if referer is None:
+            if self.referer is not None:
+                referer = self.referer
+            else:
+                raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
+        
+        kwargs = {'part' : 'contentDetails',
+                  'playlistId' : playlist_id,
+                  'maxResults' : YoutubeHelper.BULK_BATCH_SIZE,
+                  'fields' : 'nextPageToken,items(contentDetails(videoId,videoPublishedAt))',
+                  'key' : self.api_key}
+        while True:
+            req = self.service.playlistItems().list(**kwargs)
+            try:
+                # Not cached: new uploads must show up:
+                res = self._execute_request(req, 'playlistItems.list', referer)
+            except HttpError as e:
+                raise ValueError('Error retrieving playlist items: %s' % self.msg_from_http_error(e))
+            for item in res.get('items', []):
+                yield {'videoId' : item['contentDetails']['videoId'],
+                       'videoPublishedAt' : item['contentDetails'].get('videoPublishedAt')}
+            if res.get('nextPageToken') is None or len(res.get('items', [])) == 0:
+                return
+            kwargs['pageToken'] = res['nextPageToken']
+
+    #-----------------------
+    # get_caption_files 
+    #---------
+    
+    def get_caption_files(self, video_id, caption_format=None, outdir=None, file_prefix=None, referer=None,
+                          transcoder=None):
+        '''
+        Download all caption tracks of a video into files named
+        <file_prefix><video_id>_<language>.<format>. Named tracks get
+        _<name> after the language, so that tracks in the same
+        language do not overwrite each other. Automatic speech
+        recognition tracks get an additional _asr before the 
+        extension. Without caption_format, tracks are stored
+        in the format they were uploaded in, with extension 'orig'. 
+        
+        Bytes are streamed to a temporary file that is renamed
+        once complete, so files in outdir are never partial. Each 
+        outdir holds a manifest of the tracks downloaded into it. 
+        Tracks whose file exists and matches the manifest entry's 
+        caption etag and size are not downloaded again.
+        
+        With a transcoder, captions are not converted by the API.
+        Each track is downloaded once in its native format into the
+        transcoder's cache, and converted locally into any format,
+        including plain text ('txt'). Further formats of the same 
+        track version then cost no quota.
+        
+        :param video_id: YouTube video id
+        :type video_id: str
+        :param caption_format: format into which the captions are converted
+        :type caption_format: { None | str | CaptionFormat }
+        :param outdir: directory for the caption files; default: current directory
+        :type outdir: str
+        :param file_prefix: string prepended to each file name
+        :type file_prefix: str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param transcoder: cache of native tracks, and converter
+        :type transcoder: CaptionTranscoder
+        :returns None if the video has no captions, else the caption file paths
+        :rtype { None | [str] }
+        :raise ValueError if no referer found, or if a download fails.
+        '''
+        if referer is None:
+            if self.referer is not None:
+                referer = self.referer
+            else:
+                raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
+
+        tracks = self.get_caption_tracks(video_id, referer=referer)
+        if len(tracks) == 0:
+            return(None)
+
+        return [self._download_caption_track(video_id, track, caption_format, outdir, file_prefix, referer, transcoder)
+                for track in tracks]
+    
+    #-----------------------
+    # get_caption_files_concurrent
+    #---------
+    
+    def get_caption_files_concurrent(self, video_ids, caption_format=None, outdir=None, file_prefix=None, referer=None,
+                                     transcoder=None):
+        '''
+        Like get_caption_files(), but for many videos, with up
+        to num_workers track listings or track downloads in flight 
+        at once. Tracks of all videos are downloaded in parallel,
+        not just the videos. Yields (video_id, file_path) tuples 
+        in the order of video_ids. Videos without captions yield
+        nothing.
+        
+        :param video_ids: YouTube ids of videos
+        :type video_ids: iterable of str
+        :param caption_format: format into which the captions are converted
+        :type caption_format: { None | str | CaptionFormat }
+        :param outdir: directory for the caption files; default: current directory
+        :type outdir: str
+        :param file_prefix: string prepended to each file name
+        :type file_prefix: str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param transcoder: cache of native tracks, and converter; conversions
+            run in its process pool
+        :type transcoder: CaptionTranscoder
+        :returns generator of video ids and caption file paths
+        :rtype (str, str)
+        :raise ValueError if no referer found, or if a download fails.
+        '''
+        if referer is None:
+            if self.referer is not None:
+                referer = self.referer
+            else:
+                raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
+        
+        video_ids = list(video_ids)
+        tracks_iter = self.map_concurrent(self.get_caption_tracks,
+                                          ((video_id,) for video_id in video_ids),
+                                          referer=referer)
+        download_args = ((video_id, track, caption_format, outdir, file_prefix, referer, transcoder)
+                         for (video_id, tracks) in zip(video_ids, tracks_iter)
+                         for track in tracks)
+        # Both stages share the thread pool; track listings
+        # are requested as the downloads consume them:
+        for (video_id, file_path) in self.map_concurrent(self._download_caption_track_with_id, download_args):
+            yield (video_id, file_path)
+    
+    #-----------------------
+    # get_caption_tracks
+    #---------
+    
+    def get_caption_tracks(self, video_id, referer=None):
+        '''
+        Given a YouTube video id, return a dict for each of the
+        video's caption tracks, with the track's 'id', 'etag',
+        'language', 'name' (empty for unnamed tracks), and 'trackKind'
+        (standard, ASR, or forced).
+        
+        :param video_id: YouTube video id
+        :type video_id: str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :returns list of track descriptions
+        :rtype [{ str : str }]
+        '''
+        if referer is None:
+            if self.referer is not None:
+                referer = self.referer
+            else:
+                raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
+        
+        fields = 'etag,items(id,etag,snippet(language,name,trackKind))'
+        req = self.service.captions().list(part='snippet',
+                                           videoId=video_id,
+                                           fields=fields,
+                                           key=self.api_key)
+        try:
+            api_res_dict = self._execute_request(req,
+                                                 'captions.list',
+                                                 referer,
+                                                 cache_key=self._cache_key('captions.list', 'snippet', fields, video_id))
+        except HttpError as e:
+            raise ValueError('Error listing caption tracks: %s' % self.msg_from_http_error(e))
+        
+        tracks = []
+        for item in api_res_dict.get('items', []):
+            snippet = item.get('snippet', {})
+            tracks.append({'id'        : item['id'],
+                           'etag'      : item.get('etag'),
+                           'language'  : snippet.get('language', 'unknown'),
+                           'name'      : snippet.get('name', ''),
+                           'trackKind' : snippet.get('trackKind', 'standard')
+                           })
+        return tracks
+    
+    #-----------------------
+    # get_caption_file_ids 
+    #---------
+
+    def get_caption_file_ids(self, video_id,  referer=None):
+        '''
+        Given a YouTube video id, retrieve the caption 
+        file IDs, if captions exist.
+        
+        The raw API return is this; the method returns a simple
+        list of values in the items' id fields:
+        {
+           u'items':[
+              {
+                 u'kind':u'youtube#caption',
+                 u'etag':u'"5g01s4-wS2b4VpScndqCYc5Y-8k/a10fXTkUBDTu9gCLrZfjQStUo1M"',
+                 u'id':u'vXlAeY5R6WE56Q3S2cb9b3agjQid8jSC-lwrvGWboh0='
+              },
+              {
+                 u'kind':u'youtube#caption',
+                 u'etag':u'"5g01s4-wS2b4VpScndqCYc5Y-8k/N0UIGw0FX2himVFG0fxbKXfwekQ"',
+                 u'id':u'5-c6BoK6O8gJmY_liC5y-YRPso9GpV47'
+              }
+           ],
+           u'kind':u'youtube#captionListResponse',
+           u'etag':u'"5g01s4-wS2b4VpScndqCYc5Y-8k/QuU60LZawWZmh79BRJ1QXGWpxsI"'
+        }
+
+        :param video_id: YouTube video id
+        :type video_id: str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :returns list of caption file ids
+        :rtype [ str ]
+       '''
+
+        if referer is None:
+            if self.referer is not None:
+                referer = self.referer
+            else:
+                raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
+
+        
+        def list_caption_ids():
+            req = self.service.captions().list(part='id',
+                                               videoId=video_id,
+                                               key=self.api_key)
+            return self._execute_request(req,
+                                         'captions.list',
+                                         referer,
+                                         cache_key=self._cache_key('captions.list', 'id', None, video_id))
+        
+        # Concurrent calls for the same video share one request: 
+        api_res_dict = self.single_flight.do(('captions.list', 'id', video_id, referer), list_caption_ids)
+        caption_ids = [] 
+        for caption_id_item in api_res_dict['items']:
+            caption_ids.append(caption_id_item['id'])
+        return(caption_ids)
+    
+    #-----------------------
+    # search_metadata 
+    #---------
+    
+    def search_metadata(self, search_terms, return_fields=None, max_results=None, referer=None, columnar=False):
+        '''
+        Run one YouTube search, and return the first page
+        of results, at most 50. Use iter_search() to retrieve
+        more.
+        
+        :param search_terms: search term, or list of terms
+        :type search_terms: { str | [str] }
+        :param return_fields: field or list of fields from video_info_names;
+            None returns all fields of the search result.
+        :type return_fields: { None | str | [str] }
+        :param max_results: number of results, between 0 and 50
+        :type max_results: int
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param columnar: if True, return a ColumnarResult instead of a list of dicts;
+            requires return_fields.
+        :type columnar: bool
+        :returns list of result dicts, or table of results
+        :rtype { [{ str : str }] | ColumnarResult }
+        :raise ValueError if no referer found, if a return field does not exist,
+            or if the search fails.
+        '''
+
+        if referer is None:
+            if self.referer is not None:
+                referer = self.referer
+            else:
+                raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
+            
+        if max_results is not None and not isinstance(max_results, int):
+            raise ValueError("Maximum number of results must be an integer, was '%s'" % max_results)
+        
+        kwargs = self._search_kwargs(search_terms, return_fields)
+        if max_results is not None:
+            kwargs['maxResults'] = max_results
+        
+        res = self._search_page(kwargs, referer, return_fields)
+        plan = self._search_plan(return_fields)
+        if columnar:
+            if plan is None:
+                raise ValueError('Columnar search results require return_fields.')
+            builder = ColumnarBuilder(plan)
+            builder.add_items(res.get('items', []))
+            return builder.finish()
+        return self.parse_api_result(res, plan)
+    
+    #-----------------------
+    # iter_search 
+    #---------
+    
+    def iter_search(self, search_terms, return_fields=None, limit=None, prefetch=False, search_type=None, referer=None):
+        '''
+        Generator over the results of a YouTube search. Unlike
+        search_metadata(), follows the API's nextPageToken, so
+        that all results are retrieved, not just the first page. 
+        Pages are requested only as the caller consumes results.
+        If prefetch is True, the next page is requested on one of
+        the helper's worker threads while the caller processes the
+        current page.
+        
+        Note that the API itself stops returning pages after
+        about 500 results.
+        
+        Example, videoIds of all lecture videos matching a search:
+            for row in helper.iter_search('stanford databases', 'videoId', search_type='video'):
+                print(row['videoId'])
+        
+        :param search_terms: search term, or list of terms
+        :type search_terms: { str | [str] }
+        :param return_fields: field or list of fields from video_info_names;
+            None returns all fields of the search result.
+        :type return_fields: { None | str | [str] }
+        :param limit: maximum number of results; None: all
+        :type limit: int
+        :param prefetch: whether to retrieve the next page in the background
+        :type prefetch: bool
+        :param search_type: restrict results to 'video', 'channel', or 'playlist'
+        :type search_type: str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :returns generator of result dicts
+        :rtype { str : str }
+        :raise ValueError if no referer found, if a return field does not exist,
+            or if the search fails.
+        '''
+        if referer is None:
+            if self.referer is not None:
+                referer = self.referer
+            else:
+                raise ValueError('Must specify referer ID in __init__() call or in calling this method.')
+        
+        if limit is not None and limit <= 0:
+            return
+        
+        kwargs = self._search_kwargs(search_terms, return_fields, paginate=True)
+        kwargs['maxResults'] = YoutubeHelper.BULK_BATCH_SIZE if limit is None \
+                               else min(limit, YoutubeHelper.BULK_BATCH_SIZE)
+        if search_type is not None:
+            kwargs['type'] = search_type
+        
+        plan = self._search_plan(return_fields)
+        num_yielded = 0
+        res = self._search_page(kwargs, referer, return_fields)
+        while True:
+            next_page_token = res.get('nextPageToken')
+            next_page_future = None
+            if next_page_token is not None and prefetch and \
+               (limit is None or num_yielded + len(res.get('items', [])) < limit):
+                next_page_future = self.submit(self._search_page,
+                                               dict(kwargs, pageToken=next_page_token),
+                                               referer,
+                                               return_fields)
+            
+            for user_res_dict in self.parse_api_result(res, plan):
+                yield user_res_dict
+                num_yielded += 1
+                if limit is not None and num_yielded >= limit:
+                    if next_page_future is not None:
+                        next_page_future.cancel()
+                    return
+            
+            if next_page_token is None or len(res.get('items', [])) == 0:
+                return
+            if next_page_future is not None:
+                res = next_page_future.result()
+            else:
+                res = self._search_page(dict(kwargs, pageToken=next_page_token),
+                                        referer,
+                                        return_fields)
+    
+    #-----------------------
+    # iter_search_video_info 
+    #---------
+    
+    def iter_search_video_info(self, search_terms, param_arr, limit=None, referer=None, missing_ids=None):
+        '''
+        Search for videos, and retrieve the given video info
+        for each of them. The videoIds from the search pages are
+        handed to get_video_info_bulk() as they arrive, so that
+        a search of 500 videos costs ten videos().list requests.
+        This allows retrieval of information search results do not 
+        include, such as duration.
+        
+        :param search_terms: search term, or list of terms
+        :type search_terms: { str | [str] }
+        :param param_arr: individual result field, or array of multiple fields
+        :type param_arr: { str | [str] }
+        :param limit: maximum number of videos; None: all
+        :type limit: int
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param missing_ids: optional list to which IDs without video info are appended
+        :type missing_ids: [str]
+        :returns generator of result dicts, which always include videoId
+        :rtype { str : str }
+        '''
+        video_ids = (row['videoId'] for row in self.iter_search(search_terms,
+                                                                'videoId',
+                                                                limit=limit,
+                                                                prefetch=True,
+                                                                search_type='video',
+                                                                referer=referer))
+        return self.get_video_info_bulk(param_arr, video_ids, referer=referer, missing_ids=missing_ids)
+    
+    #--------------------------------- Private Utility Methods ------------    
+    
+    
+    #-----------------------
+    # _download_caption_track
+    #---------
+    
+    def _download_caption_track(self, video_id, track, caption_format, outdir, file_prefix, referer, transcoder=None):
+        '''
+        Stream one caption track into its file, unless the
+        outdir's manifest shows that it is already there.
+        
+        :param video_id: YouTube video id
+        :type video_id: str
+        :param track: track description from get_caption_tracks()
+        :type track: { str : str }
+        :param caption_format: format into which the captions are converted
+        :type caption_format: { None | str | CaptionFormat }
+        :param outdir: directory for the caption files; default: current directory
+        :type outdir: str
+        :param file_prefix: string prepended to the file name
+        :type file_prefix: str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param transcoder: if provided, converts locally rather than via the API
+        :type transcoder: CaptionTranscoder
+        :returns path to the caption file
+        :rtype str
+        :raise ValueError if the download fails.
+        '''
+        if outdir is None:
+            outdir = os.getcwd()
+        if isinstance(caption_format, CaptionFormat):
+            caption_format = caption_format.caption_format
+        extension = caption_format if caption_format is not None else 'orig'
+        asr_mark = '_asr' if track['trackKind'].lower() == 'asr' else ''
+        # Tracks in the same language differ by name:
+        name_mark = '_' + re.sub(r'[^\w-]+', '-', track['name']).strip('-') if track['name'] else ''
+        file_name = '%s%s_%s%s%s.%s' % (file_prefix or '', video_id, track['language'], name_mark, asr_mark, extension)
+        file_path = os.path.join(outdir, file_name)
+        
+        manifest = self._caption_manifest(outdir)
+        if manifest.is_complete(file_name, track['id'], track['etag']):
+            return file_path
+        
+        # Without an etag, a cached track could not
+        # be told from a later version:
+        if transcoder is not None and caption_format is not None and track['etag'] is not None:
+            if transcoder.cached(track['etag'], caption_format) is None and \
+               transcoder.cached(track['etag'], CaptionTranscoder.NATIVE) is None:
+                req = self.service.captions().download_media(id=track['id'])
+                self._download_media(req, transcoder.native_path(track['etag']), referer)
+            num_bytes = self._copy_file(transcoder.transcode(track['etag'], caption_format), file_path)
+        else:
+            kwargs = {'id' : track['id']}
+            if caption_format is not None:
+                kwargs['tfmt'] = caption_format
+            req = self.service.captions().download_media(**kwargs)
+            num_bytes = self._download_media(req, file_path, referer)
+        
+        manifest.record(file_name, track['id'], track['etag'], num_bytes)
+        return file_path
+    
+    #-----------------------
+    # _download_media
+    #---------
+    
+    def _download_media(self, req, file_path, referer):
+        '''
+        Stream the body of a media download request to a
+        temporary file, renamed to file_path once complete.
+        
+        :returns number of bytes written
+        :rtype int
+        :raise ValueError if the download fails.
+        '''
+        req.headers['referer'] = referer
+        (outdir, file_name) = os.path.split(file_path)
+        (fd, tmp_path) = tempfile.mkstemp(dir=outdir, prefix='.' + file_name, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_fd:
+                num_bytes = self._call(lambda: self._stream_media(req, tmp_fd), 'captions.download')
+            if self.metrics is not None:
+                self.metrics.record(Metrics.BYTES, 'captions.download', num_bytes)
+            os.replace(tmp_path, file_path)
+        except HttpError as e:
+            os.remove(tmp_path)
+            raise ValueError('Error downloading caption files: %s' % self.msg_from_http_error(e))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        return num_bytes
+    
+    #-----------------------
+    # _copy_file
+    #---------
+    
+    def _copy_file(self, src_path, file_path):
+        '''
+        Copy a file via a temporary file that is renamed
+        once complete.
+        
+        :returns number of bytes copied
+        :rtype int
+        '''
+        (outdir, file_name) = os.path.split(file_path)
+        (fd, tmp_path) = tempfile.mkstemp(dir=outdir, prefix='.' + file_name, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_fd, open(src_path, 'rb') as src_fd:
+                shutil.copyfileobj(src_fd, tmp_fd)
+                num_bytes = tmp_fd.tell()
+            os.replace(tmp_path, file_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        return num_bytes
+    
+    #-----------------------
+    # _download_caption_track_with_id
+    #---------
+    
+    def _download_caption_track_with_id(self, video_id, *args):
+        return (video_id, self._download_caption_track(video_id, *args))
+    
+    #-----------------------
+    # _stream_media
+    #---------
+    
+    def _stream_media(self, req, fd):
+        '''
+        Write the body of a media download request to an open
+        file, one chunk at a time. Starts over at the beginning 
+        of the file, so that retries do not append to a partial
+        earlier attempt.
+        
+        :returns number of bytes written
+        :rtype int
+        '''
+        fd.seek(0)
+        fd.truncate()
+        downloader = MediaIoBaseDownload(fd, req, chunksize=YoutubeHelper.MEDIA_CHUNK_SIZE)
+        done = False
+        while not done:
+            (_status, done) = downloader.next_chunk()
+        fd.flush()
+        return fd.tell()
+    
+    #-----------------------
+    # _caption_manifest
+    #---------
+    
+    def _caption_manifest(self, outdir):
+        '''
+        Return the CaptionManifest of a caption directory,
+        shared by all threads that write into it.
+        '''
+        outdir = os.path.abspath(outdir)
+        with self.executor_lock:
+            try:
+                return self.caption_manifests[outdir]
+            except KeyError:
+                manifest = CaptionManifest(outdir)
+                self.caption_manifests[outdir] = manifest
+                return manifest
+    
+    #-----------------------
+    # _search_kwargs
+    #---------
+    
+    def _search_kwargs(self, search_terms, return_fields, paginate=False):
+        '''
+        Create the arguments for a search().list request.
+        
+        :param search_terms: search term, or list of terms
+        :type search_terms: { str | [str] }
+        :param return_fields: field or list of fields from video_info_names, or None
+        :type return_fields: { None | str | [str] }
+        :param paginate: whether the fields mask must include nextPageToken
+        :type paginate: bool
+        :returns keyword arguments for search().list()
+        :rtype { str : str }
+        :raise ValueError if a return field does not exist.
+        '''
+        if isinstance(search_terms, (list, tuple)):
+            search_terms = ','.join(search_terms)
+        
+        kwargs = {'part' : 'id,snippet',
+                  'q' : search_terms,
+                  'key' : self.api_key}
+         
+        if return_fields is not None:
+            if not isinstance(return_fields, (list, tuple)):
+                return_fields = [return_fields]
+            for ret_field in return_fields:
+                if ret_field not in YoutubeHelper.video_info_names:
+                    raise ValueError ("Legal field names are %s, not '%s'" % (list(YoutubeHelper.video_info_names.keys()), ret_field))
+            plan = self.query_plan(return_fields, endpoint='search.list')
+            page_spec = 'nextPageToken,' if paginate else ''
+            kwargs['fields'] = 'etag,' + page_spec + plan.item_fields
+        return kwargs
+    
+    #-----------------------
+    # _search_plan
+    #---------
+    
+    def _search_plan(self, return_fields):
+        '''
+        Return the QueryPlan for parsing search results, or
+        None if all fields of the results were requested.
+        '''
+        if return_fields is None:
+            return None
+        if not isinstance(return_fields, (list, tuple)):
+            return_fields = [return_fields]
+        return self.query_plan(return_fields, endpoint='search.list')
+    
+    #-----------------------
+    # _search_page
+    #---------
+    
+    def _search_page(self, kwargs, referer, return_fields=None):
+        '''
+        Execute one search().list request.
+        
+        :param kwargs: arguments for search().list(), as created by _search_kwargs()
+        :type kwargs: { str : str }
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param return_fields: user-level names of the requested fields, for the cache
+        :type return_fields: { None | str | [str] }
+        :returns the API's response
+        :rtype { <any> }
+        :raise ValueError if the search fails.
+        '''
+        if return_fields is not None and not isinstance(return_fields, (list, tuple)):
+            return_fields = [return_fields]
+        req = self.service.search().list(**kwargs)
+        item_id = '&'.join('%s=%s' % (key, kwargs[key]) 
+                           for key in sorted(kwargs.keys()) 
+                           if key not in ('key', 'part', 'fields'))
+        try:
+            return self._execute_request(req,
+                                         'search.list',
+                                         referer,
+                                         cache_key=self._cache_key('search.list',
+                                                                   kwargs['part'],
+                                                                   kwargs.get('fields'),
+                                                                   item_id),
+                                         cache_fields=return_fields)
+        except HttpError as e:
+            raise ValueError('Error searching metadata: %s' % self.msg_from_http_error(e))
+    
+    #-----------------------
+    # _build_service
+    #---------
+    
+    def _build_service(self):
+        '''
+        Create a YouTube service object. Called once
+        for each thread that uses the helper. The discovery
+        document is shared by all helpers in the process, 
+        and is read from a local copy; see discovery.py.
+        '''
+        client_options = {'api_endpoint' : self.api_endpoint} if self.api_endpoint is not None else None
+        return build_from_document(load_discovery_document(self.http),
+                                   developerKey=self.api_key,
+                                   http=self.http,
+                                   client_options=client_options)
+    
+    #-----------------------
+    # _get_executor
+    #---------
+    
+    def _get_executor(self):
+        '''
+        Return the thread pool for the concurrent methods,
+        creating it on first use.
+        '''
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.num_workers)
+            return self.executor
+    
+    #-----------------------
+    # _batches
+    #---------
+    
+    def _batches(self, video_ids):
+        '''
+        Generator that chunks an iterable of video IDs
+        into lists of at most BULK_BATCH_SIZE IDs.
+        '''
+        batch = []
+        for video_id in video_ids:
+            batch.append(video_id)
+            if len(batch) >= YoutubeHelper.BULK_BATCH_SIZE:
+                yield batch
+                batch = []
+        if len(batch) > 0:
+            yield batch
+    
+    #-----------------------
+    # _execute_request
+    #---------
+    
+    def _execute_request(self, req, endpoint, referer, cache_key=None, cache_fields=None):
+        '''
+        Execute one API request. All API traffic goes through
+        this method. Requests are paced and charged against the
+        daily quota by the helper's QuotaScheduler, which also
+        retries transient failures. If the helper has a cache, and a cache_key
+        is provided, fresh cached responses are returned without
+        any network traffic. Stale responses are revalidated by
+        sending their etag in an If-None-Match header. If the API
+        answers 304 (Not Modified), the cached response is reused,
+        which costs no quota.
+        
+        :param req: request created via the service object 
+        :type req: googleapiclient.http.HttpRequest
+        :param endpoint: API method, such as 'videos.list'
+        :type endpoint: str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param cache_key: key under which response is cached; None: do not cache
+        :type cache_key: str
+        :param cache_fields: user-level names of the requested fields, used
+            to determine how long the response stays fresh
+        :type cache_fields: [str]
+        :returns the API's response
+        :rtype { <any> }
+        :raise HttpError if the request fails
+        :raise QuotaExhaustedError if the daily quota is spent
+        '''
+        req.headers['referer'] = referer
+        if self.metrics is not None:
+            self._count_response_bytes(req, endpoint)
+        if self.cache is None or cache_key is None:
+            return self._call(req.execute, endpoint)
+        
+        ttl = self.cache.ttl_for(cache_fields or [])
+        cached = self.cache.lookup(cache_key)
+        if cached is not None:
+            (cached_res, etag, fresh) = cached
+            if fresh:
+                self._record_cache_lookup('hit')
+                return cached_res
+            if etag is not None:
+                req.headers['If-None-Match'] = etag
+        try:
+            res = self._call(req.execute, endpoint)
+        except HttpError as e:
+            if cached is not None and e.resp.status == 304:
+                # Unchanged resources cost no quota:
+                self.scheduler.refund(endpoint)
+                self.cache.refresh(cache_key, ttl)
+                self._record_cache_lookup('revalidated')
+                return cached_res
+            raise
+        
+        self._record_cache_lookup('miss')
+        self.cache.store(cache_key, res, res.get('etag'), ttl)
+        return res
+    
+    #-----------------------
+    # _stream_items
+    #---------
+    
+    def _stream_items(self, req, endpoint, referer):
+        '''
+        Send a request via the scheduler, like _execute_request(),
+        but without the cache, and return the items of the response
+        as they are parsed from its body. The scheduler's retries
+        end once a successful response starts to arrive.
+        
+        :param req: request created via the service object 
+        :type req: googleapiclient.http.HttpRequest
+        :param endpoint: API method, such as 'videos.list'
+        :type endpoint: str
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :returns generator of the response's items
+        :rtype { <any> }
+        :raise HttpError if the request fails
+        :raise QuotaExhaustedError if the daily quota is spent
+        '''
+        headers = dict(req.headers)
+        headers['referer'] = referer
+        # stream_url() can only gunzip:
+        headers['accept-encoding'] = 'gzip'
+        
+        def open_stream():
+            if hasattr(self.http, 'stream_request'):
+                response = self.http.stream_request(req.uri, headers=headers)
+            else:
+                response = stream_url(req.uri, headers=headers)
+            if response.status >= 300:
+                content = b''.join(response.chunks)
+                raise HttpError(httplib2.Response({'status' : response.status}), content, uri=req.uri)
+            return response
+        
+        chunks = self._call(open_stream, endpoint).chunks
+        if self.metrics is not None:
+            chunks = self._count_chunk_bytes(chunks, endpoint)
+        return iter_json_items(chunks)
+    
+    #-----------------------
+    # _count_chunk_bytes
+    #---------
+    
+    def _count_chunk_bytes(self, chunks, endpoint):
+        for chunk in chunks:
+            self.metrics.record(Metrics.BYTES, endpoint, len(chunk))
+            yield chunk
+    
+    #-----------------------
+    # _call
+    #---------
+    
+    def _call(self, fn, endpoint):
+        '''
+        Send a request via the scheduler. If the helper has
+        Metrics, record the latency of each attempt, the time
+        spent waiting before attempts, retries, quota units,
+        and failure.
+        
+        :param fn: callable that sends one request, such as req.execute
+        :type fn: callable
+        :param endpoint: API method, such as 'videos.list'
+        :type endpoint: str
+        :returns fn's return value
+        :rtype <any>
+        '''
+        metrics = self.metrics
+        if metrics is None:
+            return self.scheduler.call(fn, endpoint)
+        
+        # Attempts so far, and seconds spent in them:
+        attempts = [0, 0.0]
+        def timed_fn():
+            if attempts[0] > 0:
+                metrics.record(Metrics.RETRY, endpoint)
+            attempts[0] += 1
+            start = time.perf_counter()
+            try:
+                res = fn()
+            except HttpError as e:
+                # The API does not charge for 304 (Not Modified):
+                if e.resp.status != 304:
+                    metrics.record(Metrics.UNITS, endpoint, self.scheduler.cost(endpoint))
+                raise
+            except Exception:
+                metrics.record(Metrics.UNITS, endpoint, self.scheduler.cost(endpoint))
+                raise
+            finally:
+                latency = time.perf_counter() - start
+                attempts[1] += latency
+                metrics.record(Metrics.REQUEST, endpoint, latency)
+            metrics.record(Metrics.UNITS, endpoint, self.scheduler.cost(endpoint))
+            return res
+        
+        start = time.perf_counter()
+        try:
+            return self.scheduler.call(timed_fn, endpoint)
+        except HttpError as e:
+            if e.resp.status != 304:
+                metrics.record(Metrics.ERROR, endpoint)
+            raise
+        except Exception:
+            metrics.record(Metrics.ERROR, endpoint)
+            raise
+        finally:
+            metrics.record(Metrics.WAIT, endpoint, max(0.0, time.perf_counter() - start - attempts[1]))
+    
+    #-----------------------
+    # _count_response_bytes
+    #---------
+    
+    def _count_response_bytes(self, req, endpoint):
+        '''
+        Have a request record the size of its response body
+        once it arrives. googleapiclient passes every successful
+        response through the request's postproc.
+        '''
+        postproc = req.postproc
+        def counting_postproc(resp, content):
+            self.metrics.record(Metrics.BYTES, endpoint, len(content))
+            return postproc(resp, content)
+        req.postproc = counting_postproc
+    
+    #-----------------------
+    # _record_cache_lookup
+    #---------
+    
+    def _record_cache_lookup(self, result):
+        if self.metrics is not None:
+            self.metrics.record(Metrics.CACHE, result)
+    
+    #-----------------------
+    # _cache_key
+    #---------
+    
+    def _cache_key(self, endpoint, part, fields, item_id):
+        '''
+        Return the cache key for a request, or None if 
+        this helper does not cache.
+        '''
+        if self.cache is None:
+            return None
+        return self.cache.make_key(endpoint, part, fields, item_id)
+    
+    #-----------------------
+    # _video_info_batch
+    #---------
+    
+    def _video_info_batch(self, video_ids, plan, referer, missing_ids=None):
+        '''
+        Retrieve info for at most BULK_BATCH_SIZE videos in a single
+        videos().list request. Returns the result dicts in the
+        order of video_ids. IDs without a result are appended
+        to missing_ids, if that list is provided.
+        
+        :param video_ids: YouTube ids of videos
+        :type video_ids: [str]
+        :param plan: plan for the requested info; must include the id
+        :type plan: QueryPlan
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param missing_ids: optional list to which unknown IDs are appended
+        :type missing_ids: [str]
+        :returns list of result dicts
+        :rtype [{ str : str }]
+        '''
+        return self.parse_api_result({'items' : self._video_info_items(video_ids, plan, referer, missing_ids)}, plan)
+    
+    #-----------------------
+    # _video_info_single
+    #---------
+    
+    def _video_info_single(self, video_id, plan, referer):
+        '''
+        Send the videos().list request of get_video_info(),
+        and return the raw API result.
+        '''
+        req = self.service.videos().list(part=plan.part,
+                                         fields=plan.fields,
+                                         id=video_id,
+                                         key=self.api_key)
+        return self._execute_request(req, 
+                                     'videos.list',
+                                     referer,
+                                     cache_key=self._cache_key('videos.list', plan.part, plan.fields, video_id),
+                                     cache_fields=plan.user_names)
+    
+    #-----------------------
+    # _coalesced_video_items
+    #---------
+    
+    def _coalesced_video_items(self, group_args, video_ids):
+        '''
+        Fetch a batch of video info on behalf of the coalescer.
+        
+        :param group_args: plan, which includes the video id, and referer
+        :type group_args: (QueryPlan, str)
+        :param video_ids: YouTube ids of at most BULK_BATCH_SIZE videos
+        :type video_ids: [str]
+        :returns raw API result items by video id
+        :rtype { str : { <any> } }
+        '''
+        (plan, referer) = group_args
+        return {item['id'] : item for item in self._video_info_items(video_ids, plan, referer)}
+    
+    #-----------------------
+    # _video_info_items
+    #---------
+    
+    def _video_info_items(self, video_ids, plan, referer, missing_ids=None, use_cache=True):
+        '''
+        Like _video_info_batch(), but returns the raw API
+        result items, rather than parsing them. With use_cache
+        False, the cache is neither consulted nor updated.
+        
+        :param video_ids: YouTube ids of videos
+        :type video_ids: [str]
+        :param plan: plan for the requested info; must include the id
+        :type plan: QueryPlan
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param missing_ids: optional list to which unknown IDs are appended
+        :type missing_ids: [str]
+        :param use_cache: whether to use the helper's cache, if any
+        :type use_cache: bool
+        :returns list of API result items
+        :rtype [{ <any> }]
+        '''
+        items_by_id = {}
+        
+        # Items are cached one video at a time, along with
+        # their etags, so that batches need not recur with
+        # identical IDs to profit from the cache:
+        use_cache = use_cache and self.cache is not None
+        ids_to_fetch = video_ids
+        fields = plan.fields
+        if use_cache:
+            fields = plan.item_etag_fields
+            ids_to_fetch = []
+            stale_items = {}
+            for video_id in video_ids:
+                cached = self.cache.lookup(self._cache_key('videos.list', plan.part, plan.fields, video_id))
+                if cached is not None and cached[2]:
+                    self._record_cache_lookup('hit')
+                    items_by_id[video_id] = cached[0]['items'][0]
+                elif cached is not None and cached[1] is not None:
+                    stale_items[video_id] = (cached[0]['items'][0], cached[1])
+                else:
+                    self._record_cache_lookup('miss')
+                    ids_to_fetch.append(video_id)
+            if len(ids_to_fetch) > 0:
+                # A request for the missing items is due anyway,
+                # and the stale ones come along; their etags then
+                # tell which are unchanged:
+                ids_to_fetch.extend(stale_items.keys())
+            elif len(stale_items) > 0:
+                self._revalidate_video_items(stale_items, plan, referer, items_by_id)
+                ids_to_fetch = list(stale_items.keys())
+            if len(ids_to_fetch) == 0:
+                return [items_by_id[video_id] for video_id in video_ids if video_id in items_by_id]
+        
+        req = self.service.videos().list(part=plan.part,
+                                         fields=fields,
+                                         id=','.join(ids_to_fetch),
+                                         key=self.api_key)
+        try:
+            res = self._execute_request(req, 'videos.list', referer)
+        except HttpError as e:
+            raise ValueError('Error retrieving video info: %s' % self.msg_from_http_error(e))
+        
+        if use_cache:
+            ttl = self.cache.ttl_for(plan.user_names)
+            for item in res.get('items', []):
+                cache_key = self._cache_key('videos.list', plan.part, plan.fields, item['id'])
+                stale = stale_items.pop(item['id'], None)
+                if stale is not None and stale[1] == item.get('etag'):
+                    self.cache.refresh(cache_key, ttl)
+                    self._record_cache_lookup('revalidated')
+                    continue
+                if stale is not None:
+                    self._record_cache_lookup('miss')
+                self.cache.store(cache_key, {'items' : [item]}, etag=item.get('etag'), ttl=ttl)
+            # Stale items the API no longer returns:
+            for _video_id in stale_items:
+                self._record_cache_lookup('miss')
+        
+        for item in res.get('items', []):
+            items_by_id[item['id']] = item
+        
+        items = []
+        for video_id in video_ids:
+            try:
+                items.append(items_by_id[video_id])
+            except KeyError:
+                if missing_ids is not None:
+                    missing_ids.append(video_id)
+        return items
+    
+    #-----------------------
+    # _revalidate_video_items
+    #---------
+    
+    def _revalidate_video_items(self, stale_items, plan, referer, items_by_id):
+        '''
+        Revalidate stale cached items by their etags. A batched
+        request cannot carry an If-None-Match header per item, so
+        one request fetches only the current etags of the items,
+        with the parts of the plan on which the etags depend.
+        Items whose etag is unchanged are marked fresh, moved from
+        stale_items to items_by_id, and so are not fetched, parsed,
+        and stored again. The items left in stale_items changed
+        or no longer exist.
+        
+        :param stale_items: video id to cached item and its etag
+        :type stale_items: { str : ({ <any> }, str) }
+        :param plan: plan under which the items were cached
+        :type plan: QueryPlan
+        :param referer: one of the referer strings associated with the API
+        :type referer: str
+        :param items_by_id: dict to which unchanged items are added
+        :type items_by_id: { str : { <any> } }
+        '''
+        req = self.service.videos().list(part=plan.part,
+                                         fields='items(id,etag)',
+                                         id=','.join(stale_items.keys()),
+                                         key=self.api_key)
+        try:
+            res = self._execute_request(req, 'videos.list', referer)
+        except HttpError as e:
+            raise ValueError('Error retrieving video info: %s' % self.msg_from_http_error(e))
+        current_etags = {item['id'] : item.get('etag') for item in res.get('items', [])}
+        
+        ttl = self.cache.ttl_for(plan.user_names)
+        for (video_id, (item, etag)) in list(stale_items.items()):
+            if current_etags.get(video_id) == etag:
+                self.cache.refresh(self._cache_key('videos.list', plan.part, plan.fields, video_id), ttl)
+                self._record_cache_lookup('revalidated')
+                items_by_id[video_id] = item
+                del stale_items[video_id]
+    
+    #-----------------------
+    # parse_api_result 
+    #---------
+
+    def parse_api_result(self, res, plan=None):
+        '''
+        Given a return JSON structure from the YouTube API,
+        create a simple dict that maps keys from the video_info_names
+        dict to their corresponding values in the result.
+        
+        For one snippet-info only, should get something like:
+          {u'items': [{u'snippet': {u'channelTitle': u'StatsSpring2013'}}]}
+        
+        For one contentDetails-info only:
+          {u'items': [{u'contentDetails': {u'caption': u'true'}}]}
+        
+        For multiple snippet-info items, should get something like:
+          {u'items': [{u'snippet': {u'channelTitle': u'StatsSpring2013', u'title': u'Unit 1 Module 5 part 1'}}]}
+        
+        For multiple contentDetails-info items, should get something like:
+          {u'items': [{u'contentDetails': {u'duration': u'PT11M2S', u'caption': u'true'}}]}
+        
+        For multiple snippet+contentDetails-info items, should get something like:
+          {u'items': [{u'snippet': {u'channelTitle': u'StatsSpring2013',
+                                    u'title': u'Unit 1 Module 5 part 1'},
                        u'contentDetails': {u'duration': u'PT11M2S',
                                            u'caption': u'true'}}]}
 
+        If the QueryPlan of the request is available, parsing
+        is left to the plan, which is considerably faster on
+        large results.
+
         :param res: result JSON from call to YouTube V3 data API
         :type res: { <any> }
+        :param plan: the plan with which the request was created, if any
+        :type plan: QueryPlan
         :return dict of keys from video_info_names.keys() mapping to result values.
         :rtype { str : str }
         '''    
+        if self.metrics is None:
+            return self._parse_result(res, plan)
+        start = time.perf_counter()
+        res_dicts = self._parse_result(res, plan)
+        self.metrics.record(Metrics.PARSE, 'plan' if plan is not None else 'generic', time.perf_counter() - start)
+        return res_dicts
+    
+    #-----------------------
+    # _parse_result
+    #---------
+    
+    def _parse_result(self, res, plan):
+        '''
+        Body of parse_api_result().
+        '''
+        if plan is not None:
+            return plan.parse(res)
         
         res_dicts = []
         for api_res_dict in res['items']:
             user_res_dict = {}
             for api_name_root in api_res_dict.keys():
-                for api_name_leaf in api_res_dict[api_name_root].keys():
-                    api_name = '/'.join([api_name_root, api_name_leaf])
-                    user_name = self.user_name_from_api_name(api_name)
-                    user_res_value = api_res_dict[api_name_root][api_name_leaf]
-                # Handle 'duration' specially: turn into a timedelta object:
-                    if user_name == 'duration':
-                        user_res_value = isodate.parse_duration(user_res_value)
-                    user_res_dict[user_name] = user_res_value
+                # videos().list returns the id as a plain string,
+                # rather than as the id/videoId of search results:
+                if api_name_root == 'id' and not isinstance(api_res_dict['id'], dict):
+                    user_res_dict['videoId'] = api_res_dict['id']
+                    continue
+                # Fields without a user-level name, such as 'kind',
+                # are left out:
+                if not isinstance(api_res_dict[api_name_root], dict):
+                    try:
+                        user_res_dict[self.user_name_from_api_name(api_name_root)] = api_res_dict[api_name_root]
+                    except ValueError:
+                        pass
+                    continue
+                self._parse_nested(api_name_root, api_res_dict[api_name_root], user_res_dict)
             res_dicts.append(user_res_dict)
         
         return res_dicts
         
+    #-----------------------
+    # _parse_nested
+    #---------
+    
+    def _parse_nested(self, api_name_prefix, api_value_dict, user_res_dict):
+        '''
+        Add the values of a dict in an API result to user_res_dict,
+        under their user-level names. Values without a name are
+        searched for named values nested within them, such as 
+        snippet/thumbnails/high/url.
+        '''
+        for (api_name_leaf, user_res_value) in api_value_dict.items():
+            api_name = '/'.join([api_name_prefix, api_name_leaf])
+            try:
+                user_name = self.user_name_from_api_name(api_name)
+            except ValueError:
+                if isinstance(user_res_value, dict):
+                    self._parse_nested(api_name, user_res_value, user_res_dict)
+                continue
+            # For example, turn 'duration' into a timedelta object:
+            converter = YoutubeHelper.value_converters.get(user_name)
+            if converter is not None:
+                user_res_value = converter(user_res_value)
+            user_res_dict[user_name] = user_res_value
+    
     #-----------------------
     # msg_from_http_error
     #---------
@@ -394,12 +2336,22 @@ class YoutubeHelper(object):
         :rtype str
         
         '''
-        
-        for (user_name, api_name) in YoutubeHelper.video_info_names.iteritems():
+        try:
+            return YoutubeHelper.api_info_names[api_name_to_convert]
+        except KeyError:
+            pass
+        # Entries added to video_info_names directly, rather
+        # than via register_video_info():
+        for (user_name, api_name) in YoutubeHelper.video_info_names.items():
             if api_name == api_name_to_convert:
+                YoutubeHelper.api_info_names[api_name] = user_name
                 return user_name
         raise ValueError("API name '%s' is invalid." % api_name_to_convert)
     
+# The module uses relative imports; run it as
+#
+#    python -m youtube_utils.youtube_utils
+
 if __name__ == '__main__':
     
     service = YoutubeHelper(referer='mooc-analyzer')
@@ -3,8 +3,14 @@ Created on Jun 19, 2016
 
 @author: paepcke
 '''
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
-from youtube_utils import YoutubeHelper
+from unittest.mock import patch
+from youtube_utils.youtube_utils import YoutubeHelper, CaptionFormat
 from unittest.case import skipIf
 from datetime import timedelta
 
@@ -30,6 +36,31 @@ class YouTubeUtilsTest(unittest.TestCase):
     def tearDown(self):
         pass
 
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_lazy_startup(self):
+        # Importing in a fresh interpreter does not pull
+        # in the optional columnar dependencies:
+        preloaded = subprocess.check_output(
+            [sys.executable, '-c', 
+             'import sys; '
+             'import youtube_utils.youtube_utils; '
+             'print(",".join(name for name in ("numpy", "pyarrow", "pandas") if name in sys.modules))'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(preloaded.strip(), b'')
+
+        # Construction neither reads the discovery document
+        # nor builds a service object; the first use does,
+        # once per thread:
+        with patch('youtube_utils.youtube_utils.load_discovery_document') as load_mock, \
+             patch('youtube_utils.youtube_utils.build_from_document') as build_mock:
+            helpers = [YoutubeHelper(referer=self.referer, api_key=self.api_key) for _i in range(3)]
+            load_mock.assert_not_called()
+            build_mock.assert_not_called()
+            self.assertIs(helpers[0].service, build_mock.return_value)
+            self.assertIs(helpers[0].service, build_mock.return_value)
+            self.assertEqual(build_mock.call_count, 1)
+            self.assertEqual(load_mock.call_count, 1)
+
     @skipIf (not DO_ALL, 'Temporarily skipping this test')
     def test_get_video_info_one_snippet_item(self):
         res = self.service.get_video_info(['channelTitle'], self.test_vid_id)
@@ -64,12 +95,83 @@ class YouTubeUtilsTest(unittest.TestCase):
                               },
                              res[0])
 
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_get_video_info_bulk(self):
+        missing = []
+        res = list(self.service.get_video_info_bulk(['channelTitle'], 
+                                                    [self.test_vid_id, 'noSuchVideoX', self.test_vid_id],
+                                                    missing_ids=missing))
+        self.assertListEqual([{'videoId' : self.test_vid_id, 'channelTitle' : 'StatsSpring2013'},
+                              {'videoId' : self.test_vid_id, 'channelTitle' : 'StatsSpring2013'}],
+                             res)
+        self.assertListEqual(['noSuchVideoX'], missing)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_get_video_info_concurrent(self):
+        # More than one batch, so that several threads are involved:
+        video_ids = [self.test_vid_id] * (2 * YoutubeHelper.BULK_BATCH_SIZE + 1)
+        with YoutubeHelper(referer=self.referer, api_key=self.api_key, num_workers=3) as helper:
+            res = list(helper.get_video_info_concurrent(['channelTitle'], video_ids))
+        self.assertEqual(len(video_ids), len(res))
+        for info in res:
+            self.assertDictEqual({'videoId' : self.test_vid_id, 'channelTitle' : 'StatsSpring2013'}, info)
+
     @skipIf (not DO_ALL, 'Temporarily skipping this test')
     def test_user_name_from_api_name(self):
         self.assertEqual('channelTitle', self.service.user_name_from_api_name('snippet/channelTitle'))
         self.assertEqual('captionsAvailable', self.service.user_name_from_api_name('contentDetails/caption'))
         self.assertRaises(ValueError, self.service.user_name_from_api_name, 'foobar')
 
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_query_plan(self):
+        plan = YoutubeHelper.query_plan(['duration', 'videoTitle'], include_id=True)
+        self.assertIs(plan, YoutubeHelper.query_plan(['duration', 'videoTitle'], include_id=True))
+        self.assertEqual('contentDetails,snippet', plan.part)
+        self.assertEqual('etag,items(id,contentDetails/duration,snippet/title)', plan.fields)
+        res = {'items' : [{'id' : self.test_vid_id,
+                           'snippet' : {'title' : 'Unit 1 Module 5 part 1'},
+                           'contentDetails' : {'duration' : 'PT11M2S'}}]}
+        self.assertListEqual([{'videoId'    : self.test_vid_id,
+                               'videoTitle' : 'Unit 1 Module 5 part 1',
+                               'duration'   : timedelta(seconds=662.0)}],
+                             self.service.parse_api_result(res, plan))
+        self.assertListEqual(plan.parse(res), self.service.parse_api_result(res))
+        
+        # Etags for the parts of another plan:
+        etag_plan = YoutubeHelper.query_plan(['etag'], include_id=True, part=plan.part)
+        self.assertIs(etag_plan, YoutubeHelper.query_plan(['etag'], include_id=True, part=plan.part))
+        self.assertEqual('contentDetails,snippet', etag_plan.part)
+        self.assertEqual('etag,items(id,etag)', etag_plan.fields)
+        self.assertEqual('id', YoutubeHelper.query_plan(['etag'], include_id=True).part)
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_query_plan_nested_fields(self):
+        plan = YoutubeHelper.query_plan(['viewCount', 'videoTitle', 'thumbnailHighUrl', 'channelTitle', 'regionBlocked'])
+        # Only the parts that hold requested info:
+        self.assertEqual('statistics,snippet,contentDetails', plan.part)
+        self.assertEqual('etag,items(statistics/viewCount,'
+                         'snippet(title,thumbnails/high/url,channelTitle),'
+                         'contentDetails/regionRestriction/blocked)', plan.fields)
+        res = {'items' : [{'snippet' : {'title' : 'Unit 1',
+                                        'channelTitle' : 'StatsSpring2013',
+                                        'thumbnails' : {'high' : {'url' : 'https://i.ytimg.com/hq.jpg'}}},
+                           'statistics' : {'viewCount' : '12345'},
+                           'contentDetails' : {'regionRestriction' : {'blocked' : ['DE']}}}]}
+        expected = [{'viewCount' : 12345,
+                     'videoTitle' : 'Unit 1',
+                     'thumbnailHighUrl' : 'https://i.ytimg.com/hq.jpg',
+                     'channelTitle' : 'StatsSpring2013',
+                     'regionBlocked' : ['DE']}]
+        self.assertListEqual(expected, plan.parse(res))
+        self.assertListEqual(expected, self.service.parse_api_result(res))
+        
+        # Omitted values are omitted from the result:
+        self.assertListEqual([{'videoTitle' : 'Unit 1'}], plan.parse({'items' : [{'snippet' : {'title' : 'Unit 1'}}]}))
+        
+        self.assertEqual('etag,items(snippet(title,channelTitle))',
+                         YoutubeHelper.query_plan(['videoTitle', 'channelTitle']).fields)
+        self.assertRaises(ValueError, YoutubeHelper.query_plan, ['viewCount'], endpoint='search.list')
+
     @skipIf (not DO_ALL, 'Temporarily skipping this test')
     def test_get_caption_file_ids(self):
         res = self.service.get_caption_file_ids(self.test_vid_id)
@@ -82,11 +184,17 @@ class YouTubeUtilsTest(unittest.TestCase):
     def test_get_caption_files(self):
 
         # ***** Claims to require login. Needs investigation
+        outdir = tempfile.mkdtemp(prefix='youtube_utils_captions')
         try:        
             #res = self.service.get_caption_files(self.test_vid_id)
-            res = self.service.get_caption_files('QYDuAo9r1xE')
+            res = self.service.get_caption_files('QYDuAo9r1xE', CaptionFormat.srt, outdir=outdir)
+            for file_path in res:
+                self.assertTrue(os.path.exists(file_path))
+                self.assertTrue(file_path.endswith('.srt'))
         except ValueError:
             print("Known 'Need Login' error; needs fixing.")
+        finally:
+            shutil.rmtree(outdir)
 
     @skipIf (not DO_ALL, 'Temporarily skipping this test')
     def test_search_metadata(self):
@@ -103,6 +211,24 @@ class YouTubeUtilsTest(unittest.TestCase):
         expected = {'videoId' : 'qKNb8YQYTZg'}
         self.assertDictEqual(expected, res[0])
         
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_iter_search(self):
+        # More than one page:
+        res = list(self.service.iter_search('data-modification-statements', 
+                                            return_fields='videoTitle', 
+                                            limit=60,
+                                            prefetch=True))
+        self.assertEqual(60, len(res))
+        self.assertDictEqual({'videoTitle': u'06-08-data-modification-statements.mp4'}, res[0])
+
+    @skipIf (not DO_ALL, 'Temporarily skipping this test')
+    def test_iter_search_video_info(self):
+        res = list(self.service.iter_search_video_info('06-08-data-modification-statements', 
+                                                       ['duration'],
+                                                       limit=1))
+        self.assertEqual('qKNb8YQYTZg', res[0]['videoId'])
+        self.assertIn('duration', res[0])
+
 
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']